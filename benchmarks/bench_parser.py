@@ -0,0 +1,125 @@
+"""
+Parsing throughput of WeatherReport on CF6 products rebuilt from the rows in raw.json, compared with the
+original regex based parser kept below as LegacyWeatherReport.
+
+  python -m benchmarks.bench_parser [data_file] [repeat]
+
+benchmarks.suite times the current parser as parse.weather_report alongside the other benchmarks.
+"""
+import re
+import sys
+import time
+from datetime import date
+from json import loads
+from src.data_collector import WeatherReport, month_map
+
+MONTHS = (
+  'JANUARY', 'FEBRUARY', 'MARCH', 'APRIL', 'MAY', 'JUNE',
+  'JULY', 'AUGUST', 'SEPTEMBER', 'OCTOBER', 'NOVEMBER', 'DECEMBER',
+)
+
+class LegacyWeatherReport():
+  """
+  WeatherReport parsing as it was before the fast path, for comparison.
+  """
+  @staticmethod
+  def string_to_type(string:str):
+    if re.search(r'[a-zA-Z]', string) is not None:
+      return string
+    elif re.search(r'\.',string) is not None:
+      return float(string)
+    else:
+      return int(string)
+
+  @staticmethod
+  def parse_report_str(report_string:str):
+    data = report_string.split()
+    optional_column_found = len(data) == len(WeatherReport.attributes)
+    parsed_data = []
+    for i in range(len(WeatherReport.attributes)):
+      if not optional_column_found and i > 16:
+        if i > 17: parsed_data.append(LegacyWeatherReport.string_to_type(data[i-1]))
+        else: parsed_data.append(None)
+      else: parsed_data.append(LegacyWeatherReport.string_to_type(data[i]))
+    return parsed_data
+
+  def parse_report(self, report_string:str):
+    parsed = LegacyWeatherReport.parse_report_str(report_string)
+    parsed[0] = date(int(self.year),month_map(self.month),parsed[0]).strftime('%D') + '-' + self.city
+    return tuple(parsed)
+
+  def to_dict(self)->dict:
+    report_dict = {
+      'attributes': WeatherReport.attributes[1:],
+      'city': self.city,
+      'reports': {}
+    }
+    for report in self.reports:
+      report_dict['reports'][re.search(r'\S+(?=-)',report[0]).group(0)] = report[1:]
+    return report_dict
+
+  def __init__(self, report:str):
+    self.month = re.search(r'MONTH:\s+(\w+)',report,re.DOTALL).group(1)
+    self.year = re.search(r'YEAR:\s+(\w+)',report,re.DOTALL).group(1)
+    self.city = re.search(r'CF6(\w{3})',report,re.DOTALL).group(1)
+    report_data = re.findall(r'(?<=\n) *?(?:(?:\w+|[0-9.\-]+) +?){17,18}(?:\w+|[0-9.\-]+)(?=\n)', report)
+    self.reports = tuple(map(lambda r: self.parse_report(r),report_data[1:]))
+
+
+def render_products(weather_data:dict) -> list:
+  """
+  Rebuild the text of one CF6 product per station and month from an aggregate data store.
+  """
+  months = {}
+  for subset in ('training', 'testing'):
+    for day, stations in weather_data[subset].items():
+      month, day_of_month, year = map(int, day.split('/'))
+      for city, row in stations.items():
+        months.setdefault((city, month, 2000 + year), {})[day_of_month] = row
+  products = []
+  for (city, month, year), rows in months.items():
+    lines = [
+      '', '000', 'CXUS51 KBUF 010638', f'CF6{city}', '',
+      f'                                          MONTH:     {MONTHS[month - 1]}',
+      f'                                          YEAR:      {year}', '',
+      '=' * 80,
+      '1   2   3   4   5  6A  6B    7    8   9   10  11  12  13    14  15   16   17  18',
+      'DY MAX MIN AVG DEP HDD CDD  WTR  SNW DPTH SPD SPD DIR MIN PSBL S-S WX    SPD DR',
+      '=' * 80,
+    ]
+    for day_of_month in sorted(rows):
+      # The optional column is None when the product left it out
+      values = [value for value in rows[day_of_month] if value is not None]
+      lines.append(f'{day_of_month:>2} ' + ' '.join(str(value) for value in values))
+    lines += ['=' * 80, '']
+    products.append('\n'.join(lines))
+  return products
+
+
+def rows_per_second(parser, products:list, repeat:int) -> float:
+  best = None
+  rows = 0
+  for _ in range(repeat):
+    start = time.perf_counter()
+    rows = sum(len(parser(product).reports) for product in products)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return rows / best
+
+
+def main(data_file:str='./raw.json', repeat:int=5):
+  with open(data_file) as file:
+    products = render_products(loads(file.read()))
+  for product in products:
+    if WeatherReport(product).to_dict() != LegacyWeatherReport(product).to_dict():
+      raise Exception('Parsers disagree on a product')
+  before = rows_per_second(LegacyWeatherReport, products, repeat)
+  after = rows_per_second(WeatherReport, products, repeat)
+  print(f'{len(products)} products')
+  print(f'before: {before:,.0f} rows/s')
+  print(f'after:  {after:,.0f} rows/s ({after / before:.1f}x)')
+  return {'before': before, 'after': after}
+
+
+if __name__ == '__main__':
+  main(*sys.argv[1:2], *map(int, sys.argv[2:3]))
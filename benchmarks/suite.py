@@ -0,0 +1,156 @@
+"""
+Timings of tree and forest training and prediction on synthetic data, and of report parsing and
+feature construction on raw.json. Results are written as JSON; with --compare, they are checked
+against a stored baseline and the run fails if any benchmark got slower than the tolerance allows.
+
+  python -m benchmarks.suite [--rows N] [--attributes N] [--values N] [--labels N] [--repeat N]
+                             [--only PREFIX] [--output results.json]
+                             [--compare baseline.json] [--tolerance 0.25]
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from json import loads
+from benchmarks.synthetic import make_examples
+from benchmarks.bench_parser import render_products
+from src.data_collector import WeatherReport
+from src.decision_tree import DecisionTree
+from src.random_forest import RandomForest
+from src.tree_trainer import LevelWiseTrainer
+
+def measure(run:callable, repeat:int) -> dict:
+  """
+  Time run repeat times.
+
+  Returns:
+    dict of the best and median time in seconds and the number of runs
+  """
+  times = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    run()
+    times.append(time.perf_counter() - start)
+  return {'best': min(times), 'median': statistics.median(times), 'repeat': repeat}
+
+def synthetic_benchmarks(args) -> dict:
+  """
+  Benchmarks on generated data, as name to (run, items processed per run).
+  """
+  examples, attributes = make_examples(args.rows, args.attributes, args.values, args.labels)
+  samples = [example[:-1] for example in examples]
+  tree = DecisionTree(examples, list(attributes))
+  compiled = tree.compile()
+  matrix = compiled.encode(samples)
+  forest = RandomForest(10, max(1, args.attributes // 2), 5, seed=0)
+  forest.train(examples, list(attributes))
+  forest.compile()
+  def train_forest():
+    RandomForest(10, max(1, args.attributes // 2), 5, seed=0).train(examples, list(attributes))
+  return {
+    'tree.train.python': (lambda: DecisionTree(examples, list(attributes)), len(examples)),
+    'tree.train.numpy': (lambda: DecisionTree(examples, list(attributes), engine='numpy'), len(examples)),
+    'tree.train.levelwise': (lambda: LevelWiseTrainer().fit(examples, list(attributes)), len(examples)),
+    'tree.predict': (lambda: [tree.predict(sample) for sample in samples], len(samples)),
+    'tree.predict_many': (lambda: tree.predict_many(samples), len(samples)),
+    'tree.encode': (lambda: compiled.encode(samples), len(samples)),
+    'tree.route': (lambda: compiled.predict_codes(matrix), len(samples)),
+    'forest.train': (train_forest, len(examples)),
+    'forest.predict': (lambda: [forest.predict(sample) for sample in samples], len(samples)),
+    'forest.predict_batch': (lambda: forest.predict_batch(samples), len(samples)),
+  }
+
+def data_benchmarks(args) -> dict:
+  """
+  Benchmarks on the real data file.
+  """
+  import lab2
+  with open(args.data_file) as file:
+    data = loads(file.read())
+  products = render_products(data)
+  rows = sum(len(WeatherReport(product).reports) for product in products)
+  days = len(data['training'])
+  return {
+    'parse.weather_report': (lambda: [WeatherReport(product) for product in products], rows),
+    'features.precip': (lambda: lab2.construct_precip_data(data, 'training'), days),
+    'features.hotter': (lambda: lab2.construct_hotter_daily_data(data, 'training'), days),
+    'features.both': (lambda: lab2.construct_features([lab2.hotter_spec, lab2.precip_spec], data, 'training'), days),
+  }
+
+def run(args) -> dict:
+  benchmarks = {}
+  benchmarks.update(synthetic_benchmarks(args))
+  benchmarks.update(data_benchmarks(args))
+  results = {}
+  for name, (benchmark, items) in benchmarks.items():
+    if args.only and not any(name.startswith(prefix) for prefix in args.only):
+      continue
+    result = measure(benchmark, args.repeat)
+    result['items'] = items
+    result['items_per_second'] = items / result['best'] if result['best'] > 0 else None
+    results[name] = result
+    print(f'{name:24} {result["best"] * 1000:10.2f} ms  {result["items_per_second"] or 0:14,.0f} items/s')
+  return {
+    'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'only', 'tolerance')},
+    'environment': {'python': platform.python_version(), 'machine': platform.machine(), 'system': platform.system()},
+    'benchmarks': results,
+  }
+
+def compare(results:dict, baseline:dict, tolerance:float) -> list:
+  """
+  Compare best times against a baseline run.
+
+  Returns:
+    names of the benchmarks more than tolerance (a fraction) slower than the baseline
+  """
+  if baseline.get('config') != results.get('config'):
+    print('warning: baseline was run with a different configuration', baseline.get('config'))
+  regressions = []
+  for name, result in results['benchmarks'].items():
+    before = baseline['benchmarks'].get(name)
+    if before is None:
+      print(f'{name:24} new')
+      continue
+    ratio = result['best'] / before['best']
+    status = 'ok'
+    if ratio > 1 + tolerance:
+      status = 'REGRESSION'
+      regressions.append(name)
+    elif ratio < 1 - tolerance:
+      status = 'faster'
+    print(f'{name:24} {before["best"] * 1000:10.2f} ms -> {result["best"] * 1000:10.2f} ms  {ratio:5.2f}x  {status}')
+  return regressions
+
+def parse_args(argv:list=None):
+  parser = argparse.ArgumentParser(description='Benchmark training, inference, parsing and feature construction.')
+  parser.add_argument('--rows', type=int, default=2000, help='synthetic examples')
+  parser.add_argument('--attributes', type=int, default=40, help='synthetic attributes')
+  parser.add_argument('--values', type=int, default=3, help='values per synthetic attribute')
+  parser.add_argument('--labels', type=int, default=2, help='synthetic answers')
+  parser.add_argument('--repeat', type=int, default=5, help='runs per benchmark, the best is reported')
+  parser.add_argument('--data-file', default='./raw.json', help='data store for parsing and feature benchmarks')
+  parser.add_argument('--only', nargs='*', help='run only benchmarks starting with these prefixes')
+  parser.add_argument('--output', help='write results as JSON to this file')
+  parser.add_argument('--compare', help='baseline JSON to compare against')
+  parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against the baseline, as a fraction')
+  return parser.parse_args(argv)
+
+def main(argv:list=None) -> int:
+  args = parse_args(argv)
+  results = run(args)
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump(results, file, indent=1)
+  if args.compare:
+    with open(args.compare) as file:
+      regressions = compare(results, json.load(file), args.tolerance)
+    if regressions:
+      print('regressions:', ', '.join(regressions))
+      return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
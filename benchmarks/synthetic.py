@@ -0,0 +1,50 @@
+"""
+Synthetic training data shaped like the lab2 feature vectors, scalable in rows, attributes and the
+number of attribute values and answers.
+"""
+import random
+
+def value_set(count:int) -> list:
+  """
+  Values an attribute takes: False/True/None like the real features while they fit, integers beyond.
+  """
+  return [False, True, None][:count] if count <= 3 else list(range(count))
+
+def label_set(count:int) -> list:
+  """
+  Answers: False/True like the real answers while they fit, integers beyond. Never None, which trees
+  do not hold as a leaf value.
+  """
+  return [False, True][:count] if count <= 2 else list(range(count))
+
+def make_examples(rows:int=1000, attributes:int=20, values:int=3, labels:int=2, informative:int=3, noise:float=0.1, seed:int=0):
+  """
+  Generate labelled examples whose answer depends on a few attributes, so trees have structure to find.
+
+  Args:
+    rows - number of examples.
+    attributes - number of attributes, not counting the answer.
+    values - distinct values per attribute.
+    labels - distinct answers.
+    informative - attributes the answer is computed from.
+    noise - fraction of examples given a random answer.
+    seed - seed of the generator, the same arguments always give the same data.
+
+  Returns:
+    [examples, attribute names] - tuples with the answer last, and names with the answer name last.
+  """
+  rng = random.Random(seed)
+  options = value_set(values)
+  answers = label_set(labels)
+  informative = min(informative, attributes)
+  examples = []
+  for _ in range(rows):
+    codes = [rng.randrange(values) for _ in range(attributes)]
+    if rng.random() < noise:
+      answer = rng.randrange(labels)
+    else:
+      # Larger informative codes lead to later answers, so each informative attribute carries information alone
+      answer = sum(codes[:informative]) * labels // (informative * (values - 1) + 1)
+    examples.append(tuple(options[code] for code in codes) + (answers[answer],))
+  names = [f'ATTRIBUTE {i}' for i in range(attributes)] + ['ANSWER']
+  return [examples, names]
@@ -1,20 +1,35 @@
-import requests
-import re
 from json import dumps, loads
 from datetime import date, timedelta
-from src.data_collector import WeatherReport
+from math import inf
+from src.data_collector import WeatherReport, CF6Fetcher
+from src.cf6_archive import CF6Archive
 from src.decision_tree import DecisionTree
 from src.random_forest import RandomForest
+from src.model_cache import ModelCache
+from src.weather_store import WeatherStore, STORE_EXTENSION
+from src.forecaster import Forecaster
+from src.features import FeatureSpec, FeatureTable, Threshold, Compare, build_features
 
 cities = [
   'BUF','DTW','ART','CLE','GRR','LAN','AZO','TOL','ERI','FWA','SBN','PIT',
   'MGW','MDT','BFD','CVG','CMH','DAY','ORD','FNT','MBS','MKG','IND','MKE','ROC'
 ]
 
+# Trained models reused across predict calls. Set model_cache.directory to also keep them on disk.
+model_cache = ModelCache()
+
 def data_store(file='./raw.json',operation='r',data=None,indent=None):
   """
   Open a file and either read and parse its JSON, or stringify JSON and write to file. Pass in indent to add pretty margins.
+  Files ending in .wxs are columnar weather stores (see WeatherStore) and are read and written in the same format.
+  Reading a store deserializes every cell; get_training_data keeps it columnar instead.
   """
+  if file.endswith(STORE_EXTENSION):
+    if operation == 'r':
+      return WeatherStore.open(file).to_aggregate()
+    elif operation == 'w':
+      WeatherStore.from_aggregate(data).write(file)
+    return
   with open(file, operation) as file:
     if operation == 'r':
       json_str = file.read()
@@ -23,11 +38,20 @@ def data_store(file='./raw.json',operation='r',data=None,indent=None):
       file.write(dumps(data,indent=indent))
 
 
-def get_training_data(data_file:str='./raw.json'):
+def get_training_data(data_file:str='./raw.json', fetcher:CF6Fetcher=None, archive:CF6Archive=None):
   """
   Read from data file or query forecast.weather.gov and parse to WeatherReport format, writing contents to file.
+  Products are downloaded concurrently by fetcher (a default CF6Fetcher if not provided). Products that still
+  fail after retries are reported and skipped.
+  With an archive, the data file is refreshed incrementally instead: only new or changed products are
+  fetched and merged into it (see CF6Archive).
+  A .wxs data file is returned as its open WeatherStore, which construct_features reads column by column.
   """
+  if archive is not None:
+    return refresh_training_data(data_file, archive, fetcher)
   try:
+    if data_file.endswith(STORE_EXTENSION):
+      return WeatherStore.open(data_file)
     return data_store(data_file)
   except OSError as ose: {
     print(ose, 'Fetching data...')
@@ -37,19 +61,43 @@ def get_training_data(data_file:str='./raw.json'):
     'training': {},
     'testing': {}
   }
-  for city in cities:
-    for i in range(50):
-      res = requests.get(f'https://forecast.weather.gov/product.php?site=BUF&issuedby={city}&product=CF6&format=txt&version={i+1}&glossary=0')
-      report_string = re.search('(?:<pre.*?>)(.+)(?=</pre>)', res.text, re.DOTALL).group(1)
-      wr = WeatherReport(report_string).to_dict()
-      # print(wr)
-      subset = 'training' if i > 13 else 'testing'
-      for date in wr['reports'].keys():
-        if date not in aggregate[subset]: 
-          aggregate[subset][date] = {}
-        aggregate[subset][date][city] = wr['reports'][date]
-      print(city, i+1, 'done')
+  if fetcher is None:
+    fetcher = CF6Fetcher()
+  for city, version, wr in fetcher.fetch_all(cities, range(1, 51)):
+    if isinstance(wr, Exception):
+      print(city, version, 'failed:', wr)
+      continue
+    wr = wr.to_dict()
+    # print(wr)
+    subset = 'training' if version > 14 else 'testing'
+    for date in wr['reports'].keys():
+      if date not in aggregate[subset]: 
+        aggregate[subset][date] = {}
+      aggregate[subset][date][city] = wr['reports'][date]
+    print(city, version, 'done')
+  data_store(data_file,operation='w',data=aggregate)
+  return aggregate
+
+
+def refresh_training_data(data_file:str, archive:CF6Archive, fetcher:CF6Fetcher=None):
+  """
+  Fetch new or changed products into the archive and merge them into the data file, creating it if needed.
+  Products are only marked merged once the data file is written, so an interrupted refresh is resumed.
+  """
+  try:
+    aggregate = data_store(data_file)
+  except OSError:
+    aggregate = {
+      'attributes': WeatherReport.attributes[1:],
+      'training': {},
+      'testing': {}
+    }
+  for city, result in archive.update(fetcher if fetcher is not None else CF6Fetcher(), cities).items():
+    if isinstance(result, Exception):
+      print(city, 'failed:', result)
+  merged = archive.merge_pending(aggregate)
   data_store(data_file,operation='w',data=aggregate)
+  archive.mark_merged(merged)
   return aggregate
 
 
@@ -69,216 +117,144 @@ def check_precip(amount:str|float,threshold=0.2)->bool:
   return check_missing_attribute(amount, threshold, lambda x,y: x > y)
 
 
-def construct_precip_data(weather_data:dict,nested=None):
+# Rain or snow above 0.2 in and the departure from normal temperature at every station, the day before the target
+precip_spec = FeatureSpec(
+  [Threshold('WTR PCPN', city) for city in cities]
+  + [Threshold('SNOW', city) for city in cities]
+  + [Compare('DEP', city, 'ROC', 'less') for city in cities],
+  Threshold('WTR PCPN', 'ROC', lag=0, name='PRECIPITATION TODAY'),
+  required_days=(2, 3, 4, 5),
+  required_reports={'ROC': (1, 2)},
+)
+
+hotter_spec = FeatureSpec(
+  [Threshold('WTR PCPN', city) for city in cities]
+  + [Threshold('SNOW', city) for city in cities]
+  + [Compare('DEP', city, 'ROC', 'more') for city in cities]
+  + [Compare('AVG TEMP (F)', city, 'ROC', 'more') for city in cities if city != 'ROC'],
+  Compare('AVG TEMP (F)', 'ROC', 'ROC', 'more', lag=0, other_lag=1, name='HOTTER TODAY'),
+  required_days=(2, 3, 4, 5),
+  required_reports={'ROC': (1, 2)},
+)
+
+
+def construct_features(specs:list, weather_data:dict|WeatherStore, nested=None) -> list:
   """
-  Contruct vectors for checking if there will be precipitation in Rochester on a given day.
+  Build the vectors of several feature specs in one pass over the data.
   If nested parameter is 'training' or 'testing', then enough data exists to report the actual
   answer. If not, the answer attribute is omitted from the vector.
+  weather_data can also be a WeatherStore, whose nested subset is read straight from its columns.
   """
-  attributes = weather_data['attributes']
-  sample_data = weather_data[nested] if nested is not None else weather_data
   generate_answer = nested == 'training' or nested == 'testing'
-  new_attributes = []
-  data = []
-  # 0-1, precip indices
-  # else, check_missing_attr
-  attribute_indices = [
-    attributes.index('WTR PCPN'),
-    attributes.index('SNOW'),
-    attributes.index('DEP'),
-  ]
-  rain_ind = attribute_indices[0]
-  greater_than = lambda x,y: x > y
-  less_than = lambda x,y: x < y
-
-  for i in range(len(attribute_indices)):
-    for city in cities:
-      if i < 2:
-        new_attributes.append(f'{attributes[attribute_indices[i]]} IN {city} {1} DAY AGO')
-      elif i == 2:
-        new_attributes.append(f'{city} LESS {attributes[attribute_indices[i]]} THAN ROC {1} DAY AGO')
-  if generate_answer: new_attributes.append('PRECIPITATION TODAY')
-
-  for day in sample_data.keys():
-    prev_day = WeatherReport.date_to_str(WeatherReport.str_to_date(day) - timedelta(days=1))
-    prev_two_day = WeatherReport.date_to_str(WeatherReport.str_to_date(day) - timedelta(days=2))
-    prev_three_day = WeatherReport.date_to_str(WeatherReport.str_to_date(day) - timedelta(days=3))
-    prev_four_day = WeatherReport.date_to_str(WeatherReport.str_to_date(day) - timedelta(days=4))
-    if (
-      sample_data.get(prev_day,None) is None or 
-      sample_data.get(prev_two_day,None) is None or 
-      sample_data.get(prev_three_day,None) is None or 
-      sample_data.get(prev_four_day,None) is None or 
-      sample_data[day].get('ROC',None) is None or
-      sample_data[prev_day].get('ROC',None) is None
-    ):
-      continue
-    roc = {}
-    roc['today'] = sample_data[day]['ROC']
-    roc['prev'] = sample_data[prev_day]['ROC']
-    if generate_answer: 
-      tomorrow = WeatherReport.date_to_str(WeatherReport.str_to_date(day) + timedelta(days=1))
-      if sample_data.get(tomorrow,None) is None: continue
-      tomorrw_data = sample_data[tomorrow].get('ROC',None)
-      if tomorrw_data is None: continue
-      roc['tomorrow'] = tomorrw_data
-    attrs = []
-    for i in range(len(attribute_indices)):
-      ai = attribute_indices[i]
-      roc_prev_attr = roc['today'][ai]
-      for city in cities:
-        if sample_data[day].get(city, None) is None:
-          attrs.append(None)
-          continue
-        city_prev_attr = sample_data[day][city][ai]
-        if i < 2:
-          attrs.append(check_precip(city_prev_attr))
-        elif i == 2:
-          attrs.append(check_missing_attribute(city_prev_attr,roc_prev_attr,less_than))
-    if generate_answer: attrs.append(check_precip(roc['tomorrow'][rain_ind]))
-    data.append(tuple(attrs))
-
-  if nested != 'training':
-    data = tuple(map(lambda x: x[:-1],data))
-    new_attributes = new_attributes[:-1]
-    obj = [data, new_attributes]
-    if nested == 'testing':
-      answers = tuple(map(lambda x: x[len(x) - 1],data))
-      obj.append(answers)
-    return obj
-  return (data, new_attributes)
-
-
-def construct_hotter_daily_data(weather_data:dict,nested=None):
+  needed = list(dict.fromkeys(attribute for spec in specs for attribute in spec.attributes()))
+  if isinstance(weather_data, WeatherStore):
+    if nested is None:
+      raise Exception('A weather store needs the subset to build features of')
+    table = FeatureTable.from_store(weather_data, nested, needed, cities)
+  else:
+    sample_data = weather_data[nested] if nested is not None else weather_data
+    table = FeatureTable.from_dict(sample_data, weather_data['attributes'], needed, cities)
+  results = []
+  for data, new_attributes in build_features(specs, table, generate_answer):
+    if nested != 'training':
+      data = tuple(map(lambda x: x[:-1],data))
+      new_attributes = new_attributes[:-1]
+      obj = [data, new_attributes]
+      if nested == 'testing':
+        answers = tuple(map(lambda x: x[len(x) - 1],data))
+        obj.append(answers)
+      results.append(obj)
+    else:
+      results.append((data, new_attributes))
+  return results
+
+
+def construct_precip_data(weather_data:dict|WeatherStore,nested=None):
+  """
+  Contruct vectors for checking if there will be precipitation in Rochester on a given day.
+  If nested parameter is 'training' or 'testing', then enough data exists to report the actual
+  answer. If not, the answer attribute is omitted from the vector.
+  """
+  return construct_features([precip_spec], weather_data, nested)[0]
+
+
+def construct_hotter_daily_data(weather_data:dict|WeatherStore,nested=None):
   """
   Contruct vectors for checking if it will be hotter in Rochester than the previous day.
   If nested parameter is 'training' or 'testing', then enough data exists to report the actual
   answer. If not, the answer attribute is omitted from the vector.
   """
-  attributes = weather_data['attributes']
-  sample_data = weather_data[nested] if nested is not None else weather_data
-  generate_answer = nested == 'training' or nested == 'testing'
-  new_attributes = []
-  data = []
-  # 0-1, precip indices
-  # else, check_missing_attr
-  attribute_indices = [
-    attributes.index('WTR PCPN'),
-    attributes.index('SNOW'),
-    attributes.index('DEP'),
-    attributes.index('AVG TEMP (F)')
-  ]
-  temp_ind = attribute_indices[len(attribute_indices)-1]
-  greater_than = lambda x,y: x > y
-
-  for i in range(len(attribute_indices)):
-    for city in cities:
-      if i < 2:
-        new_attributes.append(f'{attributes[attribute_indices[i]]} IN {city} {1} DAY AGO')
-      elif city == 'ROC' and i == len(attribute_indices) - 1:
-        continue
-      # elif i == 2:
-      #   new_attributes.append(f'{city} LESS {attributes[attribute_indices[i]]} THAN ROC {1} DAY AGO')
-      else:
-        new_attributes.append(f'{city} MORE {attributes[attribute_indices[i]]} THAN ROC {1} DAY AGO')
-  if generate_answer: new_attributes.append('HOTTER TODAY')
-
-  for day in sample_data.keys():
-    prev_day = WeatherReport.date_to_str(WeatherReport.str_to_date(day) - timedelta(days=1))
-    prev_two_day = WeatherReport.date_to_str(WeatherReport.str_to_date(day) - timedelta(days=2))
-    prev_three_day = WeatherReport.date_to_str(WeatherReport.str_to_date(day) - timedelta(days=3))
-    prev_four_day = WeatherReport.date_to_str(WeatherReport.str_to_date(day) - timedelta(days=4))
-    if (
-      sample_data.get(prev_day,None) is None or 
-      sample_data.get(prev_two_day,None) is None or 
-      sample_data.get(prev_three_day,None) is None or 
-      sample_data.get(prev_four_day,None) is None or 
-      sample_data[day].get('ROC',None) is None or
-      sample_data[prev_day].get('ROC',None) is None
-    ):
-      continue
-    roc = {}
-    roc['today'] = sample_data[day]['ROC']
-    roc['prev'] = sample_data[prev_day]['ROC']
-    if generate_answer: 
-      tomorrow = WeatherReport.date_to_str(WeatherReport.str_to_date(day) + timedelta(days=1))
-      if sample_data.get(tomorrow,None) is None: continue
-      tomorrw_data = sample_data[tomorrow].get('ROC',None)
-      if tomorrw_data is None: continue
-      roc['tomorrow'] = tomorrw_data
-    attrs = []
-    for i in range(len(attribute_indices)):
-      ai = attribute_indices[i]
-      roc_prev_attr = roc['today'][ai]
-      for city in cities:
-        if sample_data[day].get(city, None) is None:
-          attrs.append(None)
-          continue
-        city_prev_attr = sample_data[day][city][ai]
-        if i < 2:
-          attrs.append(check_precip(city_prev_attr))
-        elif city == 'ROC' and i == len(attribute_indices) - 1:
-          continue
-          # attrs.append(roc_today[ai] > roc_prev_attr)
-        # elif i == 2:
-        #   attrs.append(check_missing_attribute(city_prev_attr,roc_prev_attr,less_than))
-        else:
-          attrs.append(check_missing_attribute(city_prev_attr,roc_prev_attr,greater_than))
-    if generate_answer: attrs.append(roc['tomorrow'][temp_ind] > roc['today'][temp_ind])
-    data.append(tuple(attrs))
-
-  if nested != 'training':
-    data = tuple(map(lambda x: x[:-1],data))
-    new_attributes = new_attributes[:-1]
-    obj = [data, new_attributes]
-    if nested == 'testing':
-      answers = tuple(map(lambda x: x[len(x) - 1],data))
-      obj.append(answers)
-    return obj
-  return (data, new_attributes)
+  return construct_features([hotter_spec], weather_data, nested)[0]
+
+
+def parse_day(reports:dict):
+  """
+  Parse a day of station report strings. The date is the latest day up to today with the day of month
+  of the first report.
+
+  Returns:
+    [date, dict of station to report row]
+  """
+  day = None
+  rows = {}
+  for city, report in reports.items():
+    wr = WeatherReport.parse_report_str(report)
+    if day is None:
+      day = date.today()
+      while day.day != wr[0]:
+        day = day - timedelta(days=1)
+    rows[city] = wr[1:]
+  return [day, rows]
+
+
+def new_forecaster() -> Forecaster:
+  """
+  Forecaster for the targets predict answers. Push each new day of reports with parse_day and call forecast.
+  """
+  return Forecaster([hotter_spec, precip_spec], cities)
 
 
 def predict(model_type:str,day5:dict,day4:dict,day3:dict,day2:dict,day1:dict):
-  aggregate = { 
-    'attributes': WeatherReport.attributes[1:],
-    'reports': {}
-    }
-  for arg in [day1,day2,day3,day4,day5]:
-    day = None
-    for city, report in arg.items():
-      wr = WeatherReport.parse_report_str(report)
-      if day is None:
-        d = date.today()
-        while d.day != wr[0]:
-          d = d - timedelta(days=1)
-        day = WeatherReport.date_to_str(d)
-      report = wr[1:]
-      if aggregate['reports'].get(day, None) is None: aggregate['reports'][day] = {}
-      aggregate['reports'][day][city] = report
-    # aggregate[
-    #   WeatherReport.date_to_str(WeatherReport.str_to_date(day) + timedelta(days=1))
-    # ] = None
-  # print(aggregate['reports'].keys())
-
-  report_data = get_training_data('./raw1.json')
-  set1, attr1 = construct_hotter_daily_data(report_data, 'training')
-  set2, attr2 = construct_precip_data(report_data, 'training')
-  actual1, _1 = construct_hotter_daily_data(aggregate, 'reports')
-  actual2, _2 = construct_precip_data(aggregate, 'reports')
+  forecaster = new_forecaster()
+  for arg in [day5,day4,day3,day2,day1]:
+    forecaster.push(*parse_day(arg))
+  return forecast(model_type, forecaster)
+
+
+def forecast(model_type:str, forecaster:Forecaster):
+  """
+  Predict the day after the newest day in forecaster, answers in the order of predict.
+  """
+  # Unlabelled vectors drop their last column, as construct_features does for them
+  (actual1, _1), (actual2, _2) = [(row[:-1], names[:-1]) for row, names in forecaster.features()]
 
   if model_type == 'besttree':
-    model1 = DecisionTree(set1, list(attr1))
-    model3 = DecisionTree(set2, list(attr2))
-    return [model1.predict(actual1[0]), None, model3.predict(actual2[0])]
+    model1 = trained_model(model_type, construct_hotter_daily_data, {'max_depth': inf, 'threshold': 0.00001}, spec=hotter_spec)
+    model3 = trained_model(model_type, construct_precip_data, {'max_depth': inf, 'threshold': 0.00001}, spec=precip_spec)
+    return [model1.predict(actual1), None, model3.predict(actual2)]
   elif model_type == 'bestforest':
-    model1 = RandomForest(10,len(_1) - 1,4)
-    model3 = RandomForest(10,len(_2) - 1,4)
-    model1.train(set1, list(attr1))
-    model3.train(set2, list(attr2))
-    return [model1.predict(actual1[0]), None, model3.predict(actual2[0])]
+    model1 = trained_model(model_type, construct_hotter_daily_data, {'num_trees': 10, 'num_attributes': len(_1) - 1, 'max_depth': 4}, spec=hotter_spec)
+    model3 = trained_model(model_type, construct_precip_data, {'num_trees': 10, 'num_attributes': len(_2) - 1, 'max_depth': 4}, spec=precip_spec)
+    return [model1.predict(actual1), None, model3.predict(actual2)]
   else: raise Exception('Invalid model')
 
 
+def trained_model(model_type:str, builder:callable, params:dict, data_file:str='./raw1.json', spec:FeatureSpec=None):
+  """
+  Get a model trained on the training data of builder, from model_cache if it was trained before.
+  The training file is only read and its features built on a cache miss. spec is the FeatureSpec
+  builder wraps, so editing it retrains the model.
+  """
+  def train():
+    examples, attributes = builder(get_training_data(data_file), 'training')
+    if model_type == 'besttree':
+      return DecisionTree(examples, list(attributes), params['max_depth'], params['threshold'])
+    model = RandomForest(params['num_trees'], params['num_attributes'], params['max_depth'])
+    model.train(examples, list(attributes))
+    return model
+  return model_cache.get_or_train(data_file, builder, dict(params, model=model_type), train, spec)
+
+
 if __name__ == "__main__":
   # data = get_training_data()
 
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import requests
+from .data_collector import WeatherReport, CF6Fetcher, month_map
+
+class CF6Archive():
+  """
+  On-disk cache of raw CF6 products, one file per station, month and year, with a manifest recording
+  what has been fetched and merged. update() walks each city's versions from newest to oldest and stops
+  at the first product it already has, so a refresh only downloads new or changed products. Progress is
+  saved after every product, so an interrupted run picks up where it stopped. Each product's version is
+  kept current across refreshes, so products age from 'testing' into 'training' as newer ones appear.
+
+  Layout:
+    manifest.json - products (hash, version, subset, merged flag), validators per URL and per-city walk state.
+    STATION/YYYY-MM.txt - latest raw text of each product.
+  """
+  def __init__(self, directory:str, max_versions:int=50, training_after:int=14):
+    """
+    Args:
+      directory - folder holding the products and manifest.
+      max_versions - oldest version fetched for a city.
+      training_after - products now at a version above this go to 'training', others to 'testing'.
+    """
+    self.directory = directory
+    self.max_versions = max_versions
+    self.training_after = training_after
+    self.manifest_path = os.path.join(directory, 'manifest.json')
+    try:
+      with open(self.manifest_path) as file:
+        self.manifest = json.load(file)
+    except OSError:
+      self.manifest = {'products': {}, 'urls': {}, 'cities': {}}
+
+  def save_manifest(self):
+    os.makedirs(self.directory, exist_ok=True)
+    temporary = self.manifest_path + '.tmp'
+    with open(temporary, 'w') as file:
+      json.dump(self.manifest, file, indent=1)
+    os.replace(temporary, self.manifest_path)
+
+  @staticmethod
+  def product_key(wr:WeatherReport) -> str:
+    return f'{wr.city}/{int(wr.year):04d}-{month_map(wr.month):02d}'
+
+  def subset_of(self, version:int) -> str:
+    return 'training' if version > self.training_after else 'testing'
+
+  def product_path(self, key:str) -> str:
+    return os.path.join(self.directory, key + '.txt')
+
+  def read_product(self, key:str) -> str:
+    with open(self.product_path(key)) as file:
+      return file.read()
+
+  def store_product(self, key:str, text:str, version:int):
+    """
+    Write a product's raw text, found at version, and queue it for merging.
+    """
+    path = self.product_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as file:
+      file.write(text)
+    os.replace(path + '.tmp', path)
+    self.manifest['products'][key] = {
+      'sha256': hashlib.sha256(text.encode()).hexdigest(),
+      'version': version,
+      'subset': self.subset_of(version),
+      'merged': False,
+    }
+    self.save_manifest()
+
+  def walk_city(self, fetcher:CF6Fetcher, city:str) -> int:
+    """
+    Fetch a city's versions newest first, storing new or changed products. Older issuances of a product
+    already seen in the walk are skipped. Once a previous walk of the city finished, reaching a product
+    as it was stored before this walk ends it, since everything older is already stored. The versions of
+    those older products moved by as much as the product that ended the walk, and their subsets follow.
+
+    Returns:
+      number of requests made
+    """
+    state = self.manifest['cities'].setdefault(city, {'complete': False})
+    complete = state['complete']
+    state['complete'] = False
+    self.save_manifest()
+    stored_before = {key: product['sha256'] for key, product in self.manifest['products'].items()}
+    seen = set()
+    # Version each product reached in this walk is at now, and how far the products not reached moved
+    current = {}
+    shift = 0
+    requests_made = 0
+    for version in range(1, self.max_versions + 1):
+      url_key = f'{city}/{version}'
+      validators = self.manifest['urls'].get(url_key, {})
+      headers = {}
+      if validators.get('etag'): headers['If-None-Match'] = validators['etag']
+      if validators.get('last_modified'): headers['If-Modified-Since'] = validators['last_modified']
+      requests_made += 1
+      try:
+        res = fetcher.get(city, version, headers)
+      except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+          break
+        raise
+      if res.status_code == 304:
+        if complete: break
+        seen.add(validators.get('product'))
+        continue
+      text = CF6Fetcher.extract_product(res.text)
+      key = CF6Archive.product_key(WeatherReport(text))
+      self.manifest['urls'][url_key] = {
+        'etag': res.headers.get('ETag'),
+        'last_modified': res.headers.get('Last-Modified'),
+        'product': key,
+      }
+      if stored_before.get(key) == hashlib.sha256(text.encode()).hexdigest():
+        if complete:
+          shift = version - self.manifest['products'][key].get('version', version)
+          current.setdefault(key, version)
+          break
+        current.setdefault(key, version)
+        seen.add(key)
+        continue
+      if key in seen:
+        continue
+      seen.add(key)
+      current[key] = version
+      self.store_product(key, text, version)
+    self.age_products(city, current, shift)
+    state['complete'] = True
+    self.save_manifest()
+    return requests_made
+
+  def age_products(self, city:str, current:dict, shift:int):
+    """
+    Bring the versions of a city's products up to date after a walk and re-file the products whose
+    subset changed, so they are merged into their new subset.
+
+    Args:
+      city - station walked.
+      current - product key to the version the walk found it at.
+      shift - versions added to the products the walk did not reach.
+    """
+    for key, product in self.manifest['products'].items():
+      if not key.startswith(city + '/'): continue
+      if key in current:
+        product['version'] = current[key]
+      elif 'version' in product:
+        product['version'] += shift
+      else:
+        # Stored before versions were kept
+        continue
+      subset = self.subset_of(product['version'])
+      if product['subset'] != subset:
+        product['subset'] = subset
+        product['merged'] = False
+
+  def merge_pending(self, aggregate:dict) -> list:
+    """
+    Merge every stored product not yet merged into an aggregate, newest rows replacing older ones.
+    A product's rows are taken out of the other subsets, where they were if the product changed subset.
+    Products are streamed from disk so only one row is held at a time.
+
+    Returns:
+      keys of the merged products, to be passed to mark_merged once the aggregate is saved
+    """
+    merged = []
+    for key, product in self.manifest['products'].items():
+      if product['merged']: continue
+      subset = aggregate.setdefault(product['subset'], {})
+      others = [aggregate[name] for name in ('training', 'testing') if name != product['subset'] and name in aggregate]
+      with open(self.product_path(key), newline='') as file:
+        for report in WeatherReport.iter_rows(file):
+          day, _, city = report[0].rpartition('-')
+          for other in others:
+            if city in other.get(day, {}):
+              del other[day][city]
+              if not other[day]: del other[day]
+          subset.setdefault(day, {})[city] = report[1:]
+      merged.append(key)
+    return merged
+
+  def mark_merged(self, keys:list):
+    for key in keys:
+      self.manifest['products'][key]['merged'] = True
+    self.save_manifest()
+
+  def update(self, fetcher:CF6Fetcher, cities:list) -> dict:
+    """
+    Fetch new or changed products for the cities. A city that fails is left incomplete and walked in
+    full on the next run.
+
+    Returns:
+      dict of city to number of requests made, or the exception that stopped its walk
+    """
+    results = {}
+    for city in cities:
+      try:
+        results[city] = self.walk_city(fetcher, city)
+      except Exception as e:
+        results[city] = e
+    return results
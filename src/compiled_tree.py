@@ -0,0 +1,243 @@
+import numpy as np
+from .decision_tree import DecisionTree
+from .encoded_dataset import Codebook
+
+class CompiledTree():
+  """
+  A trained DecisionTree flattened into parallel arrays so a batch of examples can be routed through it
+  with vectorized indexing instead of walking node objects one example at a time.
+
+  Node 0 is the root. The last node is a dead end reached by values the tree never saw, it predicts None.
+    feature - column asked at each node, -1 for leaves.
+    children - child node of each node per encoded value, shape (nodes, values).
+    leaf - answer code of each leaf, -1 for internal nodes and the dead end.
+    threshold - split threshold of each node, NaN for nodes asking for a value. None if no node has one.
+  Trees with threshold nodes encode examples into a float matrix with a raw number column appended per
+  numeric column, which threshold nodes compare instead of the value code.
+  """
+  def __init__(self, feature, children, leaf, codebook:Codebook, labels:Codebook, depth:int, threshold=None):
+    self.feature = feature
+    self.children = children
+    self.leaf = leaf
+    self.codebook = codebook
+    self.labels = labels
+    self.depth = depth
+    self.threshold = threshold
+    # Arrays as python lists, made by the first predict call
+    self.lists = None
+    self.numeric = []
+    if threshold is not None:
+      asks = ~np.isnan(threshold)
+      self.numeric = sorted(set(feature[asks].tolist()))
+      # Position among the appended number columns of the column each threshold node compares
+      self.raw = np.full(len(feature), -1, dtype=np.intp)
+      self.raw[asks] = np.searchsorted(self.numeric, feature[asks])
+      self.true_code = codebook.encode(True)
+      self.false_code = codebook.encode(False)
+
+  @staticmethod
+  def compile(tree:DecisionTree, codebook:Codebook=None, labels:Codebook=None):
+    """
+    Flatten a tree breadth-first into arrays.
+
+    Args:
+      tree - trained DecisionTree.
+      codebook - value encoding to extend, shared when several trees are scored on one matrix.
+      labels - answer encoding to extend, shared when votes of several trees are added up.
+
+    Returns:
+      CompiledTree
+    """
+    if codebook is None:
+      codebook = Codebook()
+    if labels is None:
+      labels = Codebook(())
+    nodes = [tree]
+    depths = [0]
+    edges = []
+    index = 0
+    while index < len(nodes):
+      node = nodes[index]
+      if node.children is not None:
+        for answer, child in node.children.items():
+          edges.append((index, codebook.encode(answer), len(nodes)))
+          nodes.append(child)
+          depths.append(depths[index] + 1)
+      index += 1
+    dead = len(nodes)
+    feature = np.full(dead + 1, -1, dtype=np.int32)
+    leaf = np.full(dead + 1, -1, dtype=np.int32)
+    children = np.full((dead + 1, len(codebook)), dead, dtype=np.int32)
+    threshold = None
+    for index, node in enumerate(nodes):
+      if node.children is None:
+        leaf[index] = labels.encode(node.value)
+      else:
+        feature[index] = node.best_attr_index
+        if node.split_threshold is not None:
+          if threshold is None:
+            threshold = np.full(dead + 1, np.nan)
+          threshold[index] = node.split_threshold
+    for parent, code, child in edges:
+      children[parent, code] = child
+    return CompiledTree(feature, children, leaf, codebook, labels, max(depths), threshold)
+
+  def num_columns(self) -> int:
+    return int(self.feature.max()) + 1 if (self.feature >= 0).any() else 0
+
+  def columns(self) -> list:
+    """
+    Columns asked by some node of the tree, the only ones routing reads.
+    """
+    return sorted(set(self.feature[self.feature >= 0].tolist()))
+
+  @staticmethod
+  def encode_for(trees:list, examples):
+    """
+    Encode example tuples once for several trees compiled with one codebook.
+    """
+    columns = sorted(set().union(*(tree.columns() for tree in trees)))
+    return trees[0].encode(examples, max(tree.num_columns() for tree in trees), columns)
+
+  def encode_column(self, values:list):
+    """
+    Codes of one column's values. Each distinct value is looked up in the codebook once, then the column
+    is mapped through those codes without building a key per value.
+    """
+    lookup = self.codebook.codes
+    unknown = len(self.codebook)
+    if len(set(map(type, values)) & {bool, int, float}) > 1:
+      # True/1/1.0 are one dict key, but not one codebook key
+      return np.fromiter((lookup.get((value.__class__, value), unknown) for value in values), dtype=np.intp, count=len(values))
+    codes = {value: lookup.get((value.__class__, value), unknown) for value in dict.fromkeys(values)}
+    return np.fromiter(map(codes.__getitem__, values), dtype=np.intp, count=len(values))
+
+  @staticmethod
+  def number_column(values:list):
+    """
+    Raw numbers of one column's values, NaN for values that are not numbers.
+    """
+    if len(set(map(type, values)) & {bool, int, float}) > 1:
+      # True/1/1.0 are one dict key, but True is not a number
+      return np.fromiter((float(value) if DecisionTree.is_number(value) else np.nan for value in values), dtype=np.float64, count=len(values))
+    numbers = {value: float(value) if DecisionTree.is_number(value) else np.nan for value in dict.fromkeys(values)}
+    return np.fromiter(map(numbers.__getitem__, values), dtype=np.float64, count=len(values))
+
+  def encode(self, examples, num_columns:int=None, columns:list=None):
+    """
+    Encode example tuples with the tree's codebook, column by column. Only columns (by default the ones
+    the tree asks) are read, the others are left at the code of an unseen value, which is also the code
+    of values the codebook does not have.
+    """
+    if num_columns is None:
+      num_columns = self.num_columns()
+    if columns is None:
+      columns = self.columns()
+    matrix = np.full((len(examples), num_columns + len(self.numeric)), len(self.codebook), dtype=np.float64 if self.numeric else np.intp)
+    for column in columns:
+      values = [example[column] for example in examples]
+      if column in self.numeric:
+        # Threshold nodes send NaN to the None child
+        values = [None if DecisionTree.is_nan(value) else value for value in values]
+      matrix[:, column] = self.encode_column(values)
+    for position, column in enumerate(self.numeric):
+      matrix[:, num_columns + position] = CompiledTree.number_column([example[column] for example in examples])
+    return matrix
+
+  def route(self, matrix, paths:bool=False):
+    """
+    Route every row of an encoded matrix to its final node, one vectorized step per tree level.
+
+    Args:
+      matrix - encoded examples.
+      paths - return the node of every row at every level instead, shape (depth + 1, rows). Rows stay at
+      their leaf (or the dead end) once they reach it.
+    """
+    node = np.zeros(len(matrix), dtype=np.intp)
+    levels = [node.copy()] if paths else None
+    width = self.children.shape[1]
+    dead = len(self.feature) - 1
+    first_number = matrix.shape[1] - len(self.numeric)
+    for _ in range(self.depth):
+      feature = self.feature[node]
+      moving = np.flatnonzero(feature >= 0)
+      if len(moving) == 0:
+        break
+      values = matrix[moving, feature[moving]].astype(np.intp)
+      if self.numeric:
+        raw = self.raw[node[moving]]
+        compared = np.flatnonzero(raw >= 0)
+        numbers = matrix[moving[compared], first_number + raw[compared]]
+        compared, numbers = compared[~np.isnan(numbers)], numbers[~np.isnan(numbers)]
+        # Numbers take the code of the True or False child, other values keep their own code
+        values[compared] = np.where(numbers <= self.threshold[node[moving[compared]]], self.true_code, self.false_code)
+      known = values < width
+      step = np.full(len(moving), dead, dtype=np.intp)
+      step[known] = self.children[node[moving[known]], values[known]]
+      node[moving] = step
+      if paths: levels.append(node.copy())
+    if paths:
+      levels.extend([node] * (self.depth + 1 - len(levels)))
+      return np.stack(levels)
+    return node
+
+  def predict(self, example):
+    """
+    Predict one example tuple by walking the arrays, like DecisionTree.predict without node objects.
+    """
+    if self.lists is None:
+      # Indexing python lists is much faster than reading numpy scalars one at a time
+      threshold = None if self.threshold is None else self.threshold.tolist()
+      self.lists = (self.feature.tolist(), self.children.tolist(), self.leaf.tolist(), threshold)
+    features, children, leaves, threshold = self.lists
+    lookup = self.codebook.codes
+    width = self.children.shape[1]
+    node = 0
+    feature = features[node]
+    while feature >= 0:
+      value = example[feature]
+      if threshold is not None and threshold[node] == threshold[node] and DecisionTree.is_number(value):
+        code = self.true_code if value <= threshold[node] else self.false_code
+      elif threshold is not None and threshold[node] == threshold[node] and DecisionTree.is_nan(value):
+        code = lookup.get((type(None), None), width)
+      else:
+        code = lookup.get((value.__class__, value), width)
+      if code >= width:
+        return None
+      node = children[node][code]
+      feature = features[node]
+    leaf = leaves[node]
+    return self.labels.decode(leaf) if leaf >= 0 else None
+
+  def predict_codes(self, matrix):
+    """
+    Answer codes for every row of an encoded matrix, -1 where the tree has no answer.
+    """
+    return self.leaf[self.route(matrix)]
+
+  def predict_many(self, examples) -> list:
+    """
+    Predict every example of a batch.
+
+    Args:
+      examples - list of example tuples, or a matrix already encoded with this tree's codebook.
+
+    Returns:
+      list of predictions, None where the tree has no answer (like DecisionTree.predict)
+    """
+    matrix = examples if isinstance(examples, np.ndarray) else self.encode(examples)
+    values = self.labels.values + [None]
+    return [values[code] for code in self.predict_codes(matrix).tolist()]
+
+  def __len__(self):
+    return len(self.feature) - 1
+
+  def __repr__(self):
+    return (
+      "CompiledTree(" +
+      "nodes:" + str(len(self)) +
+      ",depth:" + str(self.depth) +
+      ",values:" + str(self.codebook.values) +
+      ",labels:" + str(self.labels.values) +
+      ")"
+    )
@@ -1,6 +1,14 @@
+import io
 import requests
 import re
+import threading
+import time
+from calendar import monthrange
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
+from string import ascii_letters
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
 
 def month_map(month:str)->int:
   match month:
@@ -54,32 +62,65 @@ class WeatherReport():
     'PK WIND DIR',
   )
 
+  letters = frozenset(ascii_letters)
+  month_pattern = re.compile(r'MONTH:\s+(\w+)')
+  year_pattern = re.compile(r'YEAR:\s+(\w+)')
+  city_pattern = re.compile(r'CF6(\w{3})')
+  # A whole line of 18 or 19 space separated tokens, the first such line being the column numbers
+  row_pattern = re.compile(r' *(?:(?:\w+|[0-9.\-]+) +){17,18}(?:\w+|[0-9.\-]+)')
+
   @staticmethod
   def string_to_type(string:str):
-    if re.search(r'[a-zA-Z]', string) is not None:
+    """
+    Convert a token to int or float, leaving tokens with letters ('M' missing, 'T' trace) as strings.
+    """
+    if string == 'M' or string == 'T':
       return string
-    elif re.search(r'\.',string) is not None:
-      return float(string)
-    else:
+    if string.isdigit():
       return int(string)
+    if not WeatherReport.letters.isdisjoint(string):
+      return string
+    return float(string) if '.' in string else int(string)
 
   @staticmethod
-  def parse_report_str(report_string:str)->tuple[float|str]:
-    data = report_string.split()
-    optional_column_found = len(data) == len(WeatherReport.attributes)
-    parsed_data = []
-    for i in range(len(WeatherReport.attributes)):
-      if not optional_column_found and i > 16:
-        if i > 17: parsed_data.append(WeatherReport.string_to_type(data[i-1]))
-        else: parsed_data.append(None)
-      else: parsed_data.append(WeatherReport.string_to_type(data[i]))
+  def parse_tokens(data:list)->list:
+    """
+    Convert the tokens of a daily row. Rows without the optional 18th column get None in its place.
+    """
+    to_type = WeatherReport.string_to_type
+    if len(data) == len(WeatherReport.attributes):
+      return [to_type(token) for token in data]
+    parsed_data = [to_type(token) for token in data[:17]]
+    parsed_data.append(None)
+    parsed_data.append(to_type(data[17]))
     return parsed_data
 
-  def parse_report(self, report_string:str)->tuple[float|str]:
-    parsed = WeatherReport.parse_report_str(report_string)
-    parsed[0] = date(int(self.year),month_map(self.month),parsed[0]).strftime('%D') + '-' + self.city
-    # print(datetime.strptime(parsed[0],'%m/%d/%y'))
+  @staticmethod
+  def parse_report_str(report_string:str)->tuple[float|str]:
+    return WeatherReport.parse_tokens(report_string.split())
+
+  def date_key(self, day:int)->str:
+    """
+    Key of a day of the report's month, e.g. '02/01/24-ROC'. Keys are built once per product instead of
+    formatting a date for every row. Days outside the month raise like date() does.
+    """
+    if self.date_keys is None:
+      month = month_map(self.month)
+      year = int(self.year)
+      suffix = f'/{year % 100:02d}-{self.city}'
+      self.date_keys = {d: f'{month:02d}/{d:02d}' + suffix for d in range(1, monthrange(year, month)[1] + 1)}
+    key = self.date_keys.get(day) if day.__class__ is int else None
+    if key is None:
+      return date(int(self.year),month_map(self.month),day).strftime('%D') + '-' + self.city
+    return key
+
+  def parse_row(self, tokens:list)->tuple[float|str]:
+    parsed = WeatherReport.parse_tokens(tokens)
+    parsed[0] = self.date_key(parsed[0])
     return tuple(parsed)
+
+  def parse_report(self, report_string:str)->tuple[float|str]:
+    return self.parse_row(report_string.split())
   
   @staticmethod
   def date_to_str(date:datetime):
@@ -96,15 +137,83 @@ class WeatherReport():
       'reports': {}
     }
     for report in self.reports:
-      report_dict['reports'][re.search(r'\S+(?=-)',report[0]).group(0)] = report[1:]
+      report_dict['reports'][report[0].rpartition('-')[0]] = report[1:]
     return report_dict
 
+  @staticmethod
+  def row_tokens(line:str)->list:
+    """
+    Tokens of a line if it is a daily row (or the column numbers heading the rows), otherwise None.
+    """
+    tokens = line.split()
+    if 18 <= len(tokens) <= 19 and WeatherReport.row_pattern.fullmatch(line) is not None:
+      return tokens
+    return None
+
   def __init__(self, report:str):
-    self.month = re.search(r'MONTH:\s+(\w+)',report,re.DOTALL).group(1)
-    self.year = re.search(r'YEAR:\s+(\w+)',report,re.DOTALL).group(1)
-    self.city = re.search(r'CF6(\w{3})',report,re.DOTALL).group(1)
-    report_data = re.findall(r'(?<=\n) *?(?:(?:\w+|[0-9.\-]+) +?){17,18}(?:\w+|[0-9.\-]+)(?=\n)', report)
-    self.reports = tuple(map(lambda r: self.parse_report(r),report_data[1:]))
+    self.month = WeatherReport.month_pattern.search(report).group(1)
+    self.year = WeatherReport.year_pattern.search(report).group(1)
+    self.city = WeatherReport.city_pattern.search(report).group(1)
+    self.date_keys = None
+    # Rows are whole lines, so the first and an unterminated last line never count
+    rows = []
+    for line in report.split('\n')[1:-1]:
+      tokens = WeatherReport.row_tokens(line)
+      if tokens is not None:
+        rows.append(tokens)
+    self.reports = tuple(map(self.parse_row, rows[1:]))
+
+  @classmethod
+  def iter_rows(cls, stream, html:bool=False):
+    """
+    Parse a CF6 product line by line from a file-like object or any iterable of lines (str or bytes),
+    picking up the MONTH, YEAR and station header as it goes. Only one line is held at a time.
+
+    Args:
+      stream - product text, e.g. an open file or a streamed HTTP response.
+      html - the stream is a product page, only the text inside its <pre> block is parsed.
+
+    Yields:
+      daily rows as in WeatherReport.reports, e.g. ('02/01/24-ROC', 38, 35, ...)
+    """
+    report = cls.__new__(cls)
+    report.month = report.year = report.city = None
+    report.date_keys = None
+    in_product = not html
+    first_line = True
+    header_row_skipped = False
+    for line in stream:
+      if isinstance(line, bytes):
+        line = line.decode()
+      if not in_product:
+        start = line.find('<pre')
+        if start < 0 or line.find('>', start) < 0: continue
+        line = line[line.find('>', start) + 1:]
+        in_product = True
+      # Text before the closing tag or at the end of the stream is an unterminated last line
+      if (html and '</pre>' in line) or not line.endswith('\n'):
+        return
+      line = line.rstrip('\n')
+      if report.month is None:
+        match = WeatherReport.month_pattern.search(line)
+        if match is not None: report.month = match.group(1)
+      if report.year is None:
+        match = WeatherReport.year_pattern.search(line)
+        if match is not None: report.year = match.group(1)
+      if report.city is None:
+        match = WeatherReport.city_pattern.search(line)
+        if match is not None: report.city = match.group(1)
+      if first_line:
+        first_line = False
+        continue
+      tokens = WeatherReport.row_tokens(line)
+      if tokens is None: continue
+      if not header_row_skipped:
+        header_row_skipped = True
+        continue
+      if report.month is None or report.year is None or report.city is None:
+        raise Exception('Daily row found before the MONTH, YEAR and station header')
+      yield report.parse_row(tokens)
 
   def __repr__(self):
     return (
@@ -118,14 +227,138 @@ class WeatherReport():
     )
 
 
+class RateLimiter():
+  """
+  Space out requests to each host so no host sees more than a given number of requests per second.
+  """
+  def __init__(self, requests_per_second:float=None):
+    self.interval = 1 / requests_per_second if requests_per_second else 0
+    self.lock = threading.Lock()
+    self.next_slot = {}
+
+  def wait(self, host:str):
+    if not self.interval: return
+    with self.lock:
+      now = time.monotonic()
+      slot = max(now, self.next_slot.get(host, now))
+      self.next_slot[host] = slot + self.interval
+    if slot > now:
+      time.sleep(slot - now)
+
+
+class CF6Fetcher():
+  """
+  Download and parse CF6 products concurrently. Workers share one keep-alive connection pool,
+  retry failed requests with exponential backoff and respect a per-host rate limit. Each worker
+  parses its product as soon as it arrives, so parsing overlaps with the remaining downloads.
+  """
+  base_url = 'https://forecast.weather.gov/product.php'
+  pre_pattern = re.compile('(?:<pre.*?>)(.+)(?=</pre>)', re.DOTALL)
+
+  def __init__(
+    self, base_url:str=None, site:str='BUF', max_workers:int=8, retries:int=3, backoff:float=0.5,
+    requests_per_second:float=None, timeout:float=30
+  ):
+    """
+    Args:
+      base_url - product endpoint, e.g. a local server serving canned pages. Defaults to forecast.weather.gov.
+      site - issuing office passed as the site parameter.
+      max_workers - number of concurrent downloads, also the size of the connection pool.
+      retries - attempts after the first before a product is given up on.
+      backoff - seconds before the first retry, doubled for each further retry.
+      requests_per_second - per-host request limit. None for no limit.
+      timeout - seconds to wait for a response.
+    """
+    if base_url is not None:
+      self.base_url = base_url
+    self.site = site
+    self.max_workers = max_workers
+    self.retries = retries
+    self.backoff = backoff
+    self.timeout = timeout
+    self.rate_limiter = RateLimiter(requests_per_second)
+    self.session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    self.session.mount('http://', adapter)
+    self.session.mount('https://', adapter)
+
+  def params(self, city:str, version:int) -> dict:
+    return {'site': self.site, 'issuedby': city, 'product': 'CF6', 'format': 'txt', 'version': version, 'glossary': 0}
+
+  def get(self, city:str, version:int, headers:dict=None, stream:bool=False) -> requests.Response:
+    """
+    Request one product, retrying connection errors and 429/5xx responses.
+    With stream, the body is left unread for the caller to consume.
+    """
+    host = urlsplit(self.base_url).netloc
+    for attempt in range(self.retries + 1):
+      self.rate_limiter.wait(host)
+      try:
+        res = self.session.get(self.base_url, params=self.params(city, version), headers=headers, timeout=self.timeout, stream=stream)
+        if res.status_code != 429 and res.status_code < 500:
+          res.raise_for_status()
+          return res
+        error = requests.HTTPError(f'{res.status_code} for {res.url}', response=res)
+      except (requests.ConnectionError, requests.Timeout) as e:
+        error = e
+      if attempt < self.retries:
+        time.sleep(self.backoff * 2 ** attempt)
+    raise error
+
+  @staticmethod
+  def extract_product(page:str) -> str:
+    """
+    Pull the product text out of the <pre> block of a product page.
+    """
+    match = CF6Fetcher.pre_pattern.search(page)
+    if match is None:
+      raise Exception('No product found in page')
+    return match.group(1)
+
+  def fetch(self, city:str, version:int) -> WeatherReport:
+    return WeatherReport(CF6Fetcher.extract_product(self.get(city, version).text))
+
+  def iter_rows(self, city:str, version:int):
+    """
+    Stream one product and yield its daily rows as they arrive (see WeatherReport.iter_rows).
+    """
+    res = self.get(city, version, stream=True)
+    res.raw.decode_content = True
+    # Keep the raw response open at end of body so the text wrapper can finish reading it
+    res.raw.auto_close = False
+    with res, io.TextIOWrapper(res.raw, encoding=res.encoding or 'utf-8', newline='') as text:
+      yield from WeatherReport.iter_rows(text, html=True)
+
+  def fetch_all(self, cities:list, versions:list):
+    """
+    Fetch every (city, version) product concurrently.
+
+    Yields:
+      (city, version, report) in the order of cities then versions, report being a WeatherReport,
+      or the exception that made the product fail so one bad product does not lose the rest.
+    """
+    def task(job):
+      try:
+        return self.fetch(*job)
+      except Exception as e:
+        return e
+    jobs = [(city, version) for city in cities for version in versions]
+    with ThreadPoolExecutor(self.max_workers) as pool:
+      for job, report in zip(jobs, pool.map(task, jobs)):
+        yield (*job, report)
+
+  def close(self):
+    self.session.close()
+
+
 def main():
-  for city in ['ROC', 'BUF', 'DTW']:
-    for i in range(1,50):
-      res = requests.get(f'https://forecast.weather.gov/product.php?site=BUF&issuedby={city}&product=CF6&format=txt&version={i}&glossary=0')
-      report_string = re.search('(?:<pre.*?>)(.+)(?=</pre>)', res.text, re.DOTALL).group(1)
-      wr = WeatherReport(report_string)
-      print(wr)
-      print(wr.to_dict())
+  fetcher = CF6Fetcher()
+  for city, version, wr in fetcher.fetch_all(['ROC', 'BUF', 'DTW'], range(1,50)):
+    if isinstance(wr, Exception):
+      print(city, version, wr)
+      continue
+    print(wr)
+    print(wr.to_dict())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,94 @@
+from datetime import date
+import numpy as np
+
+class DayIndex():
+  """
+  Integer day ordinals for the 'mm/dd/yy' keys of a data subset, with a dense day x station presence
+  bitmap. Checking that neighbouring days and a station's reports exist is then array indexing instead
+  of formatting and parsing date strings.
+  """
+  def __init__(self, days:list, stations:list, present):
+    """
+    Args:
+      days - date keys, in the order of the data.
+      stations - station codes, one per column of present.
+      present - bool array of shape (len(days), len(stations)), whether each station reported that day.
+    """
+    self.days = list(days)
+    self.stations = list(stations)
+    self.station_index = {station: i for i, station in enumerate(self.stations)}
+    self.ordinals = np.array([DayIndex.ordinal(day) for day in self.days], dtype=np.int64)
+    self.keys = dict(zip(self.ordinals.tolist(), self.days))
+    self.start = int(self.ordinals.min()) if len(self.days) else 0
+    span = int(self.ordinals.max()) - self.start + 1 if len(self.days) else 0
+    # Column 0 marks days with data, column 1 + s marks station s reporting
+    self.bitmap = np.zeros((span, 1 + len(self.stations)), dtype=bool)
+    positions = self.ordinals - self.start
+    self.bitmap[positions, 0] = True
+    self.bitmap[positions, 1:] = present
+
+  @staticmethod
+  def ordinal(day:str) -> int:
+    """
+    Proleptic Gregorian ordinal of a 'mm/dd/yy' key, the same as WeatherReport.str_to_date(day).toordinal().
+    """
+    month, day_of_month, year = map(int, day.split('/'))
+    # strptime's %y: 69-99 are 1900s, 00-68 are 2000s
+    return date(year + (1900 if year >= 69 else 2000), month, day_of_month).toordinal()
+
+  @staticmethod
+  def from_dict(sample_data:dict, stations:list=None):
+    """
+    Index a date -> station -> row dict. Stations default to every station found, in order of appearance.
+    """
+    if stations is None:
+      stations = list(dict.fromkeys(station for reports in sample_data.values() for station in reports))
+    present = np.array(
+      [[station in reports for station in stations] for reports in sample_data.values()],
+      dtype=bool
+    ).reshape(len(sample_data), len(stations))
+    return DayIndex(sample_data.keys(), stations, present)
+
+  @staticmethod
+  def from_store(store, subset:str):
+    """
+    Index a subset of a WeatherStore, reading only the flags of its first attribute.
+    """
+    from .weather_store import WeatherStore
+    flags = store.column(subset, store.attributes[0])[1]
+    return DayIndex(store.days(subset), store.stations, np.asarray(flags) != WeatherStore.ABSENT)
+
+  def present(self, offset:int=0, station:str=None):
+    """
+    For every day of the index, whether the day offset days away has data, or a report from station.
+
+    Returns:
+      bool array in the order of days
+    """
+    column = 0 if station is None else 1 + self.station_index[station]
+    positions = self.ordinals - self.start + offset
+    inside = (positions >= 0) & (positions < len(self.bitmap))
+    result = np.zeros(len(self.days), dtype=bool)
+    result[inside] = self.bitmap[positions[inside], column]
+    return result
+
+  def window(self, day_offsets=(), station_offsets=(), station:str=None):
+    """
+    For every day t of the index, whether days t + o have data for all o in day_offsets and station
+    reported on days t + o for all o in station_offsets.
+
+    Returns:
+      bool array in the order of days
+    """
+    mask = np.ones(len(self.days), dtype=bool)
+    for offset in day_offsets:
+      mask &= self.present(offset)
+    for offset in station_offsets:
+      mask &= self.present(offset, station)
+    return mask
+
+  def key(self, ordinal:int) -> str:
+    return self.keys[ordinal]
+
+  def __len__(self):
+    return len(self.days)
@@ -1,22 +1,46 @@
 from math import log, inf
+from array import array
+from time import perf_counter
 
 class DecisionTree():
+  # Gains this close to the best are ties. The engines sum entropies in different orders, so gains that
+  # are equal can differ in their last bits.
+  gain_tolerance = 1e-9
+
   @staticmethod
-  def generate_answers(examples:list, answer_index:int=None):
+  def select(examples:list, rows=None):
+    """
+    Iterate over the examples at the given row indices, or every example if no rows are given.
+    Lets training share one dataset between nodes instead of copying tuples into each partition.
+
+    Args:
+      examples - a list of tuples representing data points.
+      rows - an array of indices into examples.
+
+    Returns:
+      iterable of examples
+    """
+    if rows is None:
+      return examples
+    return map(examples.__getitem__, rows)
+
+  @staticmethod
+  def generate_answers(examples:list, answer_index:int=None, rows=None):
     """
     Generate a dict of possible values for an attribute in an set of entities with their frequency.
 
     Args:
       examples - a list of tuples representing data points.
       answer_index - the attribute of an entity being searched. Defaults to the last attribute.
+      rows - optional array of indices into examples to restrict the search to.
 
     Returns:
       answers
     """
     if answer_index is None:
-      answer_index = len(examples[0]) - 1
+      answer_index = len(examples[0 if rows is None else rows[0]]) - 1
     answers = {}
-    for example in examples:
+    for example in DecisionTree.select(examples, rows):
       answer = example[answer_index]
       if answer not in answers:
         answers[answer] = 0
@@ -24,40 +48,68 @@ class DecisionTree():
     return answers
 
   @staticmethod
-  def majority(examples:list):
+  def majority(examples:list, rows=None):
     """
     Find the majority answer (final column) within a set of examples.
 
     Args:
       examples - a list of tuples representing data points.
+      rows - optional array of indices into examples to restrict the search to.
+
+    Returns:
+      majority answer
+    """
+    return DecisionTree.majority_from_counts(DecisionTree.generate_answers(examples, rows=rows))
+
+  @staticmethod
+  def majority_from_counts(answers:dict):
+    """
+    Find the most frequent answer of a dict of answer frequencies, the first seen on a tie.
+
+    Args:
+      answers - a dict with keys of answers and values of their frequency.
 
     Returns:
       majority answer
     """
     cur_max = None
-    answers = DecisionTree.generate_answers(examples)
     for answer in answers:
       if cur_max is None or answers[cur_max] < answers[answer]:
         cur_max = answer
     return cur_max
   
   @staticmethod
-  def get_entropy(examples:list) -> float:
+  def entropy_from_counts(counts:dict, total:int) -> float:
     """
-    Calculate the entropy of set of examples based on their answer attribute (final column).
+    Calculate entropy from a dict of answer frequencies, avoiding a rescan of the examples.
 
     Args:
-      examples - a list of tuples representing data points.
+      counts - a dict with keys of answers and values of their frequency.
+      total - the number of examples the counts were taken from.
 
     Returns:
       entropy
     """
-    answers = DecisionTree.generate_answers(examples)
     entropy = 0
-    for answer in answers:
-      frequency = answers[answer] / len(examples)
+    for count in counts.values():
+      frequency = count / total
       entropy += -frequency*log(frequency, 2)
     return entropy
+
+  @staticmethod
+  def get_entropy(examples:list, rows=None) -> float:
+    """
+    Calculate the entropy of set of examples based on their answer attribute (final column).
+
+    Args:
+      examples - a list of tuples representing data points.
+      rows - optional array of indices into examples to restrict the calculation to.
+
+    Returns:
+      entropy
+    """
+    total = len(examples) if rows is None else len(rows)
+    return DecisionTree.entropy_from_counts(DecisionTree.generate_answers(examples, rows=rows), total)
   
   @staticmethod
   def partition(examples:list, attribute_index:int, answer) -> list:
@@ -79,41 +131,142 @@ class DecisionTree():
     return partition
   
   @staticmethod
-  def best_question(examples:list, attributes:list, parent_entropy:float=None):
+  def contingency_table(examples:list, attributes:list, rows=None) -> dict:
+    """
+    Count every attribute value against every answer (final column) in a single pass over the examples.
+
+    Args:
+      examples - a list of tuples representing data points.
+      attributes - a list of remaining attributes. Attributes set to None and the last column are skipped.
+      rows - optional array of indices into examples to restrict the count to.
+
+    Returns:
+      table - dict keyed by attribute index of dicts keyed by attribute value of answer frequencies.
+      Values and answers keep the order they first appear in, matching generate_answers and partition.
+    """
+    active = [attr_index for attr_index in range(len(attributes) - 1) if attributes[attr_index] is not None]
+    columns = [{} for _ in active]
+    for example in DecisionTree.select(examples, rows):
+      answer = example[-1]
+      for attr_index, column in zip(active, columns):
+        counts = column.get(example[attr_index])
+        if counts is None:
+          counts = column[example[attr_index]] = {}
+        counts[answer] = counts.get(answer, 0) + 1
+    return dict(zip(active, columns))
+
+  @staticmethod
+  def information_gain(column:dict, total_count:int, parent_entropy:float) -> float:
+    """
+    Calculate the information gain of splitting on an attribute from its contingency table column.
+
+    Args:
+      column - dict keyed by attribute value of answer frequencies (see contingency_table).
+      total_count - the number of examples the table was built from.
+      parent_entropy - entropy of the examples before the split.
+
+    Returns:
+      gain
+    """
+    gain = parent_entropy
+    for counts in column.values():
+      count = sum(counts.values())
+      gain -= DecisionTree.entropy_from_counts(counts, count) * count / total_count
+    return gain
+
+  @staticmethod
+  def best_of(gains:dict):
+    """
+    Pick the attribute to split on from the gain of each attribute index. Ties, within gain_tolerance of
+    the best gain, go to the attribute listed first.
+
+    Returns:
+      attribute index, None if gains is empty
+    """
+    if not gains:
+      return None
+    best_gain = max(gains.values())
+    return next(attr_index for attr_index in sorted(gains) if gains[attr_index] >= best_gain - DecisionTree.gain_tolerance)
+
+  @staticmethod
+  def partition_all(examples:list, attribute_index:int, rows=None) -> dict:
+    """
+    Partition examples by every value of an attribute in a single pass.
+
+    Args:
+      examples - a list of tuples representing data points.
+      attribute_index - the attribute of an entity being split on.
+      rows - optional array of indices into examples. When given, partitions hold row indices instead of examples.
+
+    Returns:
+      partitions - dict with keys of attribute values and values of matching examples (or row index arrays).
+    """
+    partitions = {}
+    if rows is None:
+      for example in examples:
+        option = example[attribute_index]
+        if option not in partitions:
+          partitions[option] = []
+        partitions[option].append(example)
+      return partitions
+    for row in rows:
+      option = examples[row][attribute_index]
+      if option not in partitions:
+        partitions[option] = array('I')
+      partitions[option].append(row)
+    return partitions
+
+  @staticmethod
+  def best_question(examples:list, attributes:list, parent_entropy:float=None, rows=None, stats=None):
     """
     Find the best attribute to search for by comparing information gain of possible attributes.
+    Gains are computed from a single contingency table and only the chosen attribute is partitioned.
 
     Args:
       examples - a list of tuples representing data points.
       attributes - a list of remaining attributes to act as next question. Last column is excluded (assumed actual answer)
       parent_entropy - Entropy of the previous question. If not provided, is calculated from given examples.
+      rows - optional array of indices into examples. When given, partitions hold row indices instead of examples.
+      stats - optional TrainingStats timing the contingency table and partition.
 
     Returns:
       [best_attribute, best_options] - Index of the chosen attribute and dictionary of with keys of possible answers 
       and values of partitioned data with attribute values of the key option.
     """
     if parent_entropy is None:
-      parent_entropy = DecisionTree.get_entropy(examples)
-    total_count = len(examples)
-    best_attr = None
-    best_gain = 0
-    best_options = None
-    for attr_index in range(len(attributes) - 1):
-      if attributes[attr_index] is None: continue
-      gain = parent_entropy
-      options = DecisionTree.generate_answers(examples, attr_index)
-      for option, count in options.items():
-        new_examples = DecisionTree.partition(examples, attr_index, option)
-        options[option] = new_examples
-        new_entropy = DecisionTree.get_entropy(new_examples)
-        gain -= new_entropy * count / total_count
-      if best_attr is None or best_gain < gain:
-        best_attr = attr_index
-        best_gain = gain
-        best_options = options
-
-    return [best_attr, best_options]
+      parent_entropy = DecisionTree.get_entropy(examples, rows)
+    total_count = len(examples) if rows is None else len(rows)
+    if stats is None:
+      table = DecisionTree.contingency_table(examples, attributes, rows)
+    else:
+      table = stats.timed('contingency_table', DecisionTree.contingency_table, examples, attributes, rows, rows=total_count)
+      stats.candidates += len(table)
+    best_attr = DecisionTree.best_of({
+      attr_index: DecisionTree.information_gain(column, total_count, parent_entropy)
+      for attr_index, column in table.items()
+    })
+    if best_attr is None:
+      return [None, None]
+    if stats is None:
+      return [best_attr, DecisionTree.partition_all(examples, best_attr, rows)]
+    return [best_attr, stats.timed('partition', DecisionTree.partition_all, examples, best_attr, rows, rows=total_count)]
   
+  @staticmethod
+  def is_number(value) -> bool:
+    """
+    Check if a value can be compared against a split threshold. Bools are answers rather than numbers,
+    and NaN counts as not a number.
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+  @staticmethod
+  def is_nan(value) -> bool:
+    """
+    Check for NaN, which threshold splits send to the None (missing) child. NaN != NaN, so as a key every
+    NaN would be a value of its own.
+    """
+    return isinstance(value, float) and value != value
+
   @staticmethod
   def no_more(attributes:list) -> bool:
     """
@@ -124,46 +277,278 @@ class DecisionTree():
         return False
     return True
 
-  def __init__(self, examples, attributes, max_depth=inf, threshold=0.00001, parent=None):
-    # TODO: Separate training logic from constructor, forgoing due to time
+  @classmethod
+  def from_parts(cls, value=None, best_attr_index=None, best_attribute=None, children=None, split_threshold=None):
+    """
+    Create a node directly from its fields without training, for trees built outside the constructor.
+    """
+    tree = cls.__new__(cls)
+    tree.value = value
+    tree.best_attr_index = best_attr_index
+    tree.best_attribute = best_attribute
+    tree.children = children
+    tree.split_threshold = split_threshold
+    return tree
+
+  def __init__(self, examples, attributes, max_depth=inf, threshold=0.00001, parent=None, rows=None, engine='python', stats=None, numeric=None, bins=16):
+    """
+    Train a tree on the examples. Every node shares the same examples and only holds an array of
+    row indices into them, so no tuples are copied while the tree grows.
+
+    Args:
+      examples - a list of tuples representing data points.
+      attributes - names of the attributes, last being the answer column. None marks attributes already asked.
+      max_depth - maximum number of questions asked before settling on a majority answer.
+      threshold - entropy under which a node becomes a leaf.
+      parent - row indices of the parent node, used for the majority answer of an empty node.
+      rows - row indices of the examples this node trains on. Defaults to every example.
+      engine - 'python' to count splits over the example tuples, or 'numpy' to encode the examples once
+      into an integer matrix and compute the gain of every attribute with vectorized counts (see EncodedDataset).
+      stats - optional TrainingStats to record nodes, split candidates, timings and the finished tree in.
+      The numpy engine only records nodes and the tree.
+      numeric - indices of attributes holding numbers, split on thresholds instead of values (see NumericBins).
+      A numeric attribute can be asked again further down. Python engine only.
+      bins - maximum number of quantile buckets, and so of candidate thresholds, per numeric attribute.
+    """
+    # Recursive training kept for compatibility, LevelWiseTrainer grows trees without recursion
     self.value = None
     self.best_attr_index = None
     self.best_attribute = None
     self.children = None
-    if len(examples) == 0:
-      self.value = self.majority(parent)
+    # Numbers up to the threshold go to child True, larger numbers to child False
+    self.split_threshold = None
+    if numeric is not None:
+      from .numeric_bins import NumericBins
+      if engine != 'python':
+        raise Exception(f'Numeric attributes need the python engine, not {engine}')
+      if not isinstance(numeric, NumericBins):
+        numeric = NumericBins.build(examples, numeric, bins)
+    if engine == 'numpy':
+      from .encoded_dataset import EncodedDataset
+      start = perf_counter()
+      dataset = EncodedDataset.encode(examples, attributes)
+      self.__dict__.update(dataset.grow(rows, max_depth=max_depth, threshold=threshold).__dict__)
+      if stats is not None:
+        stats.nodes_of(self)
+        stats.tree(perf_counter() - start, self)
+      return
+    elif engine != 'python':
+      raise Exception(f'Invalid engine {engine}, expected python or numpy')
+    start = perf_counter()
+    self.grow(examples, attributes, max_depth, threshold, parent, rows, stats, numeric)
+    if stats is not None and parent is None:
+      stats.tree(perf_counter() - start, self)
+
+  @staticmethod
+  def step(stats, name:str, function:callable, *args, rows:int=0):
+    """
+    Call function(*args), timed under name in stats if training records any.
+    """
+    if stats is None:
+      return function(*args)
+    return stats.timed(name, function, *args, rows=rows)
+
+  def grow(self, examples, attributes, max_depth, threshold, parent, rows, stats, numeric):
+    """
+    The python engine training of __init__. Every stats hook is guarded by stats is not None, so
+    training without stats runs the same steps without recording them.
+    """
+    if rows is None:
+      rows = array('I', range(len(examples)))
+    if len(rows) == 0:
+      total = len(examples if parent is None else parent)
+      answers = DecisionTree.step(stats, 'generate_answers', DecisionTree.generate_answers, examples, None, parent, rows=total)
+      self.make_leaf(DecisionTree.majority_from_counts(answers))
+      if stats is not None: stats.node(stats.depth, 0)
       return
-    entropy = DecisionTree.get_entropy(examples)
+    # One scan of the answers serves both the entropy and, for a leaf, the majority
+    answers = DecisionTree.step(stats, 'generate_answers', DecisionTree.generate_answers, examples, None, rows, rows=len(rows))
+    entropy = DecisionTree.entropy_from_counts(answers, len(rows))
     if (
       entropy == 0 or entropy < threshold or 
       DecisionTree.no_more(attributes) or max_depth == 0
     ):
-      # print(attributes,entropy)
-      self.value = DecisionTree.majority(examples)
+      self.make_leaf(DecisionTree.majority_from_counts(answers))
+      if stats is not None: stats.node(stats.depth, len(rows))
+      return
+    if numeric is None:
+      best_question_index, partitions = DecisionTree.best_question(examples, attributes, entropy, rows, stats)
+    else:
+      best_question_index, partitions, self.split_threshold = numeric.best_question(examples, attributes, entropy, rows, stats)
+    if best_question_index is None:
+      # Only numeric attributes are left and their numbers cannot be told apart
+      self.make_leaf(DecisionTree.majority_from_counts(answers))
+      if stats is not None: stats.node(stats.depth, len(rows))
       return
-    best_question_index, answers = DecisionTree.best_question(examples, attributes, entropy)
     self.best_attr_index = best_question_index
     self.best_attribute = attributes[best_question_index]
+    if stats is not None:
+      stats.node(stats.depth, len(rows), self.best_attribute)
+      stats.depth += 1
     new_attributes = attributes.copy()
-    new_attributes[best_question_index] = None
+    if self.split_threshold is None:
+      new_attributes[best_question_index] = None
     self.children = {}
-    for answer, new_examples in answers.items():
-      self.children[answer] = DecisionTree(new_examples,new_attributes,max_depth-1,threshold,self)
+    try:
+      # Pop each partition as its subtree is built so finished subtrees release their rows
+      for answer in list(partitions.keys()):
+        self.children[answer] = DecisionTree(examples,new_attributes,max_depth-1,threshold,rows,partitions.pop(answer),stats=stats,numeric=numeric)
+    finally:
+      if stats is not None: stats.depth -= 1
+
+  def size(self) -> int:
+    """
+    Number of nodes in the tree, leaves included.
+    """
+    nodes = [self]
+    count = 0
+    while nodes:
+      node = nodes.pop()
+      count += 1
+      if node.children is not None: nodes.extend(node.children.values())
+    return count
+
+  def depth(self) -> int:
+    """
+    Number of questions on the longest path from the root to a leaf.
+    """
+    nodes = [(self, 0)]
+    deepest = 0
+    while nodes:
+      node, depth = nodes.pop()
+      deepest = max(deepest, depth)
+      if node.children is not None: nodes.extend((child, depth + 1) for child in node.children.values())
+    return deepest
+
+  def child(self, example):
+    """
+    Child of an internal node an example goes to, None if the node has no child for its value.
+    """
+    option = example[self.best_attr_index]
+    if self.split_threshold is not None:
+      if DecisionTree.is_number(option):
+        option = option <= self.split_threshold
+      elif DecisionTree.is_nan(option):
+        option = None
+    return self.children.get(option,None)
 
   def predict(self, example):
     """
     Predict an outcome based on training data. Example should have a length of completed data array - 1.
     Recurse down tree looking at attribute for each node until leaf is found.
     """
-    if self.value is not None: return self.value
-    option = example[self.best_attr_index]
-    return self.children[option].predict(example) if self.children.get(option,None) is not None else None
+    if self.children is None: return self.value
+    child = self.child(example)
+    return child.predict(example) if child is not None else None
+
+  def make_leaf(self, value):
+    self.value = value
+    self.best_attr_index = None
+    self.best_attribute = None
+    self.children = None
+    self.split_threshold = None
+
+  def prune(self, holdout:list=None, examples:list=None) -> dict:
+    """
+    Shrink the trained tree in place. With a holdout set, reduced-error pruning replaces every subtree
+    (bottom up) by a leaf of its training majority when that leaf makes no more mistakes on the holdout
+    examples reaching it, including subtrees no holdout example reaches. Then subtrees whose leaves all
+    predict the same answer are collapsed into one leaf, which also answers values the subtree had no
+    branch for.
+
+    Args:
+      holdout - labelled examples not trained on, answer in the final column.
+      examples - the examples the tree was trained on, for the majority answer of each node. Required
+      with holdout.
+
+    Returns:
+      dict of the number of nodes before and after pruning
+    """
+    before = self.size()
+    if holdout is not None:
+      if examples is None:
+        raise Exception('Reduced-error pruning needs the training examples for the majority answers')
+      self.prune_errors(holdout, examples, array('I', range(len(holdout))), array('I', range(len(examples))))
+    self.collapse()
+    # The compiled form is of the unpruned tree
+    self.compiled = None
+    return {'before': before, 'after': self.size()}
+
+  def prune_errors(self, holdout:list, examples:list, holdout_rows, rows) -> int:
+    """
+    Reduced-error pruning of the subtree at this node, given the holdout and training rows reaching it.
+
+    Returns:
+      mistakes of the pruned subtree on the holdout rows
+    """
+    if self.children is None:
+      return sum(holdout[row][-1] != self.value for row in holdout_rows)
+    # Holdout rows with a value the node has no child for get no answer
+    errors = 0
+    routed = {}
+    for row in holdout_rows:
+      child = self.child(holdout[row])
+      if child is None:
+        errors += holdout[row][-1] is not None
+      else:
+        routed.setdefault(id(child), array('I')).append(row)
+    trained = {}
+    for row in rows:
+      child = self.child(examples[row])
+      if child is not None:
+        trained.setdefault(id(child), array('I')).append(row)
+    for child in self.children.values():
+      errors += child.prune_errors(holdout, examples, routed.get(id(child), array('I')), trained.get(id(child), array('I')))
+    if len(rows) == 0:
+      return errors
+    value = DecisionTree.majority(examples, rows)
+    leaf_errors = sum(holdout[row][-1] != value for row in holdout_rows)
+    if value is None or errors < leaf_errors:
+      return errors
+    self.make_leaf(value)
+    return leaf_errors
+
+  def collapse(self):
+    """
+    Turn subtrees whose leaves all predict the same answer into a leaf, bottom up.
+    """
+    if self.children is None:
+      return
+    for child in self.children.values():
+      child.collapse()
+    values = {child.value for child in self.children.values()}
+    if len(values) == 1 and None not in values and all(child.children is None for child in self.children.values()):
+      self.make_leaf(values.pop())
+
+  def compile(self, codebook=None, labels=None):
+    """
+    Flatten the trained tree into parallel arrays for batch prediction (see CompiledTree).
+    Pass the codebook of an EncodedDataset to score its matrix directly.
+    """
+    from .compiled_tree import CompiledTree
+    return CompiledTree.compile(self, codebook, labels)
+
+  def predict_many(self, examples) -> list:
+    """
+    Predict a batch of examples. A matrix encoded with the codebook of the compiled tree is routed
+    through it with vectorized indexing; the compiled form is kept on the root, so later batches skip
+    compilation. Example tuples are walked one at a time: encoding them reads every asked column of
+    every row, more than the one path per row a walk reads, so only trees sharing one encoding (see
+    RandomForest.predict_batch) gain from it.
+    """
+    if not hasattr(examples, 'shape'):
+      return [self.predict(example) for example in examples]
+    compiled = getattr(self, 'compiled', None)
+    if compiled is None:
+      compiled = self.compiled = self.compile()
+    return compiled.predict_many(examples)
 
   def __repr__(self):
     return (
       "DecisionTree(" + 
       (("value:" + str(self.value)) if self.value is not None else '') +
       (("\nquestion:" + self.best_attribute) if self.best_attribute is not None else '')+
+      ((" <= " + str(self.split_threshold)) if self.split_threshold is not None else '')+
       (("\nchildren{\n" + '\n'.join(map(lambda i: self.best_attribute + " " +repr(i[0]) + ': ' + repr(i[1]),self.children.items()))+"\n}")
        if self.children is not None else ''
       )+
@@ -171,7 +556,7 @@ class DecisionTree():
     )
   
   def __eq__(self, dt):
-    if self.value is not None:
+    if self.children is None:
       return self.value == dt.get('value',None)
     else:
       if 'children' not in dt or len(self.children.keys()) != len(dt['children'].keys()):
@@ -182,7 +567,7 @@ class DecisionTree():
       return self.best_attribute == dt.get('best_question', None)
   
   def __ne__(self, dt):
-    if self.value is not None:
+    if self.children is None:
       return self.value != dt.get('value',None)
     else:
       if 'children' not in dt or len(self.children.keys()) != len(dt['children'].keys()):
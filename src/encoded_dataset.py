@@ -0,0 +1,189 @@
+import numpy as np
+from math import inf
+from .decision_tree import DecisionTree
+
+class Codebook():
+  """
+  Map attribute values to small integer codes. False, True and None (missing) are always 0, 1 and 2,
+  other values are numbered in the order they are first seen.
+  """
+  defaults = (False, True, None)
+
+  @staticmethod
+  def key(value):
+    # Keep True/1/1.0 and False/0/0.0 apart, they hash the same
+    return (value.__class__, value)
+
+  def __init__(self, values=defaults):
+    self.values = []
+    self.codes = {}
+    for value in values:
+      self.add(value)
+
+  def add(self, value) -> int:
+    key = Codebook.key(value)
+    code = self.codes.get(key)
+    if code is None:
+      code = self.codes[key] = len(self.values)
+      self.values.append(value)
+    return code
+
+  def encode(self, value, default:int=None) -> int:
+    """
+    Look up the code of a value. Unknown values return default, or are added if default is None.
+    """
+    code = self.codes.get(Codebook.key(value))
+    if code is None:
+      return self.add(value) if default is None else default
+    return code
+
+  def decode(self, code:int):
+    return self.values[code]
+
+  def dtype(self):
+    return np.uint8 if len(self.values) < 255 else np.uint16
+
+  def __len__(self):
+    return len(self.values)
+
+  def __repr__(self):
+    return "Codebook(" + str(self.values) + ")"
+
+
+class EncodedDataset():
+  """
+  Examples encoded once into a small integer matrix (one column per attribute, excluding the answer)
+  and a vector of answer codes, so split statistics can be computed with vectorized numpy calls.
+  """
+  def __init__(self, matrix, labels, codebook:Codebook, label_values:list, attributes:list):
+    self.matrix = matrix
+    self.labels = labels
+    self.codebook = codebook
+    self.label_values = label_values
+    self.attributes = attributes
+
+  @staticmethod
+  def encode(examples:list, attributes:list, codebook:Codebook=None):
+    """
+    Encode a list of example tuples.
+
+    Args:
+      examples - a list of tuples representing data points, answer in the final column.
+      attributes - names of the attributes, last being the answer column.
+      codebook - existing codebook to extend. A new one is created if not provided.
+
+    Returns:
+      EncodedDataset
+    """
+    if codebook is None:
+      codebook = Codebook()
+    num_columns = len(attributes) - 1
+    encode = codebook.encode
+    codes = [[encode(example[i]) for i in range(num_columns)] for example in examples]
+    label_book = Codebook(())
+    labels = np.fromiter((label_book.encode(example[-1]) for example in examples), dtype=np.intp, count=len(examples))
+    matrix = np.array(codes, dtype=codebook.dtype()).reshape(len(examples), num_columns)
+    return EncodedDataset(matrix, labels, codebook, label_book.values, list(attributes))
+
+  def __len__(self):
+    return len(self.labels)
+
+  def answer_counts(self, rows):
+    return np.bincount(self.labels[rows], minlength=len(self.label_values))
+
+  def majority(self, rows) -> int:
+    """
+    Code of the most frequent answer. Ties go to the answer seen first, like DecisionTree.majority.
+    """
+    counts = self.answer_counts(rows)
+    tied = np.flatnonzero(counts == counts.max())
+    if len(tied) == 1:
+      return int(tied[0])
+    node_labels = self.labels[rows]
+    return int(min(tied, key=lambda label: np.argmax(node_labels == label)))
+
+  @staticmethod
+  def entropy(counts, axis=-1):
+    """
+    Entropy along an axis of an array of answer counts.
+    """
+    totals = counts.sum(axis=axis, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      frequency = counts / totals
+      terms = np.where(counts > 0, frequency * np.log2(np.where(counts > 0, frequency, 1)), 0)
+    return -terms.sum(axis=axis)
+
+  def contingency_table(self, rows, columns):
+    """
+    Count every value of every column against every answer with a single bincount.
+
+    Args:
+      rows - array of row indices.
+      columns - array of column indices.
+
+    Returns:
+      counts of shape (columns, values, answers)
+    """
+    num_values = len(self.codebook)
+    num_labels = len(self.label_values)
+    sub = self.matrix[np.ix_(rows, columns)].astype(np.intp)
+    sub += (np.arange(len(columns)) * num_values)[None, :]
+    sub *= num_labels
+    sub += self.labels[rows][:, None]
+    size = len(columns) * num_values * num_labels
+    return np.bincount(sub.ravel(), minlength=size).reshape(len(columns), num_values, num_labels)
+
+  def information_gains(self, rows, columns, parent_entropy:float):
+    """
+    Information gain of splitting on each of the columns, computed in one vectorized pass.
+    """
+    counts = self.contingency_table(rows, columns)
+    value_totals = counts.sum(axis=2)
+    child_entropy = EncodedDataset.entropy(counts)
+    return parent_entropy - (child_entropy * value_totals).sum(axis=1) / len(rows)
+
+  def partition(self, rows, column:int) -> dict:
+    """
+    Split rows by the value of a column. Values keep the order they first appear in and rows stay ascending.
+    """
+    values = self.matrix[rows, column]
+    order = np.argsort(values, kind='stable')
+    codes, starts = np.unique(values[order], return_index=True)
+    bounds = list(starts[1:]) + [len(order)]
+    groups = {int(code): rows[order[start:end]] for code, start, end in zip(codes, starts, bounds)}
+    return {code: groups[code] for code in sorted(groups, key=lambda code: groups[code][0])}
+
+  def grow(self, rows=None, active=None, max_depth=inf, threshold=0.00001) -> DecisionTree:
+    """
+    Train a DecisionTree on the encoded examples, mirroring the stopping rules of DecisionTree.__init__.
+
+    Args:
+      rows - array of row indices to train on. Defaults to every row.
+      active - column indices that may still be asked. Defaults to every attribute not set to None.
+      max_depth - maximum number of questions asked before settling on a majority answer.
+      threshold - entropy under which a node becomes a leaf.
+
+    Returns:
+      DecisionTree with children keyed by the original (decoded) values
+    """
+    if rows is None:
+      rows = np.arange(len(self), dtype=np.intp)
+    if active is None:
+      active = [i for i in range(len(self.attributes) - 1) if self.attributes[i] is not None]
+    active = np.asarray(active, dtype=np.intp)
+    entropy = float(EncodedDataset.entropy(self.answer_counts(rows)))
+    if entropy == 0 or entropy < threshold or len(active) == 0 or max_depth == 0:
+      return DecisionTree.from_parts(value=self.label_values[self.majority(rows)])
+    gains = self.information_gains(rows, active, entropy)
+    # First column within DecisionTree.gain_tolerance of the best, as the python engine picks
+    best = int(active[np.argmax(gains >= gains.max() - DecisionTree.gain_tolerance)])
+    remaining = active[active != best]
+    children = {}
+    partitions = self.partition(rows, best)
+    for code in list(partitions.keys()):
+      children[self.codebook.decode(code)] = self.grow(partitions.pop(code), remaining, max_depth - 1, threshold)
+    return DecisionTree.from_parts(
+      best_attr_index=best,
+      best_attribute=self.attributes[best],
+      children=children
+    )
@@ -0,0 +1,292 @@
+import numpy as np
+from .day_index import DayIndex
+from .weather_store import WeatherStore
+
+# Features evaluate to codes, decoded to the values the decision trees train on
+FALSE = 0
+TRUE = 1
+UNKNOWN = 2
+DECODE = np.array([False, True, None], dtype=object)
+NUMERIC = (WeatherStore.VALUE, WeatherStore.INTEGER)
+
+class FeatureTable():
+  """
+  Dense (day ordinal, station) columns of the attributes features read, with a DayIndex over the days.
+  Rows of each column follow index.bitmap: row r is the day with ordinal index.start + r, days without
+  data hold only ABSENT flags. Values are float64 and only meaningful where the flag is numeric.
+  """
+  def __init__(self, index:DayIndex, columns:dict):
+    """
+    Args:
+      index - DayIndex of the days, with the stations features can refer to.
+      columns - attribute name to (values, flags), each of shape (len(index.bitmap), len(index.stations)).
+    """
+    self.index = index
+    self.columns = columns
+
+  @staticmethod
+  def dense(index:DayIndex, values, flags):
+    """
+    Spread (days, stations) arrays in index order over every ordinal of the index.
+    """
+    positions = index.ordinals - index.start
+    dense_values = np.zeros((len(index.bitmap), len(index.stations)), dtype=np.float64)
+    dense_flags = np.full(dense_values.shape, WeatherStore.ABSENT, dtype=np.uint8)
+    dense_values[positions] = values
+    dense_flags[positions] = flags
+    return dense_values, dense_flags
+
+  @staticmethod
+  def from_dict(sample_data:dict, attributes:list, needed:list, stations:list):
+    """
+    Extract the needed attributes of a date -> station -> row dict, reading each cell once.
+
+    Args:
+      sample_data - dict of date to station to row.
+      attributes - names of the row columns.
+      needed - attributes to extract.
+      stations - stations features can refer to.
+    """
+    index = DayIndex.from_dict(sample_data, stations)
+    reports = [[day.get(station) for station in stations] for day in sample_data.values()]
+    columns = {}
+    for attribute in needed:
+      a = attributes.index(attribute)
+      cells = [[None if row is None else row[a] for row in day] for day in reports]
+      flags = np.where(index.bitmap[index.ordinals - index.start, 1:], WeatherStore.VALUE, WeatherStore.ABSENT).astype(np.uint8)
+      values, flags, _ = WeatherStore.encode_column(cells, flags.reshape(len(reports), len(stations)))
+      columns[attribute] = FeatureTable.dense(index, values, flags)
+    return FeatureTable(index, columns)
+
+  @staticmethod
+  def from_store(store:WeatherStore, subset:str, needed:list, stations:list):
+    """
+    Read the needed attribute columns of a WeatherStore subset, without building any rows.
+    """
+    index = DayIndex.from_store(store, subset)
+    order = [index.station_index.get(station) for station in stations]
+    present = np.stack([
+      index.bitmap[index.ordinals - index.start, 1 + s] if s is not None else np.zeros(len(index), dtype=bool)
+      for s in order
+    ], axis=1).reshape(len(index), len(stations))
+    columns = {}
+    for attribute in needed:
+      values, flags = store.column(subset, attribute)
+      values = np.stack([values[:, s] if s is not None else np.zeros(len(index)) for s in order], axis=1)
+      flags = np.stack([flags[:, s] if s is not None else np.full(len(index), WeatherStore.ABSENT) for s in order], axis=1)
+      columns[attribute] = FeatureTable.dense(index, values.reshape(present.shape), flags.reshape(present.shape))
+    return FeatureTable(DayIndex(index.days, stations, present), columns)
+
+  def cells(self, attribute:str, station:str, rows):
+    """
+    Values and flags of a station's attribute on the given dense rows. Rows outside the table are ABSENT.
+    """
+    values, flags = self.columns[attribute]
+    s = self.index.station_index[station]
+    inside = (rows >= 0) & (rows < len(values))
+    clipped = np.where(inside, rows, 0)
+    return values[clipped, s], np.where(inside, flags[clipped, s], WeatherStore.ABSENT)
+
+
+class Threshold():
+  """
+  Whether an attribute at a station was more than a threshold lag days before the target day. Trace
+  amounts ('T') count as not more; missing or absent reports are unknown.
+  """
+  def __init__(self, attribute:str, station:str, threshold:float=0.2, lag:int=1, name:str=None):
+    self.attribute = attribute
+    self.station = station
+    self.threshold = threshold
+    self.lag = lag
+    self.name = name if name is not None else f'{attribute} IN {station} {lag} DAY AGO'
+
+  def reads(self) -> list:
+    return [(self.station, self.lag)]
+
+  def key(self) -> tuple:
+    return ('threshold', self.attribute, self.station, self.threshold, self.lag)
+
+  def evaluate(self, table:FeatureTable, targets):
+    """
+    Args:
+      table - FeatureTable to read.
+      targets - dense rows of the target days.
+
+    Returns:
+      int8 array of FALSE, TRUE or UNKNOWN per target
+    """
+    values, flags = table.cells(self.attribute, self.station, targets - self.lag)
+    codes = np.where(np.isin(flags, NUMERIC), values > self.threshold, UNKNOWN)
+    return np.where(flags == WeatherStore.TRACE, FALSE, codes).astype(np.int8)
+
+  def __repr__(self):
+    return f'Threshold({self.name!r})'
+
+
+class Compare():
+  """
+  Whether an attribute at a station was less (or more) than at another station, each read lag days
+  before the target day. Unknown if either is missing or absent.
+  """
+  def __init__(self, attribute:str, station:str, other:str='ROC', op:str='less', lag:int=1, other_lag:int=None, name:str=None):
+    if op not in ('less', 'more'):
+      raise Exception(f'Invalid comparison {op}')
+    self.attribute = attribute
+    self.station = station
+    self.other = other
+    self.op = op
+    self.lag = lag
+    self.other_lag = other_lag if other_lag is not None else lag
+    self.name = name if name is not None else f'{station} {op.upper()} {attribute} THAN {other} {lag} DAY AGO'
+
+  def reads(self) -> list:
+    return [(self.station, self.lag), (self.other, self.other_lag)]
+
+  def key(self) -> tuple:
+    return ('compare', self.attribute, self.station, self.other, self.op, self.lag, self.other_lag)
+
+  def evaluate(self, table:FeatureTable, targets):
+    values, flags = table.cells(self.attribute, self.station, targets - self.lag)
+    other_values, other_flags = table.cells(self.attribute, self.other, targets - self.other_lag)
+    result = values < other_values if self.op == 'less' else values > other_values
+    known = np.isin(flags, NUMERIC) & np.isin(other_flags, NUMERIC)
+    return np.where(known, result, UNKNOWN).astype(np.int8)
+
+  def __repr__(self):
+    return f'Compare({self.name!r})'
+
+
+class Raw():
+  """
+  The value of an attribute at a station lag days before the target day, for trees splitting on it as
+  a numeric attribute (see NumericBins). Trace amounts are 'T', missing or absent reports are unknown.
+  """
+  def __init__(self, attribute:str, station:str, lag:int=1, name:str=None):
+    self.attribute = attribute
+    self.station = station
+    self.lag = lag
+    self.name = name if name is not None else f'{attribute} IN {station} {lag} DAY AGO'
+
+  def reads(self) -> list:
+    return [(self.station, self.lag)]
+
+  def key(self) -> tuple:
+    return ('raw', self.attribute, self.station, self.lag)
+
+  def evaluate(self, table:FeatureTable, targets):
+    """
+    Returns:
+      object array of the value (float, or int for integer reports), 'T' or None per target
+    """
+    values, flags = table.cells(self.attribute, self.station, targets - self.lag)
+    result = np.full(len(targets), None, dtype=object)
+    for flag, convert in ((WeatherStore.VALUE, float), (WeatherStore.INTEGER, int)):
+      rows = np.flatnonzero(flags == flag)
+      result[rows] = [convert(value) for value in values[rows].tolist()]
+    result[flags == WeatherStore.TRACE] = 'T'
+    return result
+
+  def __repr__(self):
+    return f'Raw({self.name!r})'
+
+
+class FeatureSpec():
+  """
+  A prediction target declared as features read before the target day and an answer read on it.
+  A target day is used only if every day in required_days before it has data and every station in
+  required_reports reported on its listed lags; with answers, the stations the answer reads must have
+  reported too.
+  """
+  def __init__(self, features:list, answer, required_days=(), required_reports:dict=None):
+    """
+    Args:
+      features - Threshold/Compare/Raw features, in column order.
+      answer - feature giving the answer, usually with lag 0.
+      required_days - lags (days before the target) that must have data.
+      required_reports - station to lags it must have reported on.
+    """
+    self.features = features
+    self.answer = answer
+    self.required_days = tuple(required_days)
+    self.required_reports = required_reports if required_reports is not None else {}
+
+  def attributes(self) -> list:
+    return list(dict.fromkeys(feature.attribute for feature in self.features + [self.answer]))
+
+  def key(self) -> tuple:
+    """
+    Everything the examples of the spec depend on: each feature's key and name and the requirements.
+    Models trained on the spec's examples are cached under it (see ModelCache).
+    """
+    return (
+      tuple((feature.key(), feature.name) for feature in self.features),
+      (self.answer.key(), self.answer.name),
+      self.required_days,
+      tuple(sorted((station, tuple(lags)) for station, lags in self.required_reports.items())),
+    )
+
+  def requirements(self, with_answers:bool) -> list:
+    """
+    What a target day needs, as (station, lag) pairs. A station of None means any data that day.
+    """
+    needs = [(None, lag) for lag in self.required_days]
+    needs += [(station, lag) for station, lags in self.required_reports.items() for lag in lags]
+    if with_answers: needs += self.answer.reads()
+    return needs
+
+  def target_days(self, index:DayIndex, with_answers:bool):
+    """
+    Dense rows of the usable target days, following the order of the index's days. A day t of the index
+    is the last day of history for the target day t + 1.
+    """
+    mask = np.ones(len(index), dtype=bool)
+    for station, lag in self.requirements(with_answers):
+      mask &= index.present(1 - lag, station)
+    return index.ordinals[mask] - index.start + 1
+
+
+def evaluate(features:list, table, targets, computed:dict=None) -> list:
+  """
+  Example rows of features on target days.
+
+  Args:
+    features - features, in column order.
+    table - FeatureTable, or anything with the same cells method, to read.
+    targets - int array of the target days' rows in the table.
+    computed - dict of features already evaluated on the same targets, filled in as features are evaluated.
+
+  Returns:
+    list of tuples of True, False or None (or the values of Raw features), one per target
+  """
+  computed = computed if computed is not None else {}
+  rows = np.empty((len(targets), len(features)), dtype=object)
+  target_key = targets.tobytes()
+  for column, feature in enumerate(features):
+    key = (feature.key(), target_key)
+    if key not in computed:
+      computed[key] = feature.evaluate(table, targets)
+    result = computed[key]
+    rows[:, column] = result if result.dtype == object else DECODE[result]
+  return list(map(tuple, rows.tolist()))
+
+
+def build_features(specs:list, table:FeatureTable, with_answers:bool) -> list:
+  """
+  Build the example rows of several targets in one pass over a FeatureTable. A feature shared by
+  targets is computed once per set of target days.
+
+  Args:
+    specs - FeatureSpecs to build.
+    table - FeatureTable holding every attribute the specs read.
+    with_answers - append the answer column and only use days with a known answer.
+
+  Returns:
+    list of (examples, attribute names) per spec, examples being tuples of feature values
+  """
+  results = []
+  computed = {}
+  for spec in specs:
+    targets = spec.target_days(table.index, with_answers)
+    features = spec.features + [spec.answer] if with_answers else spec.features
+    results.append((evaluate(features, table, targets, computed), [feature.name for feature in features]))
+  return results
@@ -0,0 +1,121 @@
+import numpy as np
+from datetime import date
+from .data_collector import WeatherReport
+from .day_index import DayIndex
+from .features import evaluate
+from .weather_store import WeatherStore
+
+class Forecaster():
+  """
+  Live feature rows for a set of FeatureSpecs. The last capacity days of station reports are kept in a
+  ring buffer of encoded (day, station) columns, slot ordinal % capacity, so a new day overwrites the
+  oldest one and costs O(stations) to add. Feature rows are read for the day after the newest day from
+  the buffer directly, nothing is rebuilt.
+  """
+  def __init__(self, specs:list, stations:list, attributes:list=None, capacity:int=None):
+    """
+    Args:
+      specs - FeatureSpecs to forecast.
+      stations - stations the specs read.
+      attributes - names of the report columns. Defaults to WeatherReport.attributes without the day.
+      capacity - days kept. Defaults to the longest lag the specs read.
+    """
+    self.specs = specs
+    self.stations = list(stations)
+    self.station_index = {station: i for i, station in enumerate(self.stations)}
+    self.attributes = list(attributes) if attributes is not None else WeatherReport.attributes[1:]
+    if capacity is None:
+      reads = [read for spec in specs for feature in spec.features for read in feature.reads()]
+      capacity = max(lag for _, lag in reads + [need for spec in specs for need in spec.requirements(False)])
+    self.capacity = capacity
+    needed = list(dict.fromkeys(attribute for spec in specs for attribute in spec.attributes()))
+    self.needed = [(attribute, self.attributes.index(attribute)) for attribute in needed]
+    self.ordinals = np.full(capacity, -1, dtype=np.int64)
+    self.present = np.zeros((capacity, len(self.stations)), dtype=bool)
+    self.columns = {
+      attribute: (np.zeros((capacity, len(self.stations))), np.full((capacity, len(self.stations)), WeatherStore.ABSENT, dtype=np.uint8))
+      for attribute, _ in self.needed
+    }
+    self.newest = None
+
+  @staticmethod
+  def encode_cell(value):
+    """
+    Value and WeatherStore flag of one report cell.
+    """
+    if value.__class__ is int or value.__class__ is float: return value, WeatherStore.VALUE
+    if value is None: return 0, WeatherStore.NONE
+    if value == 'M': return 0, WeatherStore.MISSING
+    if value == 'T': return 0, WeatherStore.TRACE
+    return 0, WeatherStore.STRING
+
+  def push(self, day, reports:dict):
+    """
+    Add a day of reports, replacing the day capacity days earlier. Pushing a day again replaces it.
+
+    Args:
+      day - date or 'mm/dd/yy' key.
+      reports - dict of station to report row (without the day), stations not in the forecaster are ignored.
+    """
+    ordinal = day.toordinal() if isinstance(day, date) else DayIndex.ordinal(day)
+    if self.newest is not None and ordinal <= self.newest - self.capacity:
+      raise Exception(f'{day} is older than the {self.capacity} days kept')
+    slot = ordinal % self.capacity
+    self.ordinals[slot] = ordinal
+    self.present[slot] = False
+    for values, flags in self.columns.values():
+      flags[slot] = WeatherStore.ABSENT
+    for station, row in reports.items():
+      s = self.station_index.get(station)
+      if s is None: continue
+      self.present[slot, s] = True
+      for attribute, a in self.needed:
+        values, flags = self.columns[attribute]
+        values[slot, s], flags[slot, s] = Forecaster.encode_cell(row[a])
+    self.newest = ordinal if self.newest is None else max(self.newest, ordinal)
+
+  def push_strings(self, day, reports:dict):
+    """
+    Add a day of raw CF6 rows (e.g. '12 37 23 30 3 35 0 0.21 ...'), station to row string.
+    """
+    self.push(day, {station: WeatherReport.parse_report_str(row)[1:] for station, row in reports.items()})
+
+  def slots(self, ordinals):
+    """
+    Ring slots of day ordinals, and whether each day is in the buffer.
+    """
+    slots = ordinals % self.capacity
+    return slots, self.ordinals[slots] == ordinals
+
+  def cells(self, attribute:str, station:str, ordinals):
+    """
+    Values and flags of a station's attribute on days, the interface features read through.
+    """
+    values, flags = self.columns[attribute]
+    s = self.station_index[station]
+    slots, kept = self.slots(ordinals)
+    return values[slots, s], np.where(kept, flags[slots, s], WeatherStore.ABSENT)
+
+  def has(self, station:str, ordinal:int) -> bool:
+    slot = ordinal % self.capacity
+    if self.ordinals[slot] != ordinal: return False
+    return True if station is None else bool(self.present[slot, self.station_index[station]])
+
+  def features(self) -> list:
+    """
+    Feature rows of every spec for the day after the newest day pushed.
+
+    Returns:
+      list of (row, attribute names) per spec, row being None if the days or reports the spec needs are missing
+    """
+    results = []
+    computed = {}
+    target = self.newest + 1 if self.newest is not None else None
+    for spec in self.specs:
+      names = [feature.name for feature in spec.features]
+      if target is None or not all(self.has(station, target - lag) for station, lag in spec.requirements(False)):
+        results.append((None, names))
+        continue
+      row = evaluate(spec.features, self, np.array([target], dtype=np.int64), computed)[0]
+      results.append((row, names))
+    return results
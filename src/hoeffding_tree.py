@@ -0,0 +1,190 @@
+from math import log, sqrt, inf
+from .decision_tree import DecisionTree
+
+class HoeffdingNode():
+  """
+  Node of a HoeffdingTree. Leaves keep the sufficient statistics for deciding a split: answer counts
+  and, per attribute still to ask, answer counts per value (the contingency_table format). The table
+  and seen_counts only count examples the node learned itself, counts also holds those inherited from
+  its parent for predicting.
+  """
+  def __init__(self, attributes:list, depth:int, counts:dict=None, fallback=None):
+    """
+    Args:
+      attributes - attribute names, None for attributes asked above this node. Last is the answer.
+      depth - questions asked above this node.
+      counts - answer counts the node starts with (those of its value when its parent split).
+      fallback - answer predicted while the node has seen no examples.
+    """
+    self.attributes = attributes
+    self.depth = depth
+    self.counts = dict(counts) if counts is not None else {}
+    self.total = sum(self.counts.values())
+    self.fallback = fallback
+    self.table = {attr_index: {} for attr_index in range(len(attributes) - 1) if attributes[attr_index] is not None}
+    self.seen_counts = {}
+    self.seen = 0
+    self.since_check = 0
+    self.best_attr_index = None
+    self.children = None
+    self.children_attributes = None
+
+  def value(self):
+    """
+    Majority answer, the first seen winning ties as in DecisionTree.majority.
+    """
+    best = None
+    for answer, count in self.counts.items():
+      if best is None or self.counts[best] < count:
+        best = answer
+    return best if best is not None else self.fallback
+
+  def learn(self, example:tuple):
+    answer = example[-1]
+    self.counts[answer] = self.counts.get(answer, 0) + 1
+    self.total += 1
+    self.seen_counts[answer] = self.seen_counts.get(answer, 0) + 1
+    self.seen += 1
+    self.since_check += 1
+    for attr_index, column in self.table.items():
+      value_counts = column.get(example[attr_index])
+      if value_counts is None:
+        value_counts = column[example[attr_index]] = {}
+      value_counts[answer] = value_counts.get(answer, 0) + 1
+
+
+class HoeffdingTree():
+  """
+  Decision tree trained one example at a time (a Very Fast Decision Tree). Each leaf counts attribute
+  values against answers as examples arrive, and every grace_period examples checks whether the best
+  attribute's information gain beats both the runner-up and not splitting (a gain of 0) by more than
+  the Hoeffding bound
+    epsilon = sqrt(R^2 ln(1/confidence) / 2n), R = log2(number of answers)
+  in which case the leaf splits on it. Gains and n only count the examples the leaf saw itself, not the
+  answer counts it inherited. Learning an example costs O(depth + attributes), independent of how many
+  examples came before, so the model can be kept current without retraining from history.
+  """
+  def __init__(self, attributes:list, grace_period:int=20, confidence:float=0.01, tie_threshold:float=0.05, max_depth=inf, threshold=0.00001):
+    """
+    Args:
+      attributes - names of the attributes, last being the answer column. None marks attributes not to ask.
+      grace_period - examples a leaf sees between split checks.
+      confidence - probability of splitting on the wrong attribute (delta of the bound).
+      tie_threshold - split on the best attribute anyway once the bound is below this, as the
+      candidates are then too close for the choice to matter. The best attribute must still beat not
+      splitting by more than the bound.
+      max_depth - maximum number of questions asked before settling on a majority answer.
+      threshold - entropy under which a leaf does not split.
+    """
+    self.attributes = list(attributes)
+    self.grace_period = grace_period
+    self.confidence = confidence
+    self.tie_threshold = tie_threshold
+    self.max_depth = max_depth
+    self.threshold = threshold
+    self.root = HoeffdingNode(self.attributes, 0)
+    self.examples_seen = 0
+
+  def leaf(self, example:tuple) -> HoeffdingNode:
+    """
+    Leaf an example is sorted into. A value not seen when its node split gets a new leaf.
+    """
+    node = self.root
+    while node.children is not None:
+      option = example[node.best_attr_index]
+      child = node.children.get(option)
+      if child is None:
+        child = node.children[option] = HoeffdingNode(node.children_attributes, node.depth + 1, fallback=node.value())
+      node = child
+    return node
+
+  def learn_one(self, example:tuple):
+    """
+    Update the tree with one labelled example, answer in the final column.
+    """
+    node = self.leaf(example)
+    node.learn(example)
+    self.examples_seen += 1
+    if node.since_check >= self.grace_period:
+      node.since_check = 0
+      self.try_split(node)
+
+  def learn_many(self, examples:list):
+    for example in examples:
+      self.learn_one(example)
+
+  def bound(self, node:HoeffdingNode) -> float:
+    value_range = log(max(len(node.seen_counts), 2), 2)
+    return sqrt(value_range * value_range * log(1 / self.confidence) / (2 * node.seen))
+
+  def try_split(self, node:HoeffdingNode) -> bool:
+    """
+    Split a leaf on its best attribute if the Hoeffding bound says it is reliably the best.
+
+    Returns:
+      whether the leaf split
+    """
+    if node.depth >= self.max_depth or not node.table:
+      return False
+    entropy = DecisionTree.entropy_from_counts(node.seen_counts, node.seen)
+    if entropy == 0 or entropy < self.threshold:
+      return False
+    best_attr = None
+    best_gain = 0
+    # Not splitting has a gain of 0, so a lone or useless attribute must beat that
+    second_gain = 0
+    for attr_index, column in node.table.items():
+      gain = DecisionTree.information_gain(column, node.seen, entropy)
+      if best_attr is None or best_gain < gain:
+        best_attr, best_gain, second_gain = attr_index, gain, max(best_gain, second_gain)
+      elif second_gain < gain:
+        second_gain = gain
+    epsilon = self.bound(node)
+    if best_gain <= epsilon or (best_gain - second_gain <= epsilon and epsilon >= self.tie_threshold):
+      return False
+    node.best_attr_index = best_attr
+    node.children_attributes = node.attributes.copy()
+    node.children_attributes[best_attr] = None
+    fallback = node.value()
+    node.children = {
+      option: HoeffdingNode(node.children_attributes, node.depth + 1, counts, fallback)
+      for option, counts in node.table[best_attr].items()
+    }
+    node.table = {}
+    return True
+
+  def predict(self, example):
+    """
+    Predict an outcome like DecisionTree.predict: None if the example has a value no split has seen.
+    """
+    node = self.root
+    while node.children is not None:
+      node = node.children.get(example[node.best_attr_index])
+      if node is None: return None
+    return node.value()
+
+  def to_decision_tree(self) -> DecisionTree:
+    """
+    Snapshot of the tree as a DecisionTree, for compile, predict_many and save_model.
+    """
+    def convert(node:HoeffdingNode) -> DecisionTree:
+      if node.children is None:
+        return DecisionTree.from_parts(value=node.value())
+      return DecisionTree.from_parts(
+        best_attr_index=node.best_attr_index,
+        best_attribute=self.attributes[node.best_attr_index],
+        children={option: convert(child) for option, child in node.children.items()},
+      )
+    return convert(self.root)
+
+  def size(self) -> int:
+    nodes = [self.root]
+    count = 0
+    while nodes:
+      node = nodes.pop()
+      count += 1
+      if node.children is not None: nodes.extend(node.children.values())
+    return count
+
+  def __repr__(self):
+    return f'HoeffdingTree(examples_seen={self.examples_seen}, nodes={self.size()})'
@@ -0,0 +1,115 @@
+import hashlib
+import inspect
+import json
+import os
+from collections import OrderedDict
+from .model_io import save_model, load_model
+
+class ModelCache():
+  """
+  Cache of trained models keyed by the content of the training file, the feature builder and the
+  hyperparameters. Recently used models are kept in memory (LRU); with a directory, models are also
+  saved to disk so other processes can skip training. A changed data file hashes to a new key, so
+  stale models are never returned.
+  """
+  def __init__(self, capacity:int=8, directory:str=None):
+    self.capacity = capacity
+    self.directory = directory
+    self.models = OrderedDict()
+    # path -> (mtime, size, digest), so unchanged files are not rehashed on every lookup
+    self.digests = {}
+
+  def file_digest(self, path:str) -> str:
+    """
+    sha256 of a file's content, recomputed only when its modification time or size changes.
+    """
+    stat = os.stat(path)
+    cached = self.digests.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+      return cached[2]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+      for chunk in iter(lambda: file.read(1 << 20), b''):
+        digest.update(chunk)
+    self.digests[path] = (stat.st_mtime_ns, stat.st_size, digest.hexdigest())
+    return digest.hexdigest()
+
+  @staticmethod
+  def builder_id(builder:callable) -> str:
+    """
+    Identify a feature builder by name and source, so editing it invalidates models saved to disk.
+    """
+    name = f'{builder.__module__}.{builder.__qualname__}'
+    try:
+      return name + ':' + hashlib.sha256(inspect.getsource(builder).encode()).hexdigest()
+    except (OSError, TypeError):
+      return name
+
+  def key(self, data_file:str, builder:callable, params:dict, spec=None) -> str:
+    parts = [self.file_digest(data_file), ModelCache.builder_id(builder), json.dumps(params, sort_keys=True, default=str)]
+    # Builders defined by a spec keep their source when the spec changes, so the spec is keyed too
+    if spec is not None:
+      parts.append(repr(spec.key()))
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+  def path(self, key:str) -> str:
+    return os.path.join(self.directory, key + '.model')
+
+  def get(self, key:str):
+    """
+    Look a model up in memory, then on disk. Returns None if it is not cached.
+    """
+    model = self.models.get(key)
+    if model is not None:
+      self.models.move_to_end(key)
+      return model
+    if self.directory is not None and os.path.exists(self.path(key)):
+      model = load_model(self.path(key))
+      self.remember(key, model)
+    return model
+
+  def remember(self, key:str, model):
+    self.models[key] = model
+    self.models.move_to_end(key)
+    while len(self.models) > self.capacity:
+      self.models.popitem(last=False)
+
+  def put(self, key:str, model):
+    self.remember(key, model)
+    if self.directory is not None:
+      os.makedirs(self.directory, exist_ok=True)
+      # Write then rename so concurrent readers never see a partial file
+      temporary = self.path(key) + f'.{os.getpid()}.tmp'
+      save_model(model, temporary)
+      os.replace(temporary, self.path(key))
+
+  def get_or_train(self, data_file:str, builder:callable, params:dict, train:callable, spec=None):
+    """
+    Return the cached model for this training file, builder and hyperparameters, training it on a miss.
+
+    Args:
+      data_file - training data file, hashed by content.
+      builder - feature builder the model is trained on (e.g. construct_precip_data).
+      params - hyperparameters of the model.
+      train - function with no arguments returning the trained model.
+      spec - FeatureSpec (or anything with a key method) the builder builds features of, if any.
+
+    Returns:
+      model
+    """
+    if not os.path.exists(data_file):
+      # Training may create the file (lab2 fetches the data), the model is keyed on it once it exists
+      model = train()
+      if os.path.exists(data_file):
+        self.put(self.key(data_file, builder, params, spec), model)
+      return model
+    key = self.key(data_file, builder, params, spec)
+    model = self.get(key)
+    if model is None:
+      model = train()
+      self.put(key, model)
+    return model
+
+  def clear(self):
+    self.models.clear()
+    self.digests.clear()
@@ -0,0 +1,262 @@
+import json
+import struct
+import numpy as np
+from collections.abc import MutableSequence
+from .decision_tree import DecisionTree
+from .random_forest import RandomForest
+from .compiled_tree import CompiledTree
+from .encoded_dataset import Codebook
+
+# File layout:
+#   magic (4 bytes) | format version (uint16) | header length (uint32) | JSON header | arrays
+# Arrays are int32, stored in header order (per tree: feature, children, leaf, names) and each starts on
+# an 8 byte boundary. Offsets follow from the shapes in the header, so a file can be memory-mapped and each
+# tree's arrays used in place without parsing anything but the header. Thresholds of threshold nodes
+# (version 2) are kept in the header as [node, threshold] pairs, most trees have none.
+MAGIC = b'WXDT'
+VERSION = 2
+PREFIX = struct.Struct('<4sHI')
+ALIGNMENT = 8
+ARRAYS = ('feature', 'children', 'leaf', 'names')
+
+def _align(position:int) -> int:
+  return position + -position % ALIGNMENT
+
+def _offsets(header:dict, header_length:int) -> list:
+  """
+  Offsets of every array in the file, in header order.
+  """
+  offsets = []
+  position = _align(PREFIX.size + header_length)
+  for entry in header['trees']:
+    for name in ARRAYS:
+      offsets.append(position)
+      position = _align(position + 4 * int(np.prod(entry[name])))
+  return offsets
+
+def _tree_arrays(compiled:CompiledTree, tree:DecisionTree, attributes:dict) -> dict:
+  """
+  Arrays describing one compiled tree, including the attribute name asked at each node.
+  """
+  names = np.full(len(compiled.feature), -1, dtype=np.int32)
+  nodes = [tree]
+  index = 0
+  while index < len(nodes):
+    node = nodes[index]
+    if node.children is not None:
+      names[index] = attributes.setdefault(node.best_attribute, len(attributes))
+      nodes.extend(node.children.values())
+    index += 1
+  return {
+    'feature': compiled.feature,
+    'children': compiled.children,
+    'leaf': compiled.leaf,
+    'names': names,
+  }
+
+def save_model(model, path:str):
+  """
+  Save a trained DecisionTree or RandomForest to a compact binary file.
+
+  Args:
+    model - trained DecisionTree or RandomForest.
+    path - file to write.
+  """
+  if isinstance(model, RandomForest):
+    kind = 'forest'
+    trees = model.trees
+    compiled = model.compile()
+    params = {
+      'num_trees': model.num_trees,
+      'num_attributes': model.num_attributes,
+      'max_depth': model.max_depth,
+      'seed': model.seed,
+      'trees_trained': model.trees_trained,
+      'max_samples': model.max_samples,
+      'bootstrap': model.bootstrap,
+      'subsets': model.subsets,
+    }
+  elif isinstance(model, DecisionTree):
+    kind = 'tree'
+    trees = [model]
+    compiled = [model.compile()]
+    params = {}
+  else:
+    raise Exception(f'Cannot save model of type {type(model).__name__}')
+
+  attributes = {}
+  blobs = []
+  tree_headers = []
+  for tree, flat in zip(trees, compiled):
+    entry = {'depth': flat.depth}
+    if flat.threshold is not None:
+      nodes = np.flatnonzero(~np.isnan(flat.threshold))
+      entry['thresholds'] = [[int(node), float(flat.threshold[node])] for node in nodes]
+    arrays = _tree_arrays(flat, tree, attributes)
+    for name in ARRAYS:
+      array = np.ascontiguousarray(arrays[name], dtype=np.int32)
+      entry[name] = list(array.shape)
+      blobs.append(array)
+    tree_headers.append(entry)
+
+  header = {
+    'kind': kind,
+    'params': params,
+    'attributes': list(attributes.keys()),
+    'values': compiled[0].codebook.values if compiled else [],
+    'labels': compiled[0].labels.values if compiled else [],
+    'trees': tree_headers,
+  }
+  encoded = json.dumps(header).encode()
+  offsets = _offsets(header, len(encoded))
+  with open(path, 'wb') as file:
+    file.write(PREFIX.pack(MAGIC, VERSION, len(encoded)))
+    file.write(encoded)
+    for offset, blob in zip(offsets, blobs):
+      file.write(b'\0' * (offset - file.tell()))
+      file.write(blob.tobytes())
+
+def read_header(path:str) -> dict:
+  """
+  Read only the JSON header of a model file. The array offsets are added under 'offsets'.
+  """
+  with open(path, 'rb') as file:
+    magic, version, length = PREFIX.unpack(file.read(PREFIX.size))
+    if magic != MAGIC:
+      raise Exception(f'{path} is not a model file')
+    if version > VERSION:
+      raise Exception(f'Unsupported model file version {version}, expected at most {VERSION}')
+    header = json.loads(file.read(length))
+  header['offsets'] = _offsets(header, length)
+  return header
+
+def _to_tree(compiled:CompiledTree, names, attributes:list) -> DecisionTree:
+  """
+  Rebuild the node objects of a compiled tree so DecisionTree.predict works on a loaded model.
+  """
+  dead = len(compiled.feature) - 1
+  nodes = [DecisionTree.from_parts() for _ in range(dead)]
+  for index, node in enumerate(nodes):
+    feature = int(compiled.feature[index])
+    if feature < 0:
+      node.value = compiled.labels.decode(int(compiled.leaf[index]))
+      continue
+    node.best_attr_index = feature
+    node.best_attribute = attributes[int(names[index])]
+    if compiled.threshold is not None and not np.isnan(compiled.threshold[index]):
+      node.split_threshold = float(compiled.threshold[index])
+    row = compiled.children[index]
+    codes = np.flatnonzero(row != dead)
+    # Children were numbered breadth-first in insertion order, sorting by node restores that order
+    node.children = {
+      compiled.codebook.decode(int(code)): nodes[int(row[code])]
+      for code in sorted(codes, key=lambda code: row[code])
+    }
+  return nodes[0]
+
+class LoadedTrees(MutableSequence):
+  """
+  Trees of a loaded forest, each rebuilt into DecisionTree nodes only when it is first asked for. Until
+  then a tree is only its mapped arrays, which predict_batch and answers use directly, so loading a large
+  forest costs no more than reading its header.
+  """
+  def __init__(self, compiled:list, names:list, attributes:list):
+    self.compiled = compiled
+    self.names = names
+    self.attributes = attributes
+    self.trees = [None] * len(compiled)
+
+  def tree(self, index:int) -> DecisionTree:
+    if self.trees[index] is None:
+      self.trees[index] = _to_tree(self.compiled[index], self.names[index], self.attributes)
+    return self.trees[index]
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return [self.tree(i) for i in range(len(self))[index]]
+    return self.tree(range(len(self))[index])
+
+  def __setitem__(self, index, tree):
+    self.__delitem__(index)
+    self.insert(index, tree)
+
+  def __delitem__(self, index):
+    for i in sorted(range(len(self))[index] if isinstance(index, slice) else [range(len(self))[index]], reverse=True):
+      del self.trees[i], self.compiled[i], self.names[i]
+
+  def insert(self, index:int, tree:DecisionTree):
+    # Trees added after loading are built already, they have no arrays
+    self.trees.insert(index, tree)
+    self.compiled.insert(index, None)
+    self.names.insert(index, None)
+
+  def __len__(self):
+    return len(self.trees)
+
+  def answers(self, example):
+    """
+    Prediction of every tree for one example, walking the arrays of trees not rebuilt yet.
+    """
+    for tree, compiled in zip(self.trees, self.compiled):
+      yield tree.predict(example) if tree is not None else compiled.predict(example)
+
+  def __repr__(self):
+    return repr(list(self))
+
+def load_model(path:str, mmap:bool=True):
+  """
+  Load a model saved with save_model.
+
+  Args:
+    path - file to read.
+    mmap - map the arrays from the file instead of reading them into memory.
+
+  Returns:
+    DecisionTree or RandomForest, with its compiled form ready for batch prediction. The node objects of
+    a forest's trees are built when a tree is first used (see LoadedTrees).
+  """
+  header = read_header(path)
+  if mmap:
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+  else:
+    with open(path, 'rb') as file:
+      buffer = np.frombuffer(file.read(), dtype=np.uint8)
+
+  offsets = iter(header['offsets'])
+  def array(shape):
+    offset = next(offsets)
+    return buffer[offset:offset + 4 * int(np.prod(shape))].view(np.int32).reshape(shape)
+
+  codebook = Codebook(header['values'])
+  labels = Codebook(header['labels'])
+  names_of = []
+  compiled = []
+  for entry in header['trees']:
+    feature, children, leaf, names = (array(entry[name]) for name in ARRAYS)
+    threshold = None
+    if entry.get('thresholds'):
+      threshold = np.full(len(feature), np.nan)
+      for node, value in entry['thresholds']:
+        threshold[node] = value
+    flat = CompiledTree(feature, children, leaf, codebook, labels, entry['depth'], threshold)
+    compiled.append(flat)
+    names_of.append(names)
+
+  if header['kind'] == 'tree':
+    tree = _to_tree(compiled[0], names_of[0], header['attributes'])
+    tree.compiled = compiled[0]
+    return tree
+  trees = LoadedTrees(list(compiled), names_of, header['attributes'])
+  params = header['params']
+  forest = RandomForest(
+    params['num_trees'], params['num_attributes'], params['max_depth'], seed=params['seed'],
+    max_samples=params.get('max_samples'), bootstrap=params.get('bootstrap', False),
+  )
+  forest.trees = trees
+  forest.compiled = compiled
+  forest.trees_trained = params.get('trees_trained', len(trees))
+  # The rows each tree saw are not saved, so loaded trees have no out-of-bag estimate
+  forest.oob_errors_ = [None] * len(trees)
+  # Older files lack the subsets, their trees do not constrain the subsets of new trees
+  forest.subsets = params.get('subsets', [None] * len(trees))
+  return forest
@@ -0,0 +1,168 @@
+import numpy as np
+from array import array
+from .decision_tree import DecisionTree
+from .encoded_dataset import EncodedDataset
+
+class NumericBins():
+  """
+  Numeric attributes of a training set, each binned once into at most bins quantile buckets. A node
+  then finds its best threshold from cumulative bucket x answer histograms, linear in its rows, instead
+  of sorting them. A threshold split sends numbers up to the threshold to the True child and larger
+  numbers to the False child. Values that are not numbers (None, 'M', 'T', bools, ...) get a child of
+  their own, as they would in a categorical split, and NaN goes to the None child.
+  """
+  def __init__(self, columns:list, edges:dict, codes:dict, labels, num_labels:int):
+    """
+    Args:
+      columns - indices of the numeric attributes.
+      edges - column to float array of the upper edge of each bucket, ascending.
+      codes - column to int array of each example's bucket, -1 for values that are not numbers.
+      labels - int array of each example's answer code.
+      num_labels - number of distinct answers.
+    """
+    self.columns = columns
+    self.edges = edges
+    self.codes = codes
+    self.labels = labels
+    self.num_labels = num_labels
+
+  @staticmethod
+  def quantile_edges(numbers, bins:int):
+    """
+    Upper bucket edges splitting numbers into at most bins buckets of about equal size. Edges are values
+    of numbers, so thresholds are values seen in training.
+    """
+    distinct = np.unique(numbers)
+    if len(distinct) <= bins:
+      return distinct
+    edges = np.quantile(numbers, np.arange(1, bins) / bins, method='lower')
+    return np.unique(np.append(edges, distinct[-1]))
+
+  @staticmethod
+  def build(examples:list, columns:list, bins:int=16):
+    """
+    Bin the numeric columns of examples.
+
+    Args:
+      examples - a list of tuples representing data points, answer in the final column.
+      columns - indices of the attributes to treat as numeric.
+      bins - maximum number of buckets per attribute.
+
+    Returns:
+      NumericBins
+    """
+    answers = {}
+    labels = np.array([answers.setdefault(example[-1], len(answers)) for example in examples], dtype=np.intp)
+    edges = {}
+    codes = {}
+    for column in columns:
+      values = [example[column] for example in examples]
+      numeric = np.array([DecisionTree.is_number(value) for value in values], dtype=bool)
+      numbers = np.array([value if is_number else 0 for value, is_number in zip(values, numeric.tolist())], dtype=np.float64)
+      column_edges = NumericBins.quantile_edges(numbers[numeric], bins)
+      if len(column_edges) < 2:
+        # No threshold to put between the numbers (e.g. a bool column), the column splits on its values
+        continue
+      edges[column] = column_edges
+      codes[column] = np.full(len(examples), -1, dtype=np.intp)
+      codes[column][numeric] = np.searchsorted(column_edges, numbers[numeric])
+    return NumericBins(list(edges), edges, codes, labels, len(answers))
+
+  def best_threshold(self, examples:list, column:int, rows, parent_entropy:float):
+    """
+    Best threshold of a numeric column for the examples at rows.
+
+    Returns:
+      [gain, bucket] - information gain of splitting after bucket, or None if the numbers of the rows
+      all fall in one bucket
+    """
+    num_buckets = len(self.edges[column])
+    if num_buckets < 2:
+      return None
+    rows = np.asarray(rows, dtype=np.intp)
+    codes = self.codes[column][rows]
+    labels = self.labels[rows]
+    numeric = codes >= 0
+    histogram = np.bincount(
+      codes[numeric] * self.num_labels + labels[numeric], minlength=num_buckets * self.num_labels
+    ).reshape(num_buckets, self.num_labels)
+    left = np.cumsum(histogram, axis=0)[:-1]
+    right = histogram.sum(axis=0) - left
+    left_count = left.sum(axis=1)
+    right_count = right.sum(axis=1)
+    valid = (left_count > 0) & (right_count > 0)
+    if not valid.any():
+      return None
+    remainder = left_count * EncodedDataset.entropy(left) + right_count * EncodedDataset.entropy(right)
+    if not numeric.all():
+      others = {}
+      for row in rows[~numeric].tolist():
+        option = examples[row][column]
+        counts = others.setdefault(None if DecisionTree.is_nan(option) else option, {})
+        counts[examples[row][-1]] = counts.get(examples[row][-1], 0) + 1
+      for counts in others.values():
+        count = sum(counts.values())
+        remainder = remainder + DecisionTree.entropy_from_counts(counts, count) * count
+    gains = np.where(valid, parent_entropy - remainder / len(rows), -np.inf)
+    bucket = int(np.argmax(gains))
+    return [float(gains[bucket]), bucket]
+
+  def partition(self, examples:list, column:int, rows, bucket:int) -> dict:
+    """
+    Partition rows on a threshold split after bucket.
+
+    Returns:
+      partitions - dict of True (up to the threshold), False (above it) and each value that is not a
+      number (NaN being None), in the order first seen, to arrays of row indices.
+    """
+    rows = np.asarray(rows, dtype=np.intp)
+    codes = self.codes[column][rows]
+    partitions = {
+      True: array('I', rows[(codes >= 0) & (codes <= bucket)].tolist()),
+      False: array('I', rows[codes > bucket].tolist()),
+    }
+    for row in rows[codes < 0].tolist():
+      option = examples[row][column]
+      if DecisionTree.is_nan(option):
+        option = None
+      if option not in partitions:
+        partitions[option] = array('I')
+      partitions[option].append(row)
+    return partitions
+
+  def best_question(self, examples:list, attributes:list, parent_entropy:float, rows, stats=None):
+    """
+    Find the best split among categorical attributes (see DecisionTree.best_question) and thresholds of
+    numeric attributes. Ties go to the attribute listed first (see DecisionTree.best_of).
+
+    Returns:
+      [best_attribute, best_options, threshold] - index of the chosen attribute, partitions of row
+      indices and the threshold, None for a categorical split. [None, None, None] without a split.
+    """
+    categorical = [None if index in self.codes else attribute for index, attribute in enumerate(attributes)]
+    if stats is None:
+      table = DecisionTree.contingency_table(examples, categorical, rows)
+    else:
+      table = stats.timed('contingency_table', DecisionTree.contingency_table, examples, categorical, rows, rows=len(rows))
+      stats.candidates += len(table)
+    gains = {
+      attr_index: [DecisionTree.information_gain(column, len(rows), parent_entropy), None]
+      for attr_index, column in table.items()
+    }
+    for column in self.columns:
+      if attributes[column] is None:
+        continue
+      if stats is None:
+        split = self.best_threshold(examples, column, rows, parent_entropy)
+      else:
+        split = stats.timed('best_threshold', self.best_threshold, examples, column, rows, parent_entropy, rows=len(rows))
+        stats.candidates += 1
+      if split is not None:
+        gains[column] = split
+    best_attr = DecisionTree.best_of({attr_index: gain for attr_index, (gain, _) in gains.items()})
+    if best_attr is None:
+      return [None, None, None]
+    bucket = gains[best_attr][1]
+    if bucket is None:
+      return [best_attr, DecisionTree.partition_all(examples, best_attr, rows), None]
+    return [best_attr, self.partition(examples, best_attr, rows, bucket), float(self.edges[best_attr][bucket])]
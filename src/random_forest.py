@@ -1,44 +1,291 @@
 from .decision_tree import DecisionTree
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
 import random
+from array import array
+
+# Training examples of the forest being trained, set once per worker process instead of pickled per tree
+_shared_examples = None
+
+def _init_worker(examples):
+  global _shared_examples
+  _shared_examples = examples
+
+def _train_tree(args):
+  subset, max_depth, rows = args
+  return DecisionTree(_shared_examples, subset, max_depth, rows=rows)
+
+def _train_tree_with_stats(args):
+  """
+  Train a tree in a worker process, returning it with the TrainingStats it filled in.
+  """
+  from .training_stats import TrainingStats
+  subset, max_depth, rows = args
+  stats = TrainingStats()
+  return DecisionTree(_shared_examples, subset, max_depth, rows=rows, stats=stats), stats
+
 
 class RandomForest():
-  def __init__(self, num_trees=4, num_attributes=5,max_depth=5):
+  def __init__(self, num_trees=4, num_attributes=5,max_depth=5, n_jobs=1, seed=None, max_samples=None, bootstrap=False):
+    """
+    Args:
+      num_trees - number of trees voting on a prediction.
+      num_attributes - number of attributes each tree may ask about.
+      max_depth - maximum depth of each tree.
+      n_jobs - number of processes training trees. None or -1 uses every core.
+      seed - seed for the attribute subsets. The same seed builds the same forest for any n_jobs.
+      max_samples - rows each tree trains on, as a count or a fraction of the examples. None uses every row.
+      bootstrap - draw each tree's rows with replacement instead of without.
+      With either set, trees train on row indices into the shared examples and the rows a tree did not
+      see give the out-of-bag estimates oob_score_ and oob_errors_.
+    """
     self.trees:list[DecisionTree] = []
     self.num_trees = num_trees
     self.num_attributes = num_attributes
     self.max_depth = max_depth
+    self.n_jobs = n_jobs
+    self.seed = seed
+    self.compiled = None
+    # Trees ever trained, so replacement trees draw from new generators instead of repeating subsets
+    self.trees_trained = 0
+    # Attribute subset of each tree, kept so trees added later draw subsets distinct from them
+    self.subsets = []
+    self.max_samples = max_samples
+    self.bootstrap = bootstrap
+    # Accuracy of the trees of the last train call on the rows each tree did not see, and the error of
+    # every tree on its own unseen rows (None when it trained on every row or was loaded from a file)
+    self.oob_score_ = None
+    self.oob_errors_ = []
 
   
-  def attribute_subset(self,attributes):
+  def attribute_subset(self,attributes,rng=random):
     indices = set()
     indices.add(len(attributes) - 1)
     while len(indices) <= min(len(attributes) - 1, self.num_attributes):
-      indices.add(random.randint(0, len(attributes) - 2))
+      indices.add(rng.randint(0, len(attributes) - 2))
     list(indices).sort()
     return [attr for attr in map(lambda i: attributes[i], indices)]
 
+  def tree_rng(self, tree_index:int) -> random.Random:
+    """
+    Independent random generator for one tree position, derived from the forest seed.
+    """
+    return random.Random(f'{self.seed}-{tree_index}')
+
+  def tree_subsets(self, attributes:list, count:int) -> list:
+    """
+    Draw attribute subsets for the next count trees, distinct from each other and from the subsets of
+    the trees in the forest. Each tree position draws from its own seeded generator so the subsets do not
+    depend on how training is scheduled, and growing a forest draws the subsets training it at full size would.
+    """
+    used_subsets = set(map(str, self.subsets))
+    subsets = []
+    for tree_index in range(self.trees_trained, self.trees_trained + count):
+      rng = self.tree_rng(tree_index)
+      subset = self.attribute_subset(attributes, rng)
+      while str(subset) in used_subsets:
+        subset = self.attribute_subset(attributes, rng)
+      used_subsets.add(str(subset))
+      subsets.append(subset)
+    return subsets
+
+  def sample_size(self, count:int) -> int:
+    if self.max_samples is None:
+      return count
+    if isinstance(self.max_samples, float):
+      return max(1, min(count, round(self.max_samples * count)))
+    return min(count, self.max_samples)
+
+  def tree_sample(self, tree_index:int, count:int):
+    """
+    Rows one tree position trains on, drawn from its own seeded generator, in ascending order.
 
-  def train(self, examples:list, attributes:list):
+    Returns:
+      array('I') of row indices, or None if trees train on every row
+    """
+    if self.max_samples is None and not self.bootstrap:
+      return None
+    rng = random.Random(f'{self.seed}-{tree_index}-rows')
+    size = self.sample_size(count)
+    if self.bootstrap:
+      rows = sorted(rng.randrange(count) for _ in range(size))
+    else:
+      rows = sorted(rng.sample(range(count), size))
+    return array('I', rows)
+
+  def workers(self) -> int:
+    if self.n_jobs is None or self.n_jobs < 1:
+      return os.cpu_count() or 1
+    return self.n_jobs
+
+  def train(self, examples:list, attributes:list, stats=None):
+    """
+    Train trees until the forest has num_trees.
+
+    Args:
+      examples - a list of tuples representing data points, answer in the final column.
+      attributes - names of the attributes, last being the answer column.
+      stats - optional TrainingStats collecting node and per-tree statistics.
+    """
     if not (len(attributes) > self.num_attributes):
       raise Exception(f'Invalid number of attribute for random forest. Must have fewer attributes than {self.num_attributes}, provided {len(attributes)}')
-    used_subsets = set()
-    while(len(self.trees) < self.num_trees):
-      subset = self.attribute_subset(attributes)
-      if str(subset) not in used_subsets:
-        self.trees.append(
-          DecisionTree(
-            examples,
-            subset,
-            self.max_depth
-          )
-        )
-        used_subsets.add(str(subset))
+    if self.seed is None:
+      self.seed = random.getrandbits(64)
+    first = len(self.trees)
+    subsets = self.tree_subsets(attributes, self.num_trees - len(self.trees))
+    samples = [self.tree_sample(self.trees_trained + i, len(examples)) for i in range(len(subsets))]
+    jobs = [(subset, self.max_depth, rows) for subset, rows in zip(subsets, samples)]
+    self.compiled = None
+    self.trees_trained += len(jobs)
+    self.subsets.extend(subsets)
+    self.train_trees(examples, jobs, stats)
+    if samples and samples[0] is not None:
+      self.oob_score_ = self.out_of_bag(examples, first, samples)
+    else:
+      self.oob_errors_.extend([None] * len(jobs))
+
+  def train_trees(self, examples:list, jobs:list, stats=None):
+    """
+    Train a tree per (attribute subset, max depth, rows) job, in worker processes if n_jobs allows.
+    """
+    workers = min(self.workers(), len(jobs))
+    if workers <= 1:
+      if stats is not None:
+        self.trees.extend(DecisionTree(examples, subset, max_depth, rows=rows, stats=stats) for subset, max_depth, rows in jobs)
+        return
+      _init_worker(examples)
+      try:
+        self.trees.extend(map(_train_tree, jobs))
+      finally:
+        _init_worker(None)
+      return
+    # Forked workers inherit the examples, other start methods receive them once per worker
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(examples,)) as pool:
+      if stats is None:
+        self.trees.extend(pool.map(_train_tree, jobs))
+        return
+      for tree, tree_stats in pool.map(_train_tree_with_stats, jobs):
+        self.trees.append(tree)
+        stats.merge(tree_stats)
+
+  def out_of_bag(self, examples:list, first:int, samples:list) -> float:
+    """
+    Score the trees from position first on the rows of examples they did not train on. Each tree's error
+    on its unseen rows is added to oob_errors_; rows predicted by the majority of the trees that did not
+    see them give the forest's accuracy.
+
+    Returns:
+      out-of-bag accuracy, None if every row was seen by every tree
+    """
+    import numpy as np
+    from .compiled_tree import CompiledTree
+    compiled = self.compile()
+    labels = compiled[0].labels
+    matrix = CompiledTree.encode_for(compiled, [example[:-1] for example in examples])
+    answers = np.array([labels.encode(example[-1], -2) for example in examples], dtype=np.int64)
+    votes = np.zeros((len(examples), len(labels) + 1), dtype=np.int32)
+    for tree, rows in zip(compiled[first:], samples):
+      unseen = np.ones(len(examples), dtype=bool)
+      unseen[np.asarray(rows, dtype=np.intp)] = False
+      unseen = np.flatnonzero(unseen)
+      if len(unseen) == 0:
+        self.oob_errors_.append(None)
+        continue
+      codes = tree.predict_codes(matrix[unseen])
+      self.oob_errors_.append(float(np.mean(codes != answers[unseen])))
+      # No answer is code -1, which lands in the trailing None column
+      np.add.at(votes, (unseen, codes), 1)
+    voted = votes.sum(axis=1) > 0
+    if not voted.any():
+      return None
+    return float(np.mean(votes[voted].argmax(axis=1) == answers[voted]))
+
+  def grow(self, examples:list, attributes:list, n_more:int, stats=None):
+    """
+    Warm start: add n_more trees trained on examples, leaving the trained trees as they are.
+    """
+    self.num_trees += n_more
+    self.train(examples, attributes, stats)
+
+  def tree_errors(self, examples:list) -> list:
+    """
+    Error rate of every tree on labelled examples (answer in the final column). No answer counts as wrong.
+    """
+    import numpy as np
+    from .compiled_tree import CompiledTree
+    compiled = self.compiled if self.compiled is not None else self.compile()
+    labels = compiled[0].labels
+    matrix = CompiledTree.encode_for(compiled, [example[:-1] for example in examples])
+    # Answers no tree predicts get a code no tree returns
+    answers = np.array([labels.encode(example[-1], -2) for example in examples], dtype=np.int64)
+    return [float(np.mean(tree.predict_codes(matrix) != answers)) for tree in compiled]
+
+  def refresh(self, examples:list, attributes:list, k:int, strategy:str='oldest', holdout:list=None, stats=None) -> list:
+    """
+    Replace k trees with trees trained on examples (e.g. recent data), leaving the others untouched.
+    Costs about k / num_trees of a full retrain.
+
+    Args:
+      examples - examples the replacement trees train on.
+      attributes - attribute names, last being the answer column.
+      k - number of trees to replace.
+      strategy - 'oldest' replaces the trees trained first, 'worst' the trees with the highest error on holdout,
+      'oob' the trees with the highest out-of-bag error (needs max_samples or bootstrap).
+      holdout - labelled examples to rank trees by. Defaults to examples, data the current trees have not seen
+      if it is new.
+      stats - optional TrainingStats for the replacement trees.
+
+    Returns:
+      positions of the replaced trees before the refresh
+    """
+    k = min(k, len(self.trees))
+    if strategy == 'oldest':
+      replaced = list(range(k))
+    elif strategy == 'worst':
+      errors = self.tree_errors(holdout if holdout is not None else examples)
+      # Among equally bad trees the oldest goes first
+      replaced = sorted(sorted(range(len(errors)), key=lambda i: -errors[i])[:k])
+    elif strategy == 'oob':
+      if all(error is None for error in self.oob_errors_):
+        raise Exception('No out-of-bag errors to rank trees by, train with max_samples or bootstrap')
+      # Trees without an estimate saw every row and are ranked as the best
+      errors = [error or 0 for error in self.oob_errors_]
+      replaced = sorted(sorted(range(len(errors)), key=lambda i: -errors[i])[:k])
+    else:
+      raise Exception(f'Invalid refresh strategy {strategy}, expected oldest, worst or oob')
+    dropped = set(replaced)
+    self.trees = [tree for i, tree in enumerate(self.trees) if i not in dropped]
+    self.oob_errors_ = [error for i, error in enumerate(self.oob_errors_) if i not in dropped]
+    self.subsets = [subset for i, subset in enumerate(self.subsets) if i not in dropped]
+    self.train(examples, attributes, stats)
+    return replaced
+
+  def prune(self, holdout:list=None, examples:list=None) -> dict:
+    """
+    Prune every tree (see DecisionTree.prune). Trees count the majority answers of their nodes over all
+    of examples, also when they trained on a sample of them.
+
+    Returns:
+      dict of the number of nodes before and after pruning, summed over the trees
+    """
+    before = 0
+    after = 0
+    for tree in self.trees:
+      counts = tree.prune(holdout, examples)
+      before += counts['before']
+      after += counts['after']
+    self.compiled = None
+    return {'before': before, 'after': after}
 
   def predict(self, example):
     freq = {}
     max = None
-    for tree in self.trees:
-      result = tree.predict(example)
+    # Trees of a loaded forest answer from their arrays until they are rebuilt (see model_io.LoadedTrees)
+    answers = self.trees.answers(example) if hasattr(self.trees, 'answers') else map(lambda tree: tree.predict(example), self.trees)
+    for result in answers:
       if freq.get(result, None) is None:
         freq[result] = 0
       freq[result] += 1
@@ -47,6 +294,58 @@ class RandomForest():
     # print(freq)
     return max
 
+  def compile(self) -> list:
+    """
+    Compile every tree with one shared value and answer encoding so their votes line up (see DecisionTree.compile).
+    """
+    from .encoded_dataset import Codebook
+    codebook = Codebook()
+    labels = Codebook(())
+    self.compiled = [tree.compile(codebook, labels) for tree in self.trees]
+    return self.compiled
+
+  def vote_counts(self, examples):
+    """
+    Count the votes of every tree for every example of a batch.
+
+    Args:
+      examples - list of example tuples, or a matrix encoded with the codebook of the compiled trees.
+
+    Returns:
+      [classes, votes] - answers voted for, with None last for trees that had no answer, and an
+      array of shape (examples, classes) of vote counts.
+    """
+    import numpy as np
+    from .compiled_tree import CompiledTree
+    compiled = self.compiled if self.compiled is not None else self.compile()
+    if isinstance(examples, np.ndarray):
+      matrix = examples
+    else:
+      matrix = CompiledTree.encode_for(compiled, examples)
+    labels = compiled[0].labels
+    votes = np.zeros((len(matrix), len(labels) + 1), dtype=np.int32)
+    row_index = np.arange(len(matrix))
+    for tree in compiled:
+      # No answer is code -1, which lands in the trailing None column
+      np.add.at(votes, (row_index, tree.predict_codes(matrix)), 1)
+    return [labels.values + [None], votes]
+
+  def predict_batch(self, examples):
+    """
+    Predict a batch of examples with array operations instead of one predict call per example and tree.
+
+    Args:
+      examples - list of example tuples, or a matrix encoded with the codebook of the compiled trees.
+
+    Returns:
+      [predictions, classes, fractions] - majority answer of each example, the answers voted for
+      (None last) and an array of shape (examples, classes) with the fraction of trees voting for each.
+      Ties go to the answer listed first in classes.
+    """
+    classes, votes = self.vote_counts(examples)
+    predictions = [classes[index] for index in votes.argmax(axis=1).tolist()]
+    return [predictions, classes, votes / max(len(self.trees), 1)]
+
 
   def __repr__(self):
     return (
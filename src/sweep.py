@@ -0,0 +1,311 @@
+import json
+import multiprocessing
+import os
+import random
+import sys
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from math import inf
+from .compiled_tree import CompiledTree
+from .decision_tree import DecisionTree
+from .encoded_dataset import EncodedDataset
+from .random_forest import RandomForest
+
+class TreeProfile():
+  """
+  A deep tree compiled together with the majority answer and entropy of its training rows at every node.
+  The tree DecisionTree would train with a smaller max_depth or a larger threshold is this tree cut off
+  at the first node the depth or entropy stops at, so every such tree can be scored without training it.
+  """
+  def __init__(self, compiled:CompiledTree, majority, entropy, depth):
+    """
+    Args:
+      compiled - the deep tree.
+      majority - answer code of the training rows at each node, -1 for the dead end.
+      entropy - entropy of the training rows at each node.
+      depth - questions asked above each node.
+    """
+    self.compiled = compiled
+    self.majority = majority
+    self.entropy = entropy
+    self.depth = depth
+    self.leaf = compiled.feature < 0
+
+  @staticmethod
+  def build(compiled:CompiledTree, matrix, answers):
+    """
+    Profile a compiled tree from the training rows it was trained on.
+
+    Args:
+      compiled - the tree, compiled with the codebook matrix was encoded with.
+      matrix - encoded training examples.
+      answers - answer codes of the training examples in compiled.labels.
+    """
+    paths = compiled.route(matrix, paths=True)
+    num_nodes = len(compiled.feature)
+    num_labels = len(compiled.labels)
+    rows = len(matrix)
+    counts = np.zeros((num_nodes, num_labels), dtype=np.int64)
+    first = np.full((num_nodes, num_labels), rows, dtype=np.int64)
+    for level, nodes in enumerate(paths):
+      # Count each row once, at the level it enters a node
+      entered = np.arange(rows) if level == 0 else np.flatnonzero(nodes != paths[level - 1])
+      np.add.at(counts, (nodes[entered], answers[entered]), 1)
+      np.minimum.at(first, (nodes[entered], answers[entered]), entered)
+    # Most common answer, the one seen first winning ties as in DecisionTree.majority
+    majority = np.argmax(counts * (rows + 1) + rows - first, axis=1)
+    majority = np.where(compiled.leaf >= 0, compiled.leaf, majority)
+    majority[-1] = -1
+    depth = np.zeros(num_nodes, dtype=np.int64)
+    for node in np.flatnonzero(compiled.feature >= 0):
+      children = compiled.children[node]
+      depth[children[children != num_nodes - 1]] = depth[node] + 1
+    return TreeProfile(compiled, majority, EncodedDataset.entropy(counts), depth)
+
+  def predict_codes(self, paths, max_depth=inf, threshold:float=0):
+    """
+    Answer codes of the tree trained with max_depth and threshold, -1 where it has no answer.
+
+    Args:
+      paths - nodes of the rows to predict at every level, from route(matrix, paths=True).
+      max_depth - maximum depth, at most that of the deep tree.
+      threshold - entropy under which a node becomes a leaf, at least that of the deep tree.
+    """
+    stop = self.leaf | (self.entropy < threshold) | (self.depth >= max_depth)
+    level = np.argmax(stop[paths], axis=0)
+    return self.majority[paths[level, np.arange(paths.shape[1])]]
+
+
+def _encode(compiled:list, examples:list, labels_only:bool=False):
+  """
+  Encode labelled examples for compiled trees sharing a codebook. Answers missing from the labels get
+  a code no tree predicts, unless they are training answers, which are added.
+  """
+  labels = compiled[0].labels
+  matrix = CompiledTree.encode_for(compiled, [example[:-1] for example in examples])
+  default = -2 if labels_only else None
+  answers = np.array([labels.encode(example[-1], default) for example in examples], dtype=np.int64)
+  return matrix, answers
+
+def _profiles(compiled:list, train:list, holdout:list):
+  """
+  Profile compiled trees on their training examples and route the holdout examples through them.
+
+  Returns:
+    [profiles, paths of the holdout rows per tree, holdout answer codes]
+  """
+  matrix, answers = _encode(compiled, train)
+  profiles = [TreeProfile.build(tree, matrix, answers) for tree in compiled]
+  matrix, answers = _encode(compiled, holdout, labels_only=True)
+  return [profiles, [tree.route(matrix, paths=True) for tree in compiled], answers]
+
+def _tree_job(args):
+  """
+  Train one deep tree on a split and count the correct holdout predictions of every (max_depth, threshold).
+  """
+  train, holdout, attributes, max_depths, thresholds = args
+  tree = DecisionTree(train, list(attributes), max(max_depths), min(thresholds))
+  (profile,), (paths,), answers = _profiles([tree.compile()], train, holdout)
+  correct = np.zeros((len(max_depths), len(thresholds)), dtype=np.int64)
+  for i, max_depth in enumerate(max_depths):
+    for j, threshold in enumerate(thresholds):
+      correct[i, j] = np.sum(profile.predict_codes(paths, max_depth, threshold) == answers)
+  return correct
+
+def _forest_job(args):
+  """
+  Train the largest forest of a num_attributes on a split and count the correct holdout predictions of
+  every (num_trees, max_depth). Smaller forests are the first trees of the largest, as RandomForest draws
+  each tree position from its own generator.
+  """
+  train, holdout, attributes, num_trees, num_attributes, max_depths, seed = args
+  forest = RandomForest(max(num_trees), num_attributes, max(max_depths), seed=seed)
+  forest.train(train, list(attributes))
+  profiles, paths, answers = _profiles(forest.compile(), train, holdout)
+  num_classes = len(forest.compiled[0].labels) + 1
+  correct = np.zeros((len(num_trees), len(max_depths)), dtype=np.int64)
+  for j, max_depth in enumerate(max_depths):
+    # No answer is code -1, which lands in the trailing None column
+    predictions = np.stack([profile.predict_codes(path, max_depth) for profile, path in zip(profiles, paths)]) % num_classes
+    winners = Sweep.vote(predictions, num_classes, num_trees)
+    for i, winner in enumerate(winners):
+      correct[i, j] = np.sum(np.where(winner == num_classes - 1, -1, winner) == answers)
+  return correct
+
+
+class Sweep():
+  """
+  Cross-validated hyperparameter search for DecisionTree and RandomForest that trains once per fold
+  instead of once per setting. A tree is trained once at the deepest depth and lowest threshold of the
+  grid, and every other (max_depth, threshold) is scored from it (see TreeProfile). A forest is trained
+  once per num_attributes with the most trees, and every smaller num_trees is scored from its first
+  trees. Folds, and the final split of all training examples against testing, run in parallel.
+  """
+  def __init__(self, examples:list, attributes:list, testing:list=None, folds:int=5, seed:int=0, n_jobs:int=1):
+    """
+    Args:
+      examples - labelled training examples, answer in the final column.
+      attributes - attribute names, last being the answer column.
+      testing - labelled examples to report test accuracy on, trained on every training example.
+      folds - number of cross-validation folds.
+      seed - seed of the fold assignment and the forests.
+      n_jobs - number of processes running splits. None or -1 uses every core.
+    """
+    self.examples = examples
+    self.attributes = attributes
+    self.testing = testing
+    self.folds = folds
+    self.seed = seed
+    self.n_jobs = n_jobs
+
+  def splits(self) -> list:
+    """
+    Training and holdout examples of each fold, with the testing split last if there is one.
+    """
+    order = list(range(len(self.examples)))
+    random.Random(self.seed).shuffle(order)
+    splits = []
+    for fold in range(self.folds):
+      held = set(order[fold::self.folds])
+      splits.append((
+        [example for i, example in enumerate(self.examples) if i not in held],
+        [example for i, example in enumerate(self.examples) if i in held],
+      ))
+    if self.testing is not None:
+      splits.append((self.examples, self.testing))
+    return splits
+
+  def workers(self) -> int:
+    if self.n_jobs is None or self.n_jobs < 1:
+      return os.cpu_count() or 1
+    return self.n_jobs
+
+  def run(self, job:callable, jobs:list) -> list:
+    workers = min(self.workers(), len(jobs))
+    if workers <= 1:
+      return list(map(job, jobs))
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+      return list(pool.map(job, jobs))
+
+  def accuracies(self, splits:list, counts:list) -> list:
+    """
+    Pool correct counts of the cross-validation folds and of the testing split into accuracies.
+
+    Returns:
+      [cv accuracies, test accuracies or None]
+    """
+    held = sum(len(holdout) for _, holdout in splits[:self.folds])
+    cv = sum(counts[:self.folds]) / max(held, 1)
+    if self.testing is None:
+      return [cv, None]
+    return [cv, counts[self.folds] / max(len(self.testing), 1)]
+
+  def trees(self, max_depths:list, thresholds:list=(0.00001,)) -> list:
+    """
+    Score DecisionTree on every (max_depth, threshold).
+
+    Returns:
+      list of dicts of max_depth, threshold, cv_accuracy and test_accuracy (None without testing)
+    """
+    splits = self.splits()
+    counts = self.run(_tree_job, [(train, holdout, self.attributes, list(max_depths), list(thresholds)) for train, holdout in splits])
+    cv, test = self.accuracies(splits, counts)
+    return [
+      {
+        'max_depth': max_depth,
+        'threshold': threshold,
+        'cv_accuracy': float(cv[i, j]),
+        'test_accuracy': float(test[i, j]) if test is not None else None,
+      }
+      for i, max_depth in enumerate(max_depths) for j, threshold in enumerate(thresholds)
+    ]
+
+  def forests(self, num_trees:list, num_attributes:list, max_depths:list) -> list:
+    """
+    Score RandomForest, seeded with the sweep's seed, on every (num_trees, num_attributes, max_depth).
+
+    Returns:
+      list of dicts of num_trees, num_attributes, max_depth, cv_accuracy and test_accuracy (None without testing)
+    """
+    splits = self.splits()
+    jobs = [
+      (train, holdout, self.attributes, list(num_trees), attributes, list(max_depths), self.seed)
+      for attributes in num_attributes for train, holdout in splits
+    ]
+    counts = self.run(_forest_job, jobs)
+    results = []
+    for a, attributes in enumerate(num_attributes):
+      cv, test = self.accuracies(splits, counts[a * len(splits):(a + 1) * len(splits)])
+      for i, trees in enumerate(num_trees):
+        for j, max_depth in enumerate(max_depths):
+          results.append({
+            'num_trees': trees,
+            'num_attributes': attributes,
+            'max_depth': max_depth,
+            'cv_accuracy': float(cv[i, j]),
+            'test_accuracy': float(test[i, j]) if test is not None else None,
+          })
+    return results
+
+  @staticmethod
+  def vote(predictions, num_classes:int, num_trees:list) -> list:
+    """
+    Majority vote of the first n trees for every n of num_trees, as RandomForest.predict counts it: on
+    a tie the answer that reached the top count first wins.
+
+    Args:
+      predictions - int array of shape (trees, examples) of class codes below num_classes.
+      num_classes - number of classes.
+      num_trees - forest sizes, at most the number of trees.
+
+    Returns:
+      list of int arrays of the winning class per example, one per forest size
+    """
+    counts = np.cumsum(np.eye(num_classes, dtype=np.int32)[predictions], axis=0)
+    winners = []
+    for trees in num_trees:
+      final = counts[trees - 1]
+      top = final.max(axis=1, keepdims=True)
+      # Counts only grow, so the first tree at the top count is when a class reached it
+      reached = np.argmax(counts[:trees] >= top, axis=0)
+      winners.append(np.argmin(np.where(final == top, reached, trees), axis=1))
+    return winners
+
+  @staticmethod
+  def best(results:list, key:str='cv_accuracy') -> dict:
+    """
+    Setting with the highest accuracy, the first listed winning ties.
+    """
+    best = None
+    for result in results:
+      if best is None or best[key] < result[key]:
+        best = result
+    return best
+
+
+def main(data_file:str='./raw.json', n_jobs:int=None):
+  """
+  Sweep the tree and forest settings of the lab2 targets, printing cross-validated and test accuracy.
+  """
+  from .features import FeatureTable, build_features
+  import lab2
+  with open(data_file) as file:
+    data = json.load(file)
+  for name, spec in (('hotter', lab2.hotter_spec), ('precip', lab2.precip_spec)):
+    (examples, attributes), = build_features([spec], FeatureTable.from_dict(data['training'], data['attributes'], spec.attributes(), lab2.cities), True)
+    (testing, _), = build_features([spec], FeatureTable.from_dict(data['testing'], data['attributes'], spec.attributes(), lab2.cities), True)
+    sweep = Sweep(examples, attributes, testing, n_jobs=n_jobs)
+    features = len(attributes) - 1
+    results = sweep.trees([1, 2, 3, 4, 5, 6, 8, inf], [0.00001, 0.1, 0.2, 0.4, 0.6, 0.8])
+    # Forest trees need distinct attribute subsets, so they use fewer attributes than there are
+    results += sweep.forests([1, 5, 10, 20], sorted({max(1, features // 4), max(1, features // 2), features - 1}), [2, 4, 6])
+    print(f'{name}: {len(examples)} training and {len(testing)} testing examples')
+    for result in results:
+      print('  ' + ' '.join(f'{key}={value}' for key, value in result.items()))
+    print('  best:', Sweep.best(results))
+
+
+if __name__ == '__main__':
+  main(*sys.argv[1:2])
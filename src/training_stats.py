@@ -0,0 +1,112 @@
+from time import perf_counter
+
+class TrainingStats():
+  """
+  Opt-in record of what training did, passed as stats= to DecisionTree or RandomForest.train. Without
+  it training runs exactly as before; with it every node and tree is counted and the split steps of the
+  python engine are timed.
+
+  Fields:
+    nodes_per_depth - dict of depth to nodes built.
+    leaves - nodes that became leaves.
+    candidates - attributes scored as split candidates.
+    rows_scanned - example rows read by the timed steps.
+    calls, seconds - call count and wall time per step (generate_answers, contingency_table, partition and,
+    for numeric attributes, best_threshold). A node's entropy and majority are both taken from its one
+    generate_answers scan.
+    trees - per tree dicts of index, seconds, nodes and depth.
+
+  A callback, called as callback(event, info), streams 'node' events (depth, rows, attribute, None for a
+  leaf) and 'tree' events (the dicts in trees) while training. Trees trained in worker processes only
+  report 'tree' events, once they are done.
+  """
+  def __init__(self, callback:callable=None):
+    self.callback = callback
+    self.nodes_per_depth = {}
+    self.leaves = 0
+    self.candidates = 0
+    self.rows_scanned = 0
+    self.calls = {}
+    self.seconds = {}
+    self.trees = []
+    # Depth of the node being built by recursive training
+    self.depth = 0
+
+  def timed(self, name:str, function:callable, *args, rows:int=0):
+    """
+    Call function(*args), counting the call, its wall time and the rows it scans under name.
+    """
+    start = perf_counter()
+    result = function(*args)
+    self.seconds[name] = self.seconds.get(name, 0) + perf_counter() - start
+    self.calls[name] = self.calls.get(name, 0) + 1
+    self.rows_scanned += rows
+    return result
+
+  def node(self, depth:int, rows:int, attribute=None):
+    """
+    Count a node built at depth from rows examples, asking attribute (None for a leaf).
+    """
+    self.nodes_per_depth[depth] = self.nodes_per_depth.get(depth, 0) + 1
+    if attribute is None: self.leaves += 1
+    if self.callback is not None:
+      self.callback('node', {'depth': depth, 'rows': rows, 'attribute': attribute})
+
+  def nodes_of(self, tree, depth:int=0):
+    """
+    Count the nodes of a tree trained without per-node stats (e.g. by the numpy engine).
+    """
+    nodes = [(tree, depth)]
+    while nodes:
+      node, node_depth = nodes.pop()
+      self.node(node_depth, None, node.best_attribute if node.children is not None else None)
+      if node.children is not None:
+        nodes.extend((child, node_depth + 1) for child in reversed(list(node.children.values())))
+
+  def tree(self, seconds:float, tree) -> dict:
+    """
+    Record a finished tree.
+    """
+    info = {'index': len(self.trees), 'seconds': seconds, 'nodes': tree.size(), 'depth': tree.depth()}
+    self.trees.append(info)
+    if self.callback is not None:
+      self.callback('tree', info)
+    return info
+
+  def merge(self, other):
+    """
+    Add the counts of another TrainingStats, e.g. one filled in by a worker process. Its trees are
+    numbered after the trees already recorded and reported to the callback.
+    """
+    for depth, count in other.nodes_per_depth.items():
+      self.nodes_per_depth[depth] = self.nodes_per_depth.get(depth, 0) + count
+    self.leaves += other.leaves
+    self.candidates += other.candidates
+    self.rows_scanned += other.rows_scanned
+    for name, count in other.calls.items():
+      self.calls[name] = self.calls.get(name, 0) + count
+      self.seconds[name] = self.seconds.get(name, 0) + other.seconds[name]
+    for info in other.trees:
+      info = dict(info, index=len(self.trees))
+      self.trees.append(info)
+      if self.callback is not None:
+        self.callback('tree', info)
+
+  def __getstate__(self):
+    # Callbacks stay in the process that asked for them
+    return dict(self.__dict__, callback=None)
+
+  def as_dict(self) -> dict:
+    return {
+      'nodes_per_depth': dict(sorted(self.nodes_per_depth.items())),
+      'nodes': sum(self.nodes_per_depth.values()),
+      'leaves': self.leaves,
+      'candidates': self.candidates,
+      'rows_scanned': self.rows_scanned,
+      'calls': dict(self.calls),
+      'seconds': dict(self.seconds),
+      'trees': list(self.trees),
+    }
+
+  def __repr__(self):
+    return 'TrainingStats(' + str(self.as_dict()) + ')'
@@ -0,0 +1,135 @@
+import numpy as np
+from math import inf
+from .decision_tree import DecisionTree
+from .encoded_dataset import EncodedDataset
+
+class LevelWiseTrainer():
+  """
+  Grow a DecisionTree breadth-first, one depth level at a time. Split statistics for every open node
+  of a level are counted in a single pass over the encoded data, keyed by node id, so training takes
+  one scan per level instead of one per node and never recurses.
+  """
+  def __init__(self, max_depth=inf, threshold=0.00001):
+    self.max_depth = max_depth
+    self.threshold = threshold
+
+  def fit(self, examples:list, attributes:list) -> DecisionTree:
+    """
+    Encode the examples and train a tree on them.
+
+    Args:
+      examples - a list of tuples representing data points, answer in the final column.
+      attributes - names of the attributes, last being the answer column. None marks attributes not to ask.
+
+    Returns:
+      DecisionTree
+    """
+    return self.fit_encoded(EncodedDataset.encode(examples, attributes))
+
+  def fit_encoded(self, dataset:EncodedDataset, rows=None) -> DecisionTree:
+    """
+    Train a tree on an already encoded dataset.
+
+    Args:
+      dataset - EncodedDataset to train on.
+      rows - array of row indices to train on. Defaults to every row.
+
+    Returns:
+      DecisionTree with children keyed by the original (decoded) values
+    """
+    if rows is None:
+      rows = np.arange(len(dataset), dtype=np.intp)
+    num_columns = dataset.matrix.shape[1]
+    active = np.array([dataset.attributes[i] is not None for i in range(num_columns)], dtype=bool)
+    root = DecisionTree.from_parts()
+    # Open nodes of the current level, by position: tree node, row indices, askable columns
+    level = [(root, np.asarray(rows, dtype=np.intp), active)]
+    depth = 0
+    while level:
+      level = self.grow_level(dataset, level, depth)
+      depth += 1
+    return root
+
+  def grow_level(self, dataset:EncodedDataset, level:list, depth:int) -> list:
+    """
+    Decide every open node of a level: settle leaves, pick the best question of the rest and
+    partition their rows into the open nodes of the next level.
+
+    Args:
+      dataset - EncodedDataset being trained on.
+      level - list of (node, rows, active columns) for the open nodes.
+      depth - depth of the level, root being 0.
+
+    Returns:
+      list of (node, rows, active columns) for the next level
+    """
+    num_values = len(dataset.codebook)
+    num_labels = len(dataset.label_values)
+    sizes = np.array([len(rows) for _, rows, _ in level], dtype=np.intp)
+    all_rows = np.concatenate([rows for _, rows, _ in level])
+    node_of = np.repeat(np.arange(len(level)), sizes)
+    labels = dataset.labels[all_rows]
+
+    label_counts = np.bincount(node_of * num_labels + labels, minlength=len(level) * num_labels)
+    label_counts = label_counts.reshape(len(level), num_labels)
+    entropy = EncodedDataset.entropy(label_counts)
+    askable = np.stack([active for _, _, active in level])
+    is_leaf = (entropy == 0) | (entropy < self.threshold) | ~askable.any(axis=1) | (depth >= self.max_depth)
+
+    for position in np.flatnonzero(is_leaf):
+      node, rows, _ = level[position]
+      node.value = dataset.label_values[dataset.majority(rows)]
+    splits = np.flatnonzero(~is_leaf)
+    if len(splits) == 0:
+      return []
+
+    # Renumber split nodes 0..k-1 and keep only their rows
+    split_of = np.full(len(level), -1, dtype=np.intp)
+    split_of[splits] = np.arange(len(splits))
+    keep = split_of[node_of] >= 0
+    split_rows = all_rows[keep]
+    split_node = split_of[node_of[keep]]
+    split_labels = labels[keep]
+
+    # One bincount over (node, column, value, answer) for every split node of the level
+    num_columns = dataset.matrix.shape[1]
+    keys = dataset.matrix[split_rows].astype(np.intp)
+    keys += (split_node[:, None] * num_columns + np.arange(num_columns)[None, :]) * num_values
+    keys *= num_labels
+    keys += split_labels[:, None]
+    size = len(splits) * num_columns * num_values * num_labels
+    counts = np.bincount(keys.ravel(), minlength=size).reshape(len(splits), num_columns, num_values, num_labels)
+    del keys
+
+    value_totals = counts.sum(axis=3)
+    child_entropy = EncodedDataset.entropy(counts)
+    gains = entropy[splits][:, None] - (child_entropy * value_totals).sum(axis=2) / sizes[splits][:, None]
+    gains[~askable[splits]] = -inf
+    # First column within DecisionTree.gain_tolerance of the best, as the python engine picks
+    best = np.argmax(gains >= gains.max(axis=1, keepdims=True) - DecisionTree.gain_tolerance, axis=1)
+
+    # Partition all split nodes at once by (node, value of its best column), rows stay ascending
+    values = dataset.matrix[split_rows, best[split_node]].astype(np.intp)
+    groups = split_node * num_values + values
+    order = np.argsort(groups, kind='stable')
+    group_keys, starts = np.unique(groups[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
+    children_of = {}
+    for key, start, end in zip(group_keys, starts, ends):
+      children_of.setdefault(int(key) // num_values, []).append((int(key) % num_values, split_rows[order[start:end]]))
+
+    next_level = []
+    for split, position in enumerate(splits):
+      node, _, active = level[position]
+      column = int(best[split])
+      node.best_attr_index = column
+      node.best_attribute = dataset.attributes[column]
+      node.children = {}
+      remaining = active.copy()
+      remaining[column] = False
+      # Children keep the order their values first appear in, like DecisionTree.partition_all
+      for code, rows in sorted(children_of[split], key=lambda child: child[1][0]):
+        child = DecisionTree.from_parts()
+        node.children[dataset.codebook.decode(code)] = child
+        next_level.append((child, rows, remaining))
+    return next_level
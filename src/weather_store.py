@@ -0,0 +1,257 @@
+import json
+import os
+import struct
+import sys
+import numpy as np
+
+# File layout:
+#   magic (4 bytes) | format version (uint16) | header length (uint32) | JSON header | columns
+# Each subset stores, per attribute, a (days, stations) value column followed by a (days, stations)
+# uint8 flag column, in header order, each starting on an 8 byte boundary. Offsets follow from the
+# header, so opening a store reads only the header and each column is memory-mapped on first use.
+MAGIC = b'WXST'
+VERSION = 1
+PREFIX = struct.Struct('<4sHI')
+ALIGNMENT = 8
+STORE_EXTENSION = '.wxs'
+
+def _align(position:int) -> int:
+  return position + -position % ALIGNMENT
+
+
+class WeatherStore():
+  """
+  Columnar weather data: for every subset ('training', 'testing', ...) and WeatherReport attribute, a
+  typed (days, stations) value column and a flag column saying what each cell holds.
+  """
+  VALUE = 0
+  MISSING = 1   # 'M'
+  TRACE = 2     # 'T'
+  NONE = 3      # optional column left out of the product
+  ABSENT = 4    # no report from the station that day
+  STRING = 5    # other text, value is an index into the column's strings
+  INTEGER = 6   # int stored in a float column
+
+  def __init__(self, header:dict, columns:dict):
+    """
+    Args:
+      header - attributes, stations and per subset the days and column types.
+      columns - (subset, attribute) to (values, flags), filled in lazily for stores opened from a file.
+    """
+    self.header = header
+    self.attributes = header['attributes']
+    self.stations = header['stations']
+    self.columns = columns
+    self.buffer = None
+    self.offsets = {}
+
+  @staticmethod
+  def from_aggregate(aggregate:dict):
+    """
+    Build a store in memory from the nested date -> station -> row dict of get_training_data.
+    Every key other than 'attributes' is a subset.
+    """
+    attributes = list(aggregate['attributes'])
+    subsets = [key for key in aggregate if key != 'attributes']
+    stations = []
+    station_index = {}
+    for subset in subsets:
+      for reports in aggregate[subset].values():
+        for station in reports:
+          if station not in station_index:
+            station_index[station] = len(stations)
+            stations.append(station)
+
+    header = {'attributes': attributes, 'stations': stations, 'subsets': {}}
+    columns = {}
+    for subset in subsets:
+      days = list(aggregate[subset].keys())
+      shape = (len(days), len(stations))
+      raw = [[[None] * len(stations) for _ in days] for _ in attributes]
+      flags = np.full((len(attributes),) + shape, WeatherStore.ABSENT, dtype=np.uint8)
+      for d, day in enumerate(days):
+        for station, row in aggregate[subset][day].items():
+          s = station_index[station]
+          flags[:, d, s] = WeatherStore.VALUE
+          for a, value in enumerate(row):
+            raw[a][d][s] = value
+      subset_header = {'days': days, 'columns': {}}
+      for a, attribute in enumerate(attributes):
+        values, column_flags, column_header = WeatherStore.encode_column(raw[a], flags[a])
+        subset_header['columns'][attribute] = column_header
+        columns[(subset, attribute)] = (values, column_flags)
+      header['subsets'][subset] = subset_header
+    return WeatherStore(header, columns)
+
+  @staticmethod
+  def encode_column(cells:list, flags):
+    """
+    Type one attribute's cells: int32 if every number is an int, float64 otherwise. Text becomes flags.
+
+    Args:
+      cells - nested lists of cell values, (days, stations).
+      flags - uint8 array of the same shape, ABSENT where a station has no report and VALUE elsewhere.
+
+    Returns:
+      [values, flags, column header]
+    """
+    shape = flags.shape
+    flat = [value for row in cells for value in row]
+    kinds = [value.__class__ for value in flat]
+    numeric = np.array([kind is int or kind is float for kind in kinds], dtype=bool).reshape(shape)
+    is_float = float in kinds
+    values = np.array(
+      [value if kind is int or kind is float else 0 for value, kind in zip(flat, kinds)],
+      dtype=np.float64 if is_float else np.int32
+    ).reshape(shape)
+    flags = flags.copy()
+    if is_float:
+      integers = np.array([kind is int for kind in kinds], dtype=bool).reshape(shape)
+      flags[integers & (flags != WeatherStore.ABSENT)] = WeatherStore.INTEGER
+    strings = []
+    string_index = {}
+    # Only text and None cells are left, there are few of them
+    for d, s in zip(*np.nonzero(~numeric & (flags != WeatherStore.ABSENT))):
+      value = cells[d][s]
+      if value is None:
+        flags[d, s] = WeatherStore.NONE
+      elif value == 'M':
+        flags[d, s] = WeatherStore.MISSING
+      elif value == 'T':
+        flags[d, s] = WeatherStore.TRACE
+      else:
+        flags[d, s] = WeatherStore.STRING
+        values[d, s] = string_index.setdefault(value, len(strings))
+        if len(strings) < len(string_index): strings.append(value)
+    return values, flags, {'dtype': values.dtype.str, 'strings': strings}
+
+  def write(self, path:str):
+    """
+    Write the store to a file that WeatherStore.open can memory-map. The file is replaced atomically, so
+    stores already open on the old file keep reading it.
+    """
+    encoded = json.dumps(self.header).encode()
+    offsets = WeatherStore.layout(self.header, len(encoded))
+    temporary = path + f'.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+      file.write(PREFIX.pack(MAGIC, VERSION, len(encoded)))
+      file.write(encoded)
+      for (subset, attribute, kind), (offset, _, _) in offsets.items():
+        values, flags = self.column(subset, attribute)
+        array = values if kind == 'values' else flags
+        file.write(b'\0' * (offset - file.tell()))
+        file.write(np.ascontiguousarray(array).tobytes())
+    os.replace(temporary, path)
+
+  @staticmethod
+  def layout(header:dict, header_length:int) -> dict:
+    """
+    Offset, dtype and shape of every column in the file, in header order.
+    """
+    offsets = {}
+    position = _align(PREFIX.size + header_length)
+    num_stations = len(header['stations'])
+    for subset, subset_header in header['subsets'].items():
+      shape = (len(subset_header['days']), num_stations)
+      for attribute in header['attributes']:
+        for kind, dtype in (('values', subset_header['columns'][attribute]['dtype']), ('flags', '|u1')):
+          dtype = np.dtype(dtype)
+          offsets[(subset, attribute, kind)] = (position, dtype, shape)
+          position = _align(position + dtype.itemsize * shape[0] * shape[1])
+    return offsets
+
+  @staticmethod
+  def open(path:str):
+    """
+    Open a store file. Only the header is read, columns are mapped from the file when first used.
+    """
+    with open(path, 'rb') as file:
+      magic, version, length = PREFIX.unpack(file.read(PREFIX.size))
+      if magic != MAGIC:
+        raise Exception(f'{path} is not a weather store')
+      if version > VERSION:
+        raise Exception(f'Unsupported weather store version {version}, expected at most {VERSION}')
+      header = json.loads(file.read(length))
+    store = WeatherStore(header, {})
+    store.buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    store.offsets = WeatherStore.layout(header, length)
+    return store
+
+  def subsets(self) -> list:
+    return list(self.header['subsets'].keys())
+
+  def days(self, subset:str) -> list:
+    return self.header['subsets'][subset]['days']
+
+  def column(self, subset:str, attribute:str):
+    """
+    Values and flags of one attribute for every day and station of a subset.
+
+    Returns:
+      [values, flags] - arrays of shape (days, stations). Values are only meaningful where flags is
+      VALUE or INTEGER (or STRING, as an index into strings(subset, attribute)).
+    """
+    key = (subset, attribute)
+    if key not in self.columns:
+      arrays = []
+      for kind in ('values', 'flags'):
+        offset, dtype, shape = self.offsets[(subset, attribute, kind)]
+        size = dtype.itemsize * shape[0] * shape[1]
+        arrays.append(self.buffer[offset:offset + size].view(dtype).reshape(shape))
+      self.columns[key] = tuple(arrays)
+    return list(self.columns[key])
+
+  def strings(self, subset:str, attribute:str) -> list:
+    return self.header['subsets'][subset]['columns'][attribute]['strings']
+
+  def cells(self, subset:str, attribute:str) -> list:
+    """
+    One attribute as nested lists of the original cell values (numbers, 'M', 'T', None), None for absent stations.
+    """
+    values, flags = self.column(subset, attribute)
+    strings = self.strings(subset, attribute)
+    cells = values.tolist()
+    for d, s in zip(*np.nonzero(flags)):
+      flag = flags[d, s]
+      if flag == WeatherStore.MISSING: cells[d][s] = 'M'
+      elif flag == WeatherStore.TRACE: cells[d][s] = 'T'
+      elif flag == WeatherStore.STRING: cells[d][s] = strings[int(values[d, s])]
+      elif flag == WeatherStore.INTEGER: cells[d][s] = int(values[d, s])
+      else: cells[d][s] = None
+    return cells
+
+  def subset_dict(self, subset:str) -> dict:
+    """
+    A subset as the nested date -> station -> row dict used by the feature builders.
+    """
+    days = self.days(subset)
+    columns = [self.cells(subset, attribute) for attribute in self.attributes]
+    present = self.column(subset, self.attributes[0])[1] != WeatherStore.ABSENT
+    data = {}
+    for d, day in enumerate(days):
+      data[day] = {
+        station: [column[d][s] for column in columns]
+        for s, station in enumerate(self.stations) if present[d, s]
+      }
+    return data
+
+  def to_aggregate(self) -> dict:
+    """
+    The whole store in the format of get_training_data.
+    """
+    aggregate = {'attributes': list(self.attributes)}
+    for subset in self.subsets():
+      aggregate[subset] = self.subset_dict(subset)
+    return aggregate
+
+
+def main(json_file:str, store_file:str):
+  """
+  Convert a JSON data store (e.g. raw.json) into a weather store file.
+  """
+  with open(json_file) as file:
+    WeatherStore.from_aggregate(json.load(file)).write(store_file)
+
+
+if __name__ == '__main__':
+  main(*sys.argv[1:3])
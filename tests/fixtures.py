@@ -0,0 +1,91 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import hashlib
+import threading
+
+def cf6_product(city:str, month:str, year:int, rows:list) -> str:
+  """
+  Render daily rows (lists of values, day first) as the text of a CF6 product.
+  """
+  lines = [
+    '',
+    '000',
+    f'CXUS51 KBUF 010638',
+    f'CF6{city}',
+    'PRELIMINARY LOCAL CLIMATOLOGICAL DATA (WS FORM: F-6)',
+    '',
+    f'                                          STATION:   {city}',
+    f'                                          MONTH:     {month}',
+    f'                                          YEAR:      {year}',
+    '',
+    '  TEMPERATURE IN F:       :PCPN:    SNOW:  WIND       :SUNSHINE: SKY   :PK WND',
+    '================================================================================',
+    '1   2   3   4   5  6A  6B    7    8   9   10  11  12  13    14  15   16   17  18',
+    '                                          AVG MX 2MIN',
+    'DY MAX MIN AVG DEP HDD CDD  WTR  SNW DPTH SPD SPD DIR MIN PSBL S-S WX    SPD DR',
+    '================================================================================',
+    '',
+  ]
+  for row in rows:
+    lines.append(' ' + ' '.join(str(value) for value in row))
+  lines += ['================================================================================', '']
+  return '\n'.join(lines)
+
+def cf6_page(product:str) -> str:
+  return f'<html><body><pre class="glossaryProduct">{product}</pre></body></html>'
+
+
+class CannedCF6Server():
+  """
+  Local stand-in for the product endpoint serving canned pages keyed by (issuedby, version).
+  Statuses queued in failures[(city, version)] are answered before the page. Pages carry an ETag
+  and conditional requests for an unchanged page get 304.
+  """
+  def __init__(self, pages:dict):
+    self.pages = pages
+    self.failures = {}
+    self.requests = []
+    server = self
+
+    class Handler(BaseHTTPRequestHandler):
+      protocol_version = 'HTTP/1.1'
+
+      def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        key = (query['issuedby'][0], int(query['version'][0]))
+        server.requests.append((key, dict(self.headers)))
+        failures = server.failures.get(key)
+        if failures:
+          self.respond(failures.pop(0), b'')
+        elif key in server.pages:
+          body = server.pages[key].encode()
+          etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+          if self.headers.get('If-None-Match') == etag:
+            self.respond(304, b'', {'ETag': etag})
+          else:
+            self.respond(200, body, {'ETag': etag})
+        else:
+          self.respond(404, b'')
+
+      def respond(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+          self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+      def log_message(self, *args):
+        pass
+
+    self.handler = Handler
+    self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/product.php'
+
+  def __enter__(self):
+    threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    return self
+
+  def __exit__(self, *args):
+    self.httpd.shutdown()
+    self.httpd.server_close()
@@ -0,0 +1,31 @@
+import io
+from contextlib import redirect_stdout
+from unittest import TestCase
+from benchmarks.synthetic import make_examples
+from benchmarks.suite import compare, main
+from src.decision_tree import DecisionTree
+
+class BenchmarkTests(TestCase):
+  def test_make_examples(self):
+    examples, attributes = make_examples(rows=200, attributes=6, values=4, labels=3, seed=1)
+    self.assertEqual(len(examples), 200)
+    self.assertEqual(len(attributes), 7)
+    self.assertTrue(all(len(example) == 7 for example in examples))
+    self.assertEqual({example[-1] for example in examples}, {0, 1, 2})
+    self.assertEqual({example[0] for example in examples}, {0, 1, 2, 3})
+    self.assertEqual(examples, make_examples(rows=200, attributes=6, values=4, labels=3, seed=1)[0])
+    # The answer follows the informative attributes, so a tree asks them first
+    tree = DecisionTree(examples, attributes)
+    self.assertIn(tree.best_attr_index, (0, 1, 2))
+
+  def test_compare_flags_regressions(self):
+    baseline = {'config': {}, 'benchmarks': {'a': {'best': 1.0}, 'b': {'best': 1.0}, 'c': {'best': 1.0}}}
+    results = {'config': {}, 'benchmarks': {'a': {'best': 1.1}, 'b': {'best': 1.5}, 'c': {'best': 0.5}, 'd': {'best': 1.0}}}
+    self.assertEqual(compare(results, baseline, 0.25), ['b'])
+
+  def test_suite_runs_with_three_labels(self):
+    with redirect_stdout(io.StringIO()) as output:
+      code = main(['--rows', '60', '--attributes', '8', '--labels', '3', '--repeat', '1', '--only', 'tree', 'forest'])
+    self.assertEqual(code, 0)
+    self.assertIn('tree.predict_many', output.getvalue())
+    self.assertIn('forest.predict_batch', output.getvalue())
@@ -0,0 +1,103 @@
+import os
+import tempfile
+from unittest import TestCase
+from src.data_collector import CF6Fetcher
+from src.cf6_archive import CF6Archive
+from tests.fixtures import cf6_product, cf6_page, CannedCF6Server
+
+ROW = [38, 35, 37, 12, 28, 0, 0.01, 0.0, 0, 14.2, 28, 240, 'M', 'M', 10, 1, 38, 230]
+
+def issuance(city, month, days):
+  """
+  Page of a CF6 product for the given month with rows for days 1..days.
+  """
+  return cf6_page(cf6_product(city, month, 2024, [[day] + ROW for day in range(1, days + 1)]))
+
+class CF6ArchiveTests(TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    # Newest first: two daily issuances of March, then the final February product
+    self.pages = {
+      ('ROC', 1): issuance('ROC', 'MARCH', 2),
+      ('ROC', 2): issuance('ROC', 'MARCH', 1),
+      ('ROC', 3): issuance('ROC', 'FEBRUARY', 29),
+    }
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def run_update(self, server, **kwargs):
+    archive = CF6Archive(self.directory.name, **kwargs)
+    results = archive.update(CF6Fetcher(server.url, retries=0, backoff=0), ['ROC'])
+    aggregate = {}
+    archive.mark_merged(archive.merge_pending(aggregate))
+    return results, aggregate
+
+  def test_first_run_stores_every_product(self):
+    with CannedCF6Server(self.pages) as server:
+      results, aggregate = self.run_update(server, training_after=2)
+    self.assertEqual({'ROC': 4}, results)
+    self.assertTrue(os.path.exists(os.path.join(self.directory.name, 'ROC', '2024-03.txt')))
+    self.assertEqual(['03/01/24', '03/02/24'], list(aggregate['testing'].keys()))
+    self.assertEqual(29, len(aggregate['training']))
+
+  def test_refresh_fetches_only_new_products(self):
+    with CannedCF6Server(self.pages) as server:
+      self.run_update(server)
+      results, aggregate = self.run_update(server)
+      self.assertEqual({'ROC': 1}, results)
+      self.assertEqual({}, aggregate)
+      # A new daily issuance shifts the versions by one
+      server.pages = {
+        ('ROC', 1): issuance('ROC', 'MARCH', 3),
+        ('ROC', 2): issuance('ROC', 'MARCH', 2),
+        ('ROC', 3): issuance('ROC', 'MARCH', 1),
+        ('ROC', 4): issuance('ROC', 'FEBRUARY', 29),
+      }
+      results, aggregate = self.run_update(server)
+    self.assertEqual({'ROC': 2}, results)
+    self.assertEqual(['03/01/24', '03/02/24', '03/03/24'], list(aggregate['testing'].keys()))
+
+  def test_refresh_ages_products_into_training(self):
+    self.pages = {
+      ('ROC', 1): issuance('ROC', 'FEBRUARY', 29),
+      ('ROC', 2): issuance('ROC', 'JANUARY', 31),
+    }
+    archive = CF6Archive(self.directory.name, training_after=2)
+    aggregate = {}
+    with CannedCF6Server(self.pages) as server:
+      fetcher = CF6Fetcher(server.url, retries=0, backoff=0)
+      archive.update(fetcher, ['ROC'])
+      archive.mark_merged(archive.merge_pending(aggregate))
+      self.assertEqual(60, len(aggregate['testing']))
+      self.assertNotIn('training', aggregate)
+      # Two new products push February and January past training_after
+      server.pages = {
+        ('ROC', 1): issuance('ROC', 'APRIL', 1),
+        ('ROC', 2): issuance('ROC', 'MARCH', 31),
+        ('ROC', 3): issuance('ROC', 'FEBRUARY', 29),
+        ('ROC', 4): issuance('ROC', 'JANUARY', 31),
+      }
+      self.assertEqual({'ROC': 3}, archive.update(fetcher, ['ROC']))
+      archive.mark_merged(archive.merge_pending(aggregate))
+    self.assertEqual([f'03/{day:02d}/24' for day in range(1, 32)] + ['04/01/24'], sorted(aggregate['testing']))
+    self.assertEqual(60, len(aggregate['training']))
+    self.assertEqual('02/29/24', max(aggregate['training']))
+    self.assertEqual(4, CF6Archive(self.directory.name).manifest['products']['ROC/2024-01']['version'])
+
+  def test_conditional_requests(self):
+    with CannedCF6Server(self.pages) as server:
+      self.run_update(server)
+      server.requests.clear()
+      self.run_update(server)
+    self.assertIn('If-None-Match', server.requests[0][1])
+
+  def test_resumes_interrupted_walk(self):
+    with CannedCF6Server(self.pages) as server:
+      server.failures[('ROC', 2)] = [500]
+      results, aggregate = self.run_update(server)
+      self.assertIsInstance(results['ROC'], Exception)
+      self.assertEqual(2, len(aggregate['testing']))
+      results, aggregate = self.run_update(server)
+    self.assertEqual({'ROC': 4}, results)
+    self.assertEqual(29, len(aggregate['testing']))
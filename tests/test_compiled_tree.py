@@ -0,0 +1,75 @@
+from unittest import TestCase
+from src.decision_tree import DecisionTree
+from src.encoded_dataset import EncodedDataset
+
+class CompiledTreeTests(TestCase):
+  def setUp(self):
+    self.test_data = [
+      ('N','Y','N','Y','Y'),
+      ('N','N','N','N','Y'),
+      ('Y','Y','Y','Y','Y'),
+      ('Y','N','Y','N','N'),
+      ('N','N','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('Y','Y','N','Y','Y'),
+      ('N','Y','Y','N','N'),
+      ('Y','N','N','Y','Y'),
+      ('Y','N','N','N','N'),
+      ('Y','Y','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('N','N','Y','Y','Y'),
+      ('Y','N','Y','N','N'),
+      ('Y','N','N','Y','Y'),
+      ('N','N','Y','N','Y'),
+      ('Y','Y','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('Y','N','Y','N','Y'),
+      ('Y','Y','N','N','N'),
+    ]
+
+    self.index_map = [
+      'veg?', 'iphone?', 'student?', 'american?', 'drinks coffee'
+    ]
+
+  def test_flat_arrays(self):
+    dt = DecisionTree(self.test_data, self.index_map, 1)
+    compiled = dt.compile()
+    self.assertEqual(3, len(compiled))
+    self.assertEqual(1, compiled.depth)
+    self.assertEqual([2, -1, -1, -1], compiled.feature.tolist())
+    self.assertEqual(-1, compiled.leaf[0])
+
+  def test_predict_many_matches_predict(self):
+    for depth in (0, 1, 3):
+      dt = DecisionTree(self.test_data, self.index_map, depth)
+      samples = [example[:-1] for example in self.test_data]
+      self.assertEqual([dt.predict(sample) for sample in samples], dt.predict_many(samples))
+
+  def test_encoded_tuples_match_predict(self):
+    for depth in (0, 1, 3):
+      dt = DecisionTree(self.test_data, self.index_map, depth)
+      compiled = dt.compile()
+      samples = [example[:-1] for example in self.test_data]
+      self.assertEqual([dt.predict(sample) for sample in samples], compiled.predict_many(samples))
+      # Columns no node asks are not read
+      skipped = [column for column in range(compiled.num_columns()) if column not in compiled.columns()]
+      self.assertTrue((compiled.encode(samples)[:, skipped] == len(compiled.codebook)).all())
+
+  def test_encode_keeps_bools_and_numbers_apart(self):
+    compiled = DecisionTree(self.test_data, self.index_map, 1).compile()
+    for value in (1, 1.0, 'Y'):
+      compiled.codebook.encode(value)
+    values = [True, 1, 1.0, None, 'Y', 0]
+    expected = [compiled.codebook.encode(value, len(compiled.codebook)) for value in values]
+    self.assertEqual(expected, compiled.encode_column(values).tolist())
+    self.assertEqual(expected[3:], compiled.encode_column(values[3:]).tolist())
+
+  def test_unseen_values_predict_none(self):
+    dt = DecisionTree(self.test_data, self.index_map, 3)
+    self.assertEqual([None], dt.predict_many([('?', '?', '?', '?')]))
+
+  def test_predict_encoded_matrix(self):
+    dataset = EncodedDataset.encode(self.test_data, self.index_map)
+    dt = DecisionTree(self.test_data, self.index_map, 3)
+    compiled = dt.compile(dataset.codebook)
+    self.assertEqual(dt.predict_many(self.test_data), compiled.predict_many(dataset.matrix))
@@ -0,0 +1,100 @@
+import io
+import re
+from unittest import TestCase
+from src.data_collector import WeatherReport, CF6Fetcher
+from tests.fixtures import cf6_product, cf6_page, CannedCF6Server
+
+ROWS = [
+  [1, 38, 35, 37, 12, 28, 0, 0.01, 0.0, 0, 14.2, 28, 240, 'M', 'M', 10, 1, 38, 230],
+  [2, 41, 30, 36, 11, 29, 0, 'T', 'T', 'T', 9.1, 20, 230, 'M', 'M', 10, 18, 32, 250],
+  [3, 'M', 28, 'M', 'M', 'M', 0, 0.2, 'M', 'M', 9.1, 20, 230, 'M', 'M', 6, 27, 340],
+]
+
+class WeatherReportTests(TestCase):
+  def test_parse_product(self):
+    wr = WeatherReport(cf6_product('ROC', 'FEBRUARY', 2024, ROWS))
+    self.assertEqual(('ROC', 'FEBRUARY', '2024'), (wr.city, wr.month, wr.year))
+    reports = wr.to_dict()['reports']
+    self.assertEqual(['02/01/24', '02/02/24', '02/03/24'], list(reports.keys()))
+    self.assertEqual((38, 35, 37, 12, 28, 0, 0.01, 0.0, 0, 14.2, 28, 240, 'M', 'M', 10, 1, 38, 230), reports['02/01/24'])
+    self.assertEqual(('M', 28, 'M', 'M', 'M', 0, 0.2, 'M', 'M', 9.1, 20, 230, 'M', 'M', 6, 27, None, 340), reports['02/03/24'])
+
+  def test_string_to_type_matches_regex_rules(self):
+    def reference(string):
+      if re.search(r'[a-zA-Z]', string) is not None: return string
+      elif re.search(r'\.', string) is not None: return float(string)
+      return int(string)
+    for token in ['M', 'T', '0', '38', '-3', '0.14', '-0.5', '10.0', '1e5', 'MM', 'S', '12Z', '001']:
+      expected = reference(token)
+      actual = WeatherReport.string_to_type(token)
+      self.assertEqual(expected, actual)
+      self.assertIs(type(expected), type(actual))
+
+  def test_rows_must_be_whole_lines(self):
+    product = cf6_product('ROC', 'FEBRUARY', 2024, ROWS)
+    lines = product.split('\n')
+    # Trailing spaces, tabs and an unterminated last line do not count as rows
+    lines[-5] = lines[-5] + ' '
+    lines[-4] = lines[-4].replace(' ', '\t', 2)
+    wr = WeatherReport('\n'.join(lines[:-3]))
+    self.assertEqual([], list(wr.to_dict()['reports'].keys()))
+
+  def test_invalid_day_raises(self):
+    with self.assertRaises(ValueError):
+      WeatherReport(cf6_product('ROC', 'FEBRUARY', 2023, [[29] + ROWS[0][1:]]))
+
+  def test_iter_rows_matches_parser(self):
+    product = cf6_product('ROC', 'FEBRUARY', 2024, ROWS)
+    expected = WeatherReport(product).reports
+    self.assertEqual(expected, tuple(WeatherReport.iter_rows(io.StringIO(product))))
+    self.assertEqual(expected, tuple(WeatherReport.iter_rows(io.BytesIO(product.encode()))))
+    self.assertEqual(expected, tuple(WeatherReport.iter_rows(io.StringIO(cf6_page(product)), html=True)))
+
+  def test_iter_rows_is_lazy(self):
+    lines = iter(cf6_product('ROC', 'FEBRUARY', 2024, ROWS).splitlines(keepends=True))
+    rows = WeatherReport.iter_rows(lines)
+    self.assertEqual('02/01/24-ROC', next(rows)[0])
+    self.assertTrue(any(True for _ in lines), 'Expected later lines to be unread')
+
+  def test_iter_rows_needs_header(self):
+    product = cf6_product('ROC', 'FEBRUARY', 2024, ROWS).replace('MONTH:', 'MNTH:')
+    with self.assertRaises(Exception):
+      list(WeatherReport.iter_rows(io.StringIO(product)))
+
+
+class CF6FetcherTests(TestCase):
+  def setUp(self):
+    self.pages = {
+      (city, version): cf6_page(cf6_product(city, 'FEBRUARY', 2024, [[version] + ROWS[0][1:]]))
+      for city in ('ROC', 'BUF') for version in (1, 2, 3)
+    }
+
+  def test_fetch_all_in_order(self):
+    with CannedCF6Server(self.pages) as server:
+      fetcher = CF6Fetcher(server.url, max_workers=4)
+      results = list(fetcher.fetch_all(['ROC', 'BUF'], [1, 2, 3]))
+    self.assertEqual([(c, v) for c in ('ROC', 'BUF') for v in (1, 2, 3)], [r[:2] for r in results])
+    for city, version, wr in results:
+      self.assertEqual(city, wr.city)
+      self.assertEqual([f'02/0{version}/24'], list(wr.to_dict()['reports'].keys()))
+
+  def test_iter_rows_streams_response(self):
+    with CannedCF6Server(self.pages) as server:
+      rows = list(CF6Fetcher(server.url).iter_rows('BUF', 2))
+    self.assertEqual(['02/02/24-BUF'], [row[0] for row in rows])
+
+  def test_retries_server_errors(self):
+    with CannedCF6Server(self.pages) as server:
+      server.failures[('ROC', 1)] = [503, 500]
+      fetcher = CF6Fetcher(server.url, retries=2, backoff=0)
+      self.assertEqual('ROC', fetcher.fetch('ROC', 1).city)
+      self.assertEqual(3, len([r for r in server.requests if r[0] == ('ROC', 1)]))
+
+  def test_failed_product_does_not_stop_others(self):
+    with CannedCF6Server(self.pages) as server:
+      server.failures[('BUF', 2)] = [500, 500]
+      fetcher = CF6Fetcher(server.url, retries=1, backoff=0)
+      results = list(fetcher.fetch_all(['BUF'], [1, 2, 3, 4]))
+    self.assertIsInstance(results[1][2], Exception)
+    self.assertIsInstance(results[3][2], Exception)
+    self.assertEqual([1, 3], [version for _, version, wr in results if isinstance(wr, WeatherReport)])
@@ -0,0 +1,33 @@
+from unittest import TestCase
+from src.data_collector import WeatherReport
+from src.day_index import DayIndex
+
+class DayIndexTests(TestCase):
+  def setUp(self):
+    # Keys out of order and with a gap on 03/02/24, as in data assembled from several products
+    self.sample_data = {
+      '03/03/24': {'ROC': [1], 'BUF': [2]},
+      '02/28/24': {'ROC': [3]},
+      '02/29/24': {'BUF': [4]},
+      '03/01/24': {'ROC': [5], 'BUF': [6]},
+      '03/04/24': {},
+    }
+
+  def test_ordinal(self):
+    for day in ('02/29/24', '12/31/99', '01/01/00', '07/04/68', '01/01/69'):
+      self.assertEqual(DayIndex.ordinal(day), WeatherReport.str_to_date(day).toordinal())
+
+  def test_present(self):
+    index = DayIndex.from_dict(self.sample_data)
+    self.assertEqual(index.stations, ['ROC', 'BUF'])
+    self.assertEqual(len(index), 5)
+    self.assertEqual(index.present(-1).tolist(), [False, False, True, True, True])
+    self.assertEqual(index.present(0, 'ROC').tolist(), [True, True, False, True, False])
+    self.assertEqual(index.present(1, 'BUF').tolist(), [False, True, True, False, False])
+    self.assertEqual(index.key(index.ordinals[1] + 1), '02/29/24')
+
+  def test_window(self):
+    index = DayIndex.from_dict(self.sample_data, ['ROC'])
+    self.assertEqual(index.window((-1, -2), (0,), 'ROC').tolist(), [False, False, False, True, False])
+    self.assertEqual(index.window((1,), (1, 0), 'ROC').tolist(), [False, False, False, False, False])
+    self.assertEqual(index.window((1,)).tolist(), [True, True, True, False, False])
@@ -1,3 +1,4 @@
+from array import array
 from unittest import TestCase
 from src.decision_tree import DecisionTree
 
@@ -119,4 +120,64 @@ class DecisionTreeTests(TestCase):
           real_outcome, predicted_outcome,
           f"Outcome {real_outcome} should not have matched predicted outcome {predicted_outcome}"
         )
-      
\ No newline at end of file
+      
+  def test_contingency_table_matches_partitions(self):
+    table = DecisionTree.contingency_table(self.test_data, self.index_map)
+    self.assertEqual(list(table.keys()), [0, 1, 2, 3])
+    for attr_index, column in table.items():
+      for option, counts in column.items():
+        partition = DecisionTree.partition(self.test_data, attr_index, option)
+        self.assertEqual(DecisionTree.generate_answers(partition), counts)
+
+  def test_best_question_only_partitions_chosen_attribute(self):
+    best_attr, options = DecisionTree.best_question(self.test_data, self.index_map)
+    self.assertEqual('student?', self.index_map[best_attr])
+    self.assertEqual(
+      {option: DecisionTree.partition(self.test_data, best_attr, option) for option in options},
+      options
+    )
+
+  def test_row_indices_match_copied_examples(self):
+    rows = array('I', range(0, len(self.test_data), 2))
+    subset = [self.test_data[i] for i in rows]
+    best_attr, options = DecisionTree.best_question(self.test_data, self.index_map, rows=rows)
+    self.assertEqual(DecisionTree.best_question(subset, self.index_map)[0], best_attr)
+    for option, option_rows in options.items():
+      self.assertIsInstance(option_rows, array)
+      self.assertEqual(DecisionTree.partition(subset, best_attr, option), [self.test_data[i] for i in option_rows])
+    self.assertEqual(
+      repr(DecisionTree(subset, self.index_map, 3)),
+      repr(DecisionTree(self.test_data, self.index_map, 3, rows=rows))
+    )
+
+  def test_prune_collapses_agreeing_leaves(self):
+    leaf = lambda value: DecisionTree.from_parts(value=value)
+    dt = DecisionTree.from_parts(best_attr_index=0, best_attribute='veg?', children={
+      'Y': DecisionTree.from_parts(best_attr_index=1, best_attribute='iphone?', children={'Y': leaf('N'), 'N': leaf('N')}),
+      'N': leaf('Y'),
+    })
+    self.assertEqual({'before': 5, 'after': 3}, dt.prune())
+    self.assertEqual('N', dt.children['Y'].value)
+    self.assertEqual('N', dt.predict(('Y', '?')))
+    self.assertEqual({'before': 3, 'after': 3}, dt.prune())
+
+  def test_reduced_error_pruning(self):
+    train, holdout = self.test_data[:14], self.test_data[14:]
+    dt = DecisionTree(train, self.index_map)
+    samples = [example[:-1] for example in holdout]
+    errors = sum(dt.predict(sample) != example[-1] for sample, example in zip(samples, holdout))
+    dt.predict_many(samples)
+    counts = dt.prune(holdout, train)
+    self.assertEqual(dt.size(), counts['after'])
+    self.assertLess(counts['after'], counts['before'])
+    self.assertLessEqual(sum(dt.predict(sample) != example[-1] for sample, example in zip(samples, holdout)), errors)
+    # The compiled tree is rebuilt from the pruned nodes
+    self.assertEqual([dt.predict(sample) for sample in samples], dt.predict_many(samples))
+    with self.assertRaises(Exception):
+      dt.prune(holdout)
+
+  def test_pruning_keeps_useful_splits(self):
+    examples = [('Y', 'Y', 'Y'), ('Y', 'N', 'N'), ('N', 'Y', 'N'), ('N', 'N', 'N')] * 3
+    dt = DecisionTree(examples, ['a', 'b', 'answer'])
+    self.assertEqual({'before': 5, 'after': 5}, dt.prune(examples[:4], examples))
+    self.assertEqual([example[-1] for example in examples], [dt.predict(example[:-1]) for example in examples])
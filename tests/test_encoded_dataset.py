@@ -0,0 +1,76 @@
+import json
+from unittest import TestCase
+import numpy as np
+from src.decision_tree import DecisionTree
+from src.encoded_dataset import Codebook, EncodedDataset
+from src.tree_trainer import LevelWiseTrainer
+from lab2 import construct_precip_data, construct_hotter_daily_data
+
+class EncodedDatasetTests(TestCase):
+  def setUp(self):
+    self.test_data = [
+      ('N','Y','N','Y','Y'),
+      ('N','N','N','N','Y'),
+      ('Y','Y','Y','Y','Y'),
+      ('Y','N','Y','N','N'),
+      ('N','N','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('Y','Y','N','Y','Y'),
+      ('N','Y','Y','N','N'),
+      ('Y','N','N','Y','Y'),
+      ('Y','N','N','N','N'),
+      ('Y','Y','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('N','N','Y','Y','Y'),
+      ('Y','N','Y','N','N'),
+      ('Y','N','N','Y','Y'),
+      ('N','N','Y','N','Y'),
+      ('Y','Y','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('Y','N','Y','N','Y'),
+      ('Y','Y','N','N','N'),
+    ]
+
+    self.index_map = [
+      'veg?', 'iphone?', 'student?', 'american?', 'drinks coffee'
+    ]
+
+  def test_codebook_keeps_booleans_apart_from_numbers(self):
+    codebook = Codebook()
+    self.assertEqual([0, 1, 2], [codebook.encode(False), codebook.encode(True), codebook.encode(None)])
+    self.assertEqual(3, codebook.encode(1))
+    self.assertEqual(4, codebook.encode(0.0))
+    self.assertIs(True, codebook.decode(1))
+    self.assertEqual(-1, codebook.encode('unseen', -1))
+
+  def test_gains_match_python_engine(self):
+    dataset = EncodedDataset.encode(self.test_data, self.index_map)
+    rows = np.arange(len(dataset))
+    entropy = DecisionTree.get_entropy(self.test_data)
+    gains = dataset.information_gains(rows, np.arange(4), entropy)
+    table = DecisionTree.contingency_table(self.test_data, self.index_map)
+    for attr_index, column in table.items():
+      expected = DecisionTree.information_gain(column, len(self.test_data), entropy)
+      self.assertAlmostEqual(expected, gains[attr_index])
+
+  def test_engines_build_same_tree(self):
+    for depth in (1, 2, 3):
+      self.assertEqual(
+        repr(DecisionTree(self.test_data, self.index_map, depth)),
+        repr(DecisionTree(self.test_data, self.index_map, depth, engine='numpy'))
+      )
+
+  def test_engines_build_same_tree_on_lab2_data(self):
+    with open('./raw1.json') as file:
+      data = json.load(file)
+    for builder in (construct_precip_data, construct_hotter_daily_data):
+      examples, attributes = builder(data, 'training')
+      python = repr(DecisionTree(examples, list(attributes)))
+      self.assertEqual(python, repr(DecisionTree(examples, list(attributes), engine='numpy')))
+      self.assertEqual(python, repr(LevelWiseTrainer().fit(examples, list(attributes))))
+
+  def test_boolean_features(self):
+    data = [(True, None, True), (False, True, False), (None, False, False), (True, True, True)]
+    dt = DecisionTree(data, ['a', 'b', 'answer'], engine='numpy')
+    for example in data:
+      self.assertEqual(example[-1], dt.predict(example[:-1]))
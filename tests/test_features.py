@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+from src.features import FeatureSpec, FeatureTable, Threshold, Compare, Raw, build_features
+from src.weather_store import WeatherStore
+from lab2 import get_training_data, construct_precip_data, construct_hotter_daily_data, precip_spec, hotter_spec, cities
+
+class FeatureTests(TestCase):
+  def setUp(self):
+    self.attributes = ['WTR PCPN', 'DEP']
+    self.sample_data = {
+      '03/01/24': {'ROC': [0.5, 2], 'BUF': ['T', -1]},
+      '03/02/24': {'ROC': ['M', 'M'], 'BUF': [0.1, 4]},
+      '03/03/24': {'ROC': [0.3, 0], 'BUF': [0.2, -2]},
+      '03/04/24': {'BUF': [1, 3]},
+    }
+    self.stations = ['ROC', 'BUF']
+    self.table = FeatureTable.from_dict(self.sample_data, self.attributes, self.attributes, self.stations)
+
+  def test_threshold(self):
+    spec = FeatureSpec(
+      [Threshold('WTR PCPN', station) for station in self.stations],
+      Threshold('WTR PCPN', 'BUF', lag=0, name='RAIN'),
+    )
+    # Target days 03/02 to 03/05, the answer needs BUF on the target day
+    examples, names = build_features([spec], self.table, False)[0]
+    self.assertEqual(names, ['WTR PCPN IN ROC 1 DAY AGO', 'WTR PCPN IN BUF 1 DAY AGO'])
+    self.assertEqual(examples, [(True, False), (None, False), (True, False), (None, True)])
+    examples, names = build_features([spec], self.table, True)[0]
+    self.assertEqual(names[-1], 'RAIN')
+    self.assertEqual(examples, [(True, False, False), (None, False, False), (True, False, True)])
+
+  def test_compare_and_requirements(self):
+    spec = FeatureSpec(
+      [Compare('DEP', 'BUF', 'ROC', 'less'), Compare('DEP', 'BUF', 'ROC', 'more', lag=2)],
+      Compare('DEP', 'ROC', 'ROC', 'more', lag=0, other_lag=1, name='WARMER'),
+      required_days=(2,),
+      required_reports={'ROC': (1,)},
+    )
+    self.assertEqual(spec.features[0].name, 'BUF LESS DEP THAN ROC 1 DAY AGO')
+    examples, _ = build_features([spec], self.table, False)[0]
+    # 03/02 lacks a day two days before, 03/05 lacks ROC the day before
+    self.assertEqual(examples, [(None, False), (True, None)])
+    examples, _ = build_features([spec], self.table, True)[0]
+    # ROC did not report on 03/04
+    self.assertEqual(examples, [(None, False, None)])
+
+  def test_raw(self):
+    spec = FeatureSpec(
+      [Raw('WTR PCPN', 'BUF'), Threshold('WTR PCPN', 'BUF'), Raw('DEP', 'ROC', lag=2)],
+      Threshold('WTR PCPN', 'BUF', lag=0, name='RAIN'),
+    )
+    examples, names = build_features([spec], self.table, False)[0]
+    self.assertEqual(names[0], 'WTR PCPN IN BUF 1 DAY AGO')
+    self.assertEqual(examples, [('T', False, None), (0.1, False, 2), (0.2, False, None), (1.0, True, 0)])
+
+  def test_shared_pass(self):
+    precip = FeatureSpec([Threshold('WTR PCPN', 'BUF')], Threshold('WTR PCPN', 'ROC', lag=0))
+    both = build_features([precip, precip], self.table, True)
+    self.assertEqual(both[0], both[1])
+
+  def test_from_store(self):
+    with open('./raw.json') as file:
+      data = json.load(file)
+    store = WeatherStore.from_aggregate(data)
+    needed = list(dict.fromkeys(precip_spec.attributes() + hotter_spec.attributes()))
+    for subset in ('training', 'testing'):
+      from_dict = FeatureTable.from_dict(data[subset], data['attributes'], needed, cities)
+      from_store = FeatureTable.from_store(store, subset, needed, cities)
+      self.assertEqual(
+        build_features([precip_spec, hotter_spec], from_dict, True),
+        build_features([precip_spec, hotter_spec], from_store, True),
+      )
+
+  def test_builders_read_stores(self):
+    with open('./raw.json') as file:
+      data = json.load(file)
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'raw.wxs')
+      WeatherStore.from_aggregate(data).write(path)
+      store = get_training_data(path)
+      self.assertIsInstance(store, WeatherStore)
+      for nested in ('training', 'testing'):
+        self.assertEqual(construct_precip_data(data, nested), construct_precip_data(store, nested))
+        self.assertEqual(construct_hotter_daily_data(data, nested), construct_hotter_daily_data(store, nested))
+
+  def test_builders(self):
+    with open('./raw.json') as file:
+      data = json.load(file)
+    examples, attributes = construct_precip_data(data, 'training')
+    self.assertEqual(len(attributes), 3 * len(cities) + 1)
+    self.assertEqual(attributes[-1], 'PRECIPITATION TODAY')
+    examples, attributes = construct_hotter_daily_data(data, 'training')
+    self.assertEqual(len(attributes), 4 * len(cities))
+    self.assertEqual(len(examples[0]), len(attributes))
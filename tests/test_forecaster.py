@@ -0,0 +1,48 @@
+import json
+from unittest import TestCase
+from src.features import FeatureSpec, FeatureTable, Threshold, Compare, build_features
+from src.day_index import DayIndex
+from src.forecaster import Forecaster
+from lab2 import precip_spec, hotter_spec, cities
+
+class ForecasterTests(TestCase):
+  def setUp(self):
+    with open('./raw.json') as file:
+      self.data = json.load(file)
+    self.specs = [hotter_spec, precip_spec]
+
+  def test_matches_rebuilt_window(self):
+    forecaster = Forecaster(self.specs, cities)
+    self.assertEqual(forecaster.capacity, 5)
+    days = sorted(self.data['testing'].keys(), key=DayIndex.ordinal)[:60]
+    for i, day in enumerate(days):
+      forecaster.push(day, self.data['testing'][day])
+      window = {key: self.data['testing'][key] for key in days[max(0, i - 4):i + 1]}
+      table = FeatureTable.from_dict(window, self.data['attributes'], precip_spec.attributes() + hotter_spec.attributes(), cities)
+      rebuilt = build_features(self.specs, table, False)
+      for (row, names), (examples, rebuilt_names) in zip(forecaster.features(), rebuilt):
+        self.assertEqual(names, rebuilt_names)
+        self.assertEqual(row, examples[0] if examples else None)
+
+  def test_push_strings(self):
+    stations = ['ROC', 'BUF']
+    spec = FeatureSpec(
+      [Threshold('WTR PCPN', station) for station in stations] + [Compare('DEP', station, 'ROC', 'less') for station in stations],
+      Threshold('WTR PCPN', 'ROC', lag=0),
+      required_days=(2, 3, 4, 5),
+      required_reports={'ROC': (1, 2)},
+    )
+    forecaster = Forecaster([spec], stations)
+    for day in range(1, 6):
+      forecaster.push_strings(f'03/0{day}/24', {
+        'ROC': f'{day} 37 23 30 3 35 0 0.21 2.2 4 12.6 21 170 M M 10 126 34 150',
+        'BUF': f'{day} 31 17 24 -2 41 0 T 0.9 4 13.2 23 70 M M 9 16 28 100',
+      })
+    (row, names), = forecaster.features()
+    self.assertEqual(names[0], 'WTR PCPN IN ROC 1 DAY AGO')
+    self.assertEqual(row, (True, False, False, True))
+    # Pushing the next day drops 03/01 and needs no other work
+    forecaster.push_strings('03/06/24', {'BUF': '6 31 17 24 -2 41 0 T 0.9 4 13.2 23 70 M M 9 16 28 100'})
+    self.assertEqual(forecaster.features()[0][0], None)
+    with self.assertRaises(Exception):
+      forecaster.push('03/01/24', {})
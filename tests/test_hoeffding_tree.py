@@ -0,0 +1,86 @@
+import random
+from unittest import TestCase
+from src.hoeffding_tree import HoeffdingTree
+
+class HoeffdingTreeTests(TestCase):
+  def setUp(self):
+    self.test_data = [
+      ('N','Y','N','Y','Y'),
+      ('N','N','N','N','Y'),
+      ('Y','Y','Y','Y','Y'),
+      ('Y','N','Y','N','N'),
+      ('N','N','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('Y','Y','N','Y','Y'),
+      ('N','Y','Y','N','N'),
+      ('Y','N','N','Y','Y'),
+      ('Y','N','N','N','N'),
+      ('Y','Y','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('N','N','Y','Y','Y'),
+      ('Y','N','Y','N','N'),
+      ('Y','N','N','Y','Y'),
+      ('N','N','Y','N','Y'),
+      ('Y','Y','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('Y','N','Y','N','Y'),
+      ('Y','Y','N','N','N'),
+    ]
+
+    self.index_map = [
+      'veg?', 'iphone?', 'student?', 'american?', 'drinks coffee'
+    ]
+
+  def test_waits_for_grace_period(self):
+    tree = HoeffdingTree(self.index_map, grace_period=len(self.test_data) + 1)
+    tree.learn_many(self.test_data)
+    self.assertEqual(tree.size(), 1)
+    self.assertEqual(tree.examples_seen, 20)
+    # Majority of the examples, 'Y' being first on a tie
+    self.assertEqual(tree.predict(self.test_data[0][:-1]), 'Y')
+
+  def test_splits_on_reliable_attribute(self):
+    rng = random.Random(630)
+    tree = HoeffdingTree(['a', 'b', 'c', 'answer'], grace_period=50)
+    for _ in range(2000):
+      example = tuple(rng.choice('NY') for _ in range(3))
+      tree.learn_one(example + (example[1] == 'Y',))
+    self.assertEqual(tree.root.best_attr_index, 1)
+    for example in (('N','Y','N'), ('Y','N','Y')):
+      self.assertEqual(tree.predict(example), example[1] == 'Y')
+
+  def test_no_split_on_noise(self):
+    rng = random.Random(630)
+    tree = HoeffdingTree(['a', 'b', 'answer'], grace_period=50, tie_threshold=0)
+    for _ in range(2000):
+      tree.learn_one((rng.choice('NY'), rng.choice('NY'), rng.choice('NY')))
+    self.assertEqual(tree.size(), 1)
+
+  def test_to_decision_tree(self):
+    tree = HoeffdingTree(self.index_map, grace_period=10, confidence=0.5, tie_threshold=0.5)
+    for _ in range(5):
+      tree.learn_many(self.test_data)
+    self.assertGreater(tree.size(), 1)
+    dt = tree.to_decision_tree()
+    examples = [example[:-1] for example in self.test_data] + [('Y','Y','N','?')]
+    self.assertEqual([dt.predict(example) for example in examples], [tree.predict(example) for example in examples])
+    self.assertEqual(dt.predict_many(examples), [tree.predict(example) for example in examples])
+
+  def test_empty_tree_to_decision_tree(self):
+    dt = HoeffdingTree(self.index_map).to_decision_tree()
+    example = self.test_data[0][:-1]
+    self.assertIsNone(dt.children)
+    self.assertIsNone(dt.predict(example))
+    self.assertEqual([None], dt.compile().predict_many([example]))
+
+  def test_defaults_never_split_on_noise(self):
+    for seed in range(5):
+      rng = random.Random(seed)
+      tree = HoeffdingTree(['signal'] + [f'noise {i}' for i in range(5)] + ['answer'])
+      for _ in range(5000):
+        example = tuple(rng.choice('NY') for _ in range(6))
+        answer = example[0] == 'Y' if rng.random() >= 0.1 else rng.choice([True, False])
+        tree.learn_one(example + (answer,))
+      self.assertEqual(0, tree.root.best_attr_index)
+      # Only the informative attribute is ever asked
+      self.assertEqual(3, tree.size())
@@ -0,0 +1,78 @@
+import os
+import tempfile
+from unittest import TestCase
+from src.decision_tree import DecisionTree
+from src.model_cache import ModelCache
+
+def build(data, nested=None):
+  return data, ['a', 'answer']
+
+class ModelCacheTests(TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.data_file = os.path.join(self.directory.name, 'data.json')
+    with open(self.data_file, 'w') as file:
+      file.write('first')
+    self.trained = 0
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def train(self):
+    self.trained += 1
+    return DecisionTree([('Y', 'N'), ('N', 'Y')], ['a', 'answer'])
+
+  def test_reuses_models_in_memory(self):
+    cache = ModelCache()
+    first = cache.get_or_train(self.data_file, build, {'max_depth': 3}, self.train)
+    second = cache.get_or_train(self.data_file, build, {'max_depth': 3}, self.train)
+    self.assertIs(first, second)
+    cache.get_or_train(self.data_file, build, {'max_depth': 4}, self.train)
+    self.assertEqual(2, self.trained)
+
+  def test_changed_data_file_retrains(self):
+    cache = ModelCache()
+    cache.get_or_train(self.data_file, build, {}, self.train)
+    with open(self.data_file, 'w') as file:
+      file.write('second, longer')
+    cache.get_or_train(self.data_file, build, {}, self.train)
+    self.assertEqual(2, self.trained)
+
+  def test_missing_data_file_is_created_by_training(self):
+    cache = ModelCache()
+    missing = os.path.join(self.directory.name, 'fetched.json')
+    def fetch_and_train():
+      with open(missing, 'w') as file:
+        file.write('fetched')
+      return self.train()
+    first = cache.get_or_train(missing, build, {}, fetch_and_train)
+    self.assertIs(first, cache.get_or_train(missing, build, {}, fetch_and_train))
+    self.assertEqual(1, self.trained)
+
+  def test_evicts_least_recently_used(self):
+    cache = ModelCache(capacity=1)
+    cache.get_or_train(self.data_file, build, {'max_depth': 1}, self.train)
+    cache.get_or_train(self.data_file, build, {'max_depth': 2}, self.train)
+    cache.get_or_train(self.data_file, build, {'max_depth': 1}, self.train)
+    self.assertEqual(3, self.trained)
+
+  def test_disk_tier_shared_between_caches(self):
+    directory = os.path.join(self.directory.name, 'models')
+    model = ModelCache(directory=directory).get_or_train(self.data_file, build, {}, self.train)
+    loaded = ModelCache(directory=directory).get_or_train(self.data_file, build, {}, self.train)
+    self.assertEqual(1, self.trained)
+    self.assertEqual(repr(model), repr(loaded))
+
+  def test_changed_spec_retrains(self):
+    from src.features import FeatureSpec, Threshold
+    directory = os.path.join(self.directory.name, 'models')
+    spec = lambda threshold: FeatureSpec([Threshold('WTR PCPN', 'BUF', threshold)], Threshold('WTR PCPN', 'ROC', lag=0))
+    ModelCache(directory=directory).get_or_train(self.data_file, build, {}, self.train, spec(0.2))
+    ModelCache(directory=directory).get_or_train(self.data_file, build, {}, self.train, spec(0.2))
+    self.assertEqual(1, self.trained)
+    # Same builder source, different spec thresholds
+    ModelCache(directory=directory).get_or_train(self.data_file, build, {}, self.train, spec(0.5))
+    self.assertEqual(2, self.trained)
+    changed = FeatureSpec([Threshold('WTR PCPN', 'BUF', 0.2)], Threshold('WTR PCPN', 'ROC', lag=0), required_days=(2,))
+    ModelCache(directory=directory).get_or_train(self.data_file, build, {}, self.train, changed)
+    self.assertEqual(3, self.trained)
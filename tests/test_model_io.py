@@ -0,0 +1,80 @@
+import os
+import tempfile
+from unittest import TestCase
+from src.decision_tree import DecisionTree
+from src.random_forest import RandomForest
+from src.model_io import save_model, load_model, read_header
+
+class ModelIOTests(TestCase):
+  def setUp(self):
+    self.test_data = [
+      ('N','Y','N','Y','Y'),
+      ('N','N','N','N','Y'),
+      ('Y','Y','Y','Y','Y'),
+      ('Y','N','Y','N','N'),
+      ('N','N','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('Y','Y','N','Y','Y'),
+      ('N','Y','Y','N','N'),
+      ('Y','N','N','Y','Y'),
+      ('Y','N','N','N','N'),
+      ('Y','Y','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('N','N','Y','Y','Y'),
+      ('Y','N','Y','N','N'),
+      ('Y','N','N','Y','Y'),
+      ('N','N','Y','N','Y'),
+      ('Y','Y','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('Y','N','Y','N','Y'),
+      ('Y','Y','N','N','N'),
+    ]
+
+    self.index_map = [
+      'veg?', 'iphone?', 'student?', 'american?', 'drinks coffee'
+    ]
+    self.directory = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.directory.name, 'model.bin')
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_tree_round_trip(self):
+    dt = DecisionTree(self.test_data, self.index_map, 3)
+    save_model(dt, self.path)
+    for mmap in (True, False):
+      loaded = load_model(self.path, mmap)
+      self.assertEqual(repr(dt), repr(loaded))
+      self.assertEqual(dt.predict_many(self.test_data), loaded.predict_many(self.test_data))
+    self.assertEqual('tree', read_header(self.path)['kind'])
+
+  def test_forest_round_trip(self):
+    rf = RandomForest(4, 2, 3, seed=5)
+    rf.train(self.test_data, self.index_map)
+    save_model(rf, self.path)
+    loaded = load_model(self.path)
+    self.assertEqual(repr(rf), repr(loaded))
+    samples = [example[:-1] for example in self.test_data]
+    self.assertEqual([rf.predict(sample) for sample in samples], [loaded.predict(sample) for sample in samples])
+    self.assertEqual(rf.predict_batch(samples)[0], loaded.predict_batch(samples)[0])
+    self.assertEqual(rf.subsets, loaded.subsets)
+
+  def test_forest_trees_built_on_demand(self):
+    rf = RandomForest(4, 2, 3, seed=5)
+    rf.train(self.test_data, self.index_map)
+    save_model(rf, self.path)
+    loaded = load_model(self.path)
+    samples = [example[:-1] for example in self.test_data] + [('?', '?', '?', '?')]
+    self.assertEqual([rf.predict(sample) for sample in samples], [loaded.predict(sample) for sample in samples])
+    self.assertEqual(rf.predict_batch(samples)[0], loaded.predict_batch(samples)[0])
+    # Predicting used the arrays only
+    self.assertEqual([None] * 4, loaded.trees.trees)
+    self.assertEqual(repr(rf.trees[1]), repr(loaded.trees[1]))
+    self.assertEqual([False, True, False, False], [tree is not None for tree in loaded.trees.trees])
+    self.assertEqual([rf.predict(sample) for sample in samples], [loaded.predict(sample) for sample in samples])
+
+  def test_rejects_other_files(self):
+    with open(self.path, 'wb') as file:
+      file.write(b'not a model file')
+    with self.assertRaises(Exception):
+      load_model(self.path)
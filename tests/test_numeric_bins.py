@@ -0,0 +1,93 @@
+import os
+import random
+import tempfile
+from unittest import TestCase
+from src.decision_tree import DecisionTree
+from src.numeric_bins import NumericBins
+from src.model_io import save_model, load_model
+from src.training_stats import TrainingStats
+
+class NumericBinsTests(TestCase):
+  def setUp(self):
+    rng = random.Random(630)
+    self.test_data = []
+    for _ in range(200):
+      temp = rng.randrange(20, 80)
+      wind = rng.choice('NY')
+      # Missing and trace readings are rainy days
+      if rng.random() < 0.1:
+        temp = rng.choice([None, 'M'])
+      self.test_data.append((temp, wind, temp is None or temp == 'M' or temp > 50))
+    self.index_map = ['temp', 'windy?', 'hot']
+
+  def test_quantile_edges(self):
+    self.assertEqual([1, 2, 3], NumericBins.quantile_edges([3, 1, 2, 2, 3], 4).tolist())
+    edges = NumericBins.quantile_edges(list(range(100)), 4)
+    self.assertEqual(4, len(edges))
+    self.assertEqual(99, edges[-1])
+    bins = NumericBins.build([(value, 'a') for value in range(100)] + [('M', 'b')], [0], 4)
+    self.assertEqual(-1, bins.codes[0][-1])
+    self.assertEqual([25, 25, 25, 25], [int((bins.codes[0] == bucket).sum()) for bucket in range(4)])
+
+  def test_threshold_split(self):
+    dt = DecisionTree(self.test_data, self.index_map, numeric=[0], bins=64)
+    self.assertEqual(0, dt.best_attr_index)
+    # With a bucket per value the threshold is the largest cool temperature seen
+    self.assertEqual(max(example[0] for example in self.test_data if example[0] in range(51)), dt.split_threshold)
+    # Values that are not numbers follow, in the order first seen
+    others = list(dict.fromkeys(example[0] for example in self.test_data if not DecisionTree.is_number(example[0])))
+    self.assertEqual([True, False] + others, list(dt.children.keys()))
+    for example in self.test_data:
+      self.assertEqual(example[-1], dt.predict(example[:-1]))
+    self.assertEqual(True, dt.predict((70.5, 'N')))
+    self.assertEqual(False, dt.predict((-3, 'Y')))
+    self.assertIsNone(dt.predict(('T', 'Y')))
+
+  def test_bools_split_on_values(self):
+    self.assertFalse(DecisionTree.is_number(True))
+    examples = [(flag, flag) for flag in (True, False, True, False)]
+    bins = NumericBins.build(examples, [0])
+    self.assertEqual([], bins.columns)
+    dt = DecisionTree(examples, ['flag', 'answer'], numeric=[0])
+    self.assertEqual(repr(DecisionTree(examples, ['flag', 'answer'])), repr(dt))
+    self.assertIsNone(dt.split_threshold)
+
+  def test_nan_goes_to_none_child(self):
+    nan = float('nan')
+    examples = [(value, value > 2) for value in range(1, 5)] + [(float('nan'), 'missing'), (None, 'missing'), (float('nan'), 'missing')]
+    dt = DecisionTree(examples, ['value', 'answer'], numeric=[0])
+    self.assertEqual([True, False, None], list(dt.children.keys()))
+    self.assertEqual('missing', dt.predict((nan,)))
+    self.assertEqual(['missing', 'missing', False], dt.compile().predict_many([(nan,), (None,), (1,)]))
+    self.assertEqual('missing', dt.compile().predict((nan,)))
+
+  def test_threshold_asked_again(self):
+    examples = [(value, value % 20 >= 10) for value in range(40)]
+    dt = DecisionTree(examples, ['value', 'answer'], numeric=[0], bins=8)
+    self.assertGreater(dt.depth(), 1)
+    self.assertEqual([example[-1] for example in examples], [dt.predict(example[:-1]) for example in examples])
+
+  def test_predict_many_and_round_trip(self):
+    dt = DecisionTree(self.test_data, self.index_map, 2, numeric=[0], bins=4)
+    samples = [example[:-1] for example in self.test_data] + [('T', 'Y'), (float('nan'), 'N'), (100, 'X')]
+    expected = [dt.predict(sample) for sample in samples]
+    self.assertEqual(expected, dt.predict_many(samples))
+    compiled = dt.compile()
+    self.assertEqual(expected, compiled.predict_many(samples))
+    self.assertEqual(expected, [compiled.predict(sample) for sample in samples])
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'model.bin')
+      save_model(dt, path)
+      loaded = load_model(path)
+      self.assertEqual(repr(dt), repr(loaded))
+      self.assertEqual(expected, loaded.predict_many(samples))
+      self.assertEqual(expected, [loaded.predict(sample) for sample in samples])
+
+  def test_stats_builds_same_tree(self):
+    stats = TrainingStats()
+    dt = DecisionTree(self.test_data, self.index_map, 3, numeric=[0], stats=stats)
+    self.assertEqual(repr(DecisionTree(self.test_data, self.index_map, 3, numeric=[0])), repr(dt))
+    self.assertIn('best_threshold', stats.calls)
+    self.assertEqual(dt.size(), sum(stats.nodes_per_depth.values()))
+    with self.assertRaises(Exception):
+      DecisionTree(self.test_data, self.index_map, numeric=[0], engine='numpy')
@@ -61,3 +61,151 @@ class RandomForestTests(TestCase):
           real_outcome, predicted_outcome,
           f"Outcome {real_outcome} should not have matched predicted outcome {predicted_outcome}"
         )
+
+  def test_seed_builds_same_forest_for_any_worker_count(self):
+    serial = RandomForest(4, 2, 3, seed=7)
+    serial.train(self.test_data, self.index_map)
+    parallel = RandomForest(4, 2, 3, n_jobs=2, seed=7)
+    parallel.train(self.test_data, self.index_map)
+    self.assertEqual(repr(serial), repr(parallel))
+
+  def test_predict_batch_matches_predict(self):
+    rf = RandomForest(5, 2, 3, seed=3)
+    rf.train(self.test_data, self.index_map)
+    samples = [example[:-1] for example in self.test_data]
+    predictions, classes, fractions = rf.predict_batch(samples)
+    self.assertEqual(['Y', 'N', None], classes)
+    self.assertEqual((len(samples), 3), fractions.shape)
+    for sample, prediction, row in zip(samples, predictions, fractions):
+      self.assertAlmostEqual(1, row.sum())
+      # Ties are broken differently than predict, compare clear majorities only
+      if sorted(row)[-1] > sorted(row)[-2]:
+        self.assertEqual(rf.predict(sample), prediction)
+
+  def test_grow_keeps_trained_trees(self):
+    rf = RandomForest(3, 2, 3, seed=5)
+    rf.train(self.test_data, self.index_map)
+    trained = list(rf.trees)
+    rf.grow(self.test_data, self.index_map, 2)
+    self.assertEqual(5, rf.num_trees)
+    self.assertEqual(5, len(rf.trees))
+    self.assertTrue(all(a is b for a, b in zip(trained, rf.trees)))
+    # Growing by 2 gives the same trees as training 5 at once
+    full = RandomForest(5, 2, 3, seed=5)
+    full.train(self.test_data, self.index_map)
+    self.assertEqual(repr(full.trees), repr(rf.trees))
+
+  def test_grow_matches_full_training_for_any_seed(self):
+    examples = [tuple('YN'[(i >> bit) & 1] for bit in range(9)) + ('YN'[i % 3 == 0],) for i in range(40)]
+    attributes = [f'attribute {i}' for i in range(9)] + ['answer']
+    for seed in range(60):
+      grown = RandomForest(4, 3, 2, seed=seed)
+      grown.train(examples, attributes)
+      grown.grow(examples, attributes, 4)
+      full = RandomForest(8, 3, 2, seed=seed)
+      full.train(examples, attributes)
+      self.assertEqual(full.subsets, grown.subsets)
+      self.assertEqual(8, len(set(map(str, grown.subsets))))
+      self.assertEqual(repr(full.trees), repr(grown.trees))
+    for seed in range(20):
+      for size in range(1, 6):
+        grown = RandomForest(size, 2, 3, seed=seed)
+        grown.train(self.test_data, self.index_map)
+        grown.grow(self.test_data, self.index_map, 6 - size)
+        full = RandomForest(6, 2, 3, seed=seed)
+        full.train(self.test_data, self.index_map)
+        self.assertEqual(full.subsets, grown.subsets)
+
+  def test_refresh_keeps_subsets_distinct(self):
+    for seed in range(30):
+      rf = RandomForest(5, 2, 3, seed=seed)
+      rf.train(self.test_data, self.index_map)
+      kept = [subset for i, subset in enumerate(rf.subsets) if i not in (0, 1)]
+      rf.refresh(self.test_data, self.index_map, 2)
+      self.assertEqual(kept, rf.subsets[:3])
+      self.assertEqual(5, len(set(map(str, rf.subsets))))
+
+  def test_refresh_oldest(self):
+    rf = RandomForest(4, 2, 3, seed=5)
+    rf.train(self.test_data, self.index_map)
+    trained = list(rf.trees)
+    self.assertEqual([0, 1], rf.refresh(self.test_data[10:], self.index_map, 2))
+    self.assertEqual(4, len(rf.trees))
+    self.assertEqual(6, rf.trees_trained)
+    self.assertIs(trained[2], rf.trees[0])
+    self.assertIs(trained[3], rf.trees[1])
+
+  def test_refresh_worst(self):
+    rf = RandomForest(4, 2, 3, seed=5)
+    rf.train(self.test_data, self.index_map)
+    trained = list(rf.trees)
+    holdout = self.test_data[:10]
+    errors = rf.tree_errors(holdout)
+    for tree, error in zip(trained, errors):
+      wrong = sum(tree.predict(example[:-1]) != example[-1] for example in holdout)
+      self.assertAlmostEqual(wrong / len(holdout), error)
+    replaced = rf.refresh(self.test_data, self.index_map, 1, 'worst', holdout)
+    self.assertEqual([errors.index(max(errors))], replaced)
+    kept = [tree for i, tree in enumerate(trained) if i not in replaced]
+    self.assertTrue(all(a is b for a, b in zip(kept, rf.trees)))
+    with self.assertRaises(Exception):
+      rf.refresh(self.test_data, self.index_map, 1, 'random')
+
+  def test_tree_sample(self):
+    rf = RandomForest(4, 2, 3, seed=5, max_samples=0.5)
+    rows = rf.tree_sample(0, len(self.test_data))
+    self.assertEqual(10, len(rows))
+    self.assertEqual(10, len(set(rows)))
+    self.assertEqual(list(rows), sorted(rows))
+    self.assertEqual(list(rows), list(rf.tree_sample(0, len(self.test_data))))
+    self.assertEqual(7, len(RandomForest(seed=5, max_samples=7).tree_sample(0, 20)))
+    self.assertEqual(20, len(RandomForest(seed=5, bootstrap=True).tree_sample(0, 20)))
+    self.assertIsNone(RandomForest(seed=5).tree_sample(0, 20))
+
+  def test_out_of_bag_score(self):
+    rf = RandomForest(6, 2, 3, seed=5, bootstrap=True)
+    rf.train(self.test_data, self.index_map)
+    self.assertEqual(6, len(rf.oob_errors_))
+    votes = [{} for _ in self.test_data]
+    for index, tree in enumerate(rf.trees):
+      seen = set(rf.tree_sample(index, len(self.test_data)))
+      unseen = [row for row in range(len(self.test_data)) if row not in seen]
+      wrong = sum(tree.predict(self.test_data[row][:-1]) != self.test_data[row][-1] for row in unseen)
+      self.assertAlmostEqual(wrong / len(unseen), rf.oob_errors_[index])
+      for row in unseen:
+        answer = tree.predict(self.test_data[row][:-1])
+        votes[row][answer] = votes[row].get(answer, 0) + 1
+    voted = [(row, max(['Y', 'N', None], key=lambda answer: counts.get(answer, 0))) for row, counts in enumerate(votes) if counts]
+    correct = sum(self.test_data[row][-1] == answer for row, answer in voted)
+    self.assertAlmostEqual(correct / len(voted), rf.oob_score_)
+
+  def test_subsampled_forest_same_for_any_worker_count(self):
+    serial = RandomForest(4, 2, 3, seed=7, max_samples=12)
+    serial.train(self.test_data, self.index_map)
+    parallel = RandomForest(4, 2, 3, n_jobs=2, seed=7, max_samples=12)
+    parallel.train(self.test_data, self.index_map)
+    self.assertEqual(repr(serial), repr(parallel))
+    self.assertEqual(serial.oob_errors_, parallel.oob_errors_)
+    self.assertEqual(serial.oob_score_, parallel.oob_score_)
+
+  def test_refresh_oob(self):
+    rf = RandomForest(4, 2, 3, seed=5, max_samples=10)
+    rf.train(self.test_data, self.index_map)
+    errors = list(rf.oob_errors_)
+    replaced = rf.refresh(self.test_data, self.index_map, 1, 'oob')
+    self.assertEqual([errors.index(max(errors))], replaced)
+    self.assertEqual(4, len(rf.oob_errors_))
+    with self.assertRaises(Exception):
+      RandomForest(4, 2, 3, seed=5).refresh(self.test_data, self.index_map, 1, 'oob')
+
+  def test_prune(self):
+    rf = RandomForest(4, 3, 4, seed=5)
+    rf.train(self.test_data[:14], self.index_map)
+    samples = [example[:-1] for example in self.test_data]
+    rf.predict_batch(samples)
+    before = sum(tree.size() for tree in rf.trees)
+    counts = rf.prune(self.test_data[14:], self.test_data[:14])
+    self.assertEqual(before, counts['before'])
+    self.assertEqual(sum(tree.size() for tree in rf.trees), counts['after'])
+    self.assertLessEqual(counts['after'], counts['before'])
+    self.assertEqual([rf.predict(sample) for sample in samples], rf.predict_batch(samples)[0])
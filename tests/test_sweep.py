@@ -0,0 +1,73 @@
+import random
+import numpy as np
+from math import inf
+from unittest import TestCase
+from src.decision_tree import DecisionTree
+from src.random_forest import RandomForest
+from src.sweep import Sweep
+
+class SweepTests(TestCase):
+  def setUp(self):
+    rng = random.Random(630)
+    # Answers follow the first attributes with some noise, so deeper trees overfit
+    self.test_data = []
+    for _ in range(120):
+      example = tuple(rng.choice('NYM') for _ in range(6))
+      answer = (example[0] == 'Y') != (example[1] == 'N' and example[2] != 'M')
+      if rng.random() < 0.15: answer = not answer
+      self.test_data.append(example + (answer,))
+    self.index_map = [f'attribute {i}' for i in range(6)] + ['answer']
+    self.testing = self.test_data[:30]
+    self.sweep = Sweep(self.test_data[30:], self.index_map, self.testing, folds=3, seed=4)
+
+  @staticmethod
+  def accuracy(model, examples:list) -> float:
+    return sum(model.predict(example[:-1]) == example[-1] for example in examples) / len(examples)
+
+  def retrained(self, train:callable) -> list:
+    """
+    Cross-validated and test accuracy of models trained from scratch on every split.
+    """
+    splits = self.sweep.splits()
+    correct = sum(self.accuracy(train(fold), holdout) * len(holdout) for fold, holdout in splits[:-1])
+    return [correct / len(self.sweep.examples), self.accuracy(train(splits[-1][0]), self.testing)]
+
+  def test_splits(self):
+    splits = self.sweep.splits()
+    self.assertEqual(4, len(splits))
+    held = [example for _, holdout in splits[:3] for example in holdout]
+    self.assertEqual(sorted(self.sweep.examples), sorted(held))
+    for train, holdout in splits[:3]:
+      self.assertEqual(len(self.sweep.examples), len(train) + len(holdout))
+    self.assertIs(self.testing, splits[-1][1])
+
+  def test_trees_match_retraining(self):
+    results = self.sweep.trees([0, 1, 2, 3, inf], [0.00001, 0.5, 0.95])
+    self.assertEqual(15, len(results))
+    for result in results:
+      expected = self.retrained(lambda examples: DecisionTree(examples, list(self.index_map), result['max_depth'], result['threshold']))
+      self.assertAlmostEqual(expected[0], result['cv_accuracy'], msg=str(result))
+      self.assertAlmostEqual(expected[1], result['test_accuracy'], msg=str(result))
+    self.assertEqual(max(result['cv_accuracy'] for result in results), Sweep.best(results)['cv_accuracy'])
+
+  def test_forests_match_retraining(self):
+    results = self.sweep.forests([1, 2, 4], [2, 3], [1, 3])
+    self.assertEqual(12, len(results))
+    for result in results:
+      def train(examples):
+        forest = RandomForest(result['num_trees'], result['num_attributes'], result['max_depth'], seed=4)
+        forest.train(examples, list(self.index_map))
+        return forest
+      expected = self.retrained(train)
+      self.assertAlmostEqual(expected[0], result['cv_accuracy'], msg=str(result))
+      self.assertAlmostEqual(expected[1], result['test_accuracy'], msg=str(result))
+
+  def test_vote_ties_like_predict(self):
+    # Class 1 reaches two votes before class 0 does
+    predictions = np.array([[0], [1], [1], [0]])
+    winners = Sweep.vote(predictions, 3, [1, 3, 4])
+    self.assertEqual([[0], [1], [1]], [winner.tolist() for winner in winners])
+
+  def test_parallel_matches_serial(self):
+    parallel = Sweep(self.sweep.examples, self.index_map, self.testing, folds=3, seed=4, n_jobs=2)
+    self.assertEqual(self.sweep.trees([1, inf], [0.00001, 0.5]), parallel.trees([1, inf], [0.00001, 0.5]))
@@ -0,0 +1,81 @@
+from unittest import TestCase
+from src.decision_tree import DecisionTree
+from src.random_forest import RandomForest
+from src.training_stats import TrainingStats
+
+class TrainingStatsTests(TestCase):
+  def setUp(self):
+    self.test_data = [
+      ('N','Y','N','Y','Y'),
+      ('N','N','N','N','Y'),
+      ('Y','Y','Y','Y','Y'),
+      ('Y','N','Y','N','N'),
+      ('N','N','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('Y','Y','N','Y','Y'),
+      ('N','Y','Y','N','N'),
+      ('Y','N','N','Y','Y'),
+      ('Y','N','N','N','N'),
+      ('Y','Y','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('N','N','Y','Y','Y'),
+      ('Y','N','Y','N','N'),
+      ('Y','N','N','Y','Y'),
+      ('N','N','Y','N','Y'),
+      ('Y','Y','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('Y','N','Y','N','Y'),
+      ('Y','Y','N','N','N'),
+    ]
+
+    self.index_map = [
+      'veg?', 'iphone?', 'student?', 'american?', 'drinks coffee'
+    ]
+
+  def test_tree_stats(self):
+    events = []
+    stats = TrainingStats(lambda event, info: events.append((event, info)))
+    dt = DecisionTree(self.test_data, self.index_map, stats=stats)
+    self.assertEqual(repr(dt), repr(DecisionTree(self.test_data, self.index_map)))
+    self.assertEqual(sum(stats.nodes_per_depth.values()), dt.size())
+    self.assertEqual(max(stats.nodes_per_depth), dt.depth())
+    self.assertEqual(stats.nodes_per_depth[0], 1)
+    self.assertEqual(len([event for event in events if event[0] == 'node']), dt.size())
+    self.assertEqual(events[0], ('node', {'depth': 0, 'rows': 20, 'attribute': dt.best_attribute}))
+    self.assertEqual(events[-1], ('tree', stats.trees[0]))
+    self.assertEqual(stats.trees[0]['nodes'], dt.size())
+    # The root scores every attribute
+    self.assertGreaterEqual(stats.candidates, len(self.index_map) - 1)
+    self.assertEqual(stats.calls['contingency_table'], stats.calls['partition'])
+    self.assertEqual(stats.calls['contingency_table'], dt.size() - stats.leaves)
+    # One answer scan per node
+    self.assertEqual(stats.calls['generate_answers'], dt.size())
+    self.assertGreater(stats.rows_scanned, 0)
+
+  def test_numpy_engine_stats(self):
+    stats = TrainingStats()
+    dt = DecisionTree(self.test_data, self.index_map, engine='numpy', stats=stats)
+    python_stats = TrainingStats()
+    DecisionTree(self.test_data, self.index_map, stats=python_stats)
+    self.assertEqual(stats.nodes_per_depth, python_stats.nodes_per_depth)
+    self.assertEqual(stats.leaves, python_stats.leaves)
+    self.assertEqual(len(stats.trees), 1)
+
+  def test_size_and_depth(self):
+    dt = DecisionTree(self.test_data, self.index_map, max_depth=1)
+    self.assertEqual(dt.depth(), 1)
+    self.assertEqual(dt.size(), 1 + len(dt.children))
+    self.assertEqual(DecisionTree.from_parts(value='Y').size(), 1)
+
+  def test_forest_stats(self):
+    trees = []
+    serial = TrainingStats(lambda event, info: event == 'tree' and trees.append(info))
+    forest = RandomForest(4, 2, 3, seed=11)
+    forest.train(self.test_data, self.index_map, stats=serial)
+    self.assertEqual([info['index'] for info in trees], [0, 1, 2, 3])
+    self.assertEqual([info['nodes'] for info in serial.trees], [tree.size() for tree in forest.trees])
+    parallel = TrainingStats()
+    RandomForest(4, 2, 3, n_jobs=2, seed=11).train(self.test_data, self.index_map, stats=parallel)
+    self.assertEqual(parallel.nodes_per_depth, serial.nodes_per_depth)
+    self.assertEqual(parallel.calls, serial.calls)
+    self.assertEqual([info['index'] for info in parallel.trees], [0, 1, 2, 3])
@@ -0,0 +1,50 @@
+from unittest import TestCase
+from src.decision_tree import DecisionTree
+from src.tree_trainer import LevelWiseTrainer
+
+class LevelWiseTrainerTests(TestCase):
+  def setUp(self):
+    self.test_data = [
+      ('N','Y','N','Y','Y'),
+      ('N','N','N','N','Y'),
+      ('Y','Y','Y','Y','Y'),
+      ('Y','N','Y','N','N'),
+      ('N','N','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('Y','Y','N','Y','Y'),
+      ('N','Y','Y','N','N'),
+      ('Y','N','N','Y','Y'),
+      ('Y','N','N','N','N'),
+      ('Y','Y','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('N','N','Y','Y','Y'),
+      ('Y','N','Y','N','N'),
+      ('Y','N','N','Y','Y'),
+      ('N','N','Y','N','Y'),
+      ('Y','Y','Y','Y','N'),
+      ('N','Y','N','N','Y'),
+      ('Y','N','Y','N','Y'),
+      ('Y','Y','N','N','N'),
+    ]
+
+    self.index_map = [
+      'veg?', 'iphone?', 'student?', 'american?', 'drinks coffee'
+    ]
+
+  def test_matches_recursive_tree(self):
+    for depth in (0, 1, 2, 3, 4):
+      self.assertEqual(
+        repr(DecisionTree(self.test_data, self.index_map, depth)),
+        repr(LevelWiseTrainer(depth).fit(self.test_data, self.index_map))
+      )
+
+  def test_result_is_decision_tree(self):
+    dt = LevelWiseTrainer(3).fit(self.test_data, self.index_map)
+    self.assertIsInstance(dt, DecisionTree)
+    self.assertEqual('student?', dt.best_attribute)
+    sample = self.test_data[0][:-1]
+    self.assertEqual(self.test_data[0][-1], dt.predict(sample))
+
+  def test_skips_asked_attributes(self):
+    dt = LevelWiseTrainer().fit(self.test_data, ['veg?', None, 'student?', None, 'drinks coffee'])
+    self.assertEqual(repr(DecisionTree(self.test_data, ['veg?', None, 'student?', None, 'drinks coffee'])), repr(dt))
@@ -0,0 +1,69 @@
+import os
+import tempfile
+from unittest import TestCase
+import numpy as np
+from src.weather_store import WeatherStore
+
+class WeatherStoreTests(TestCase):
+  def setUp(self):
+    self.aggregate = {
+      'attributes': ['MAX TEMP (F)', 'WTR PCPN', 'WX', 'PK WIND SPD'],
+      'training': {
+        '02/01/24': {'BUF': [35, 0.12, 'M', 20], 'ROC': [33, 'T', '13X', None]},
+        '02/02/24': {'ROC': ['M', 0, 1, 18]},
+      },
+      'testing': {
+        '04/01/25': {'BUF': [50, 0.0, 18, 24], 'DTW': [55, 1.5, 'M', 31]},
+      },
+    }
+    self.directory = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.directory.name, 'weather.wxs')
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_roundtrip(self):
+    store = WeatherStore.from_aggregate(self.aggregate)
+    self.assertEqual(store.to_aggregate(), self.aggregate)
+    store.write(self.path)
+    opened = WeatherStore.open(self.path)
+    restored = opened.to_aggregate()
+    self.assertEqual(restored, self.aggregate)
+    # Cell types come back as stored, 0 stays an int in a float column
+    self.assertIs(restored['training']['02/02/24']['ROC'][1].__class__, int)
+    self.assertIs(restored['testing']['04/01/25']['BUF'][1].__class__, float)
+
+  def test_columns(self):
+    WeatherStore.from_aggregate(self.aggregate).write(self.path)
+    store = WeatherStore.open(self.path)
+    self.assertEqual(store.stations, ['BUF', 'ROC', 'DTW'])
+    self.assertEqual(store.days('training'), ['02/01/24', '02/02/24'])
+    values, flags = store.column('training', 'MAX TEMP (F)')
+    self.assertEqual(values.dtype, np.int32)
+    self.assertEqual(values.shape, (2, 3))
+    self.assertEqual(values[0, :2].tolist(), [35, 33])
+    self.assertEqual(flags.tolist(), [
+      [WeatherStore.VALUE, WeatherStore.VALUE, WeatherStore.ABSENT],
+      [WeatherStore.ABSENT, WeatherStore.MISSING, WeatherStore.ABSENT],
+    ])
+    values, flags = store.column('training', 'WTR PCPN')
+    self.assertEqual(values.dtype, np.float64)
+    self.assertEqual(flags[0, 1], WeatherStore.TRACE)
+    self.assertEqual(flags[1, 1], WeatherStore.INTEGER)
+    values, flags = store.column('training', 'WX')
+    self.assertEqual(flags[0, 1], WeatherStore.STRING)
+    self.assertEqual(store.strings('training', 'WX')[values[0, 1]], '13X')
+    self.assertEqual(store.column('training', 'PK WIND SPD')[1][0, 1], WeatherStore.NONE)
+
+  def test_open_reads_only_header(self):
+    WeatherStore.from_aggregate(self.aggregate).write(self.path)
+    store = WeatherStore.open(self.path)
+    self.assertEqual(store.columns, {})
+    store.column('testing', 'WX')
+    self.assertEqual(list(store.columns.keys()), [('testing', 'WX')])
+
+  def test_not_a_store(self):
+    with open(self.path, 'wb') as file:
+      file.write(b'{"attributes": []}')
+    with self.assertRaises(Exception):
+      WeatherStore.open(self.path)